@@ -0,0 +1,200 @@
+"""
+Micro-benchmarks for the CoinMarketCap handler.
+
+Run from the MindsDB handlers directory:
+
+    python -m coinmarketcap_handler.benchmark
+"""
+import json
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import requests
+from mindsdb_sql_parser import parse_sql
+
+from coinmarketcap_handler.coinmarketcap_handler import CoinMarketCapHandler
+from coinmarketcap_handler.coinmarketcap_tables import CryptocurrencyQuotesTable
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Minimal keep-alive JSON server standing in for pro-api.coinmarketcap.com."""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; with Nagle on, keep-alive responses stall on delayed ACKs
+    disable_nagle_algorithm = True
+    payload = json.dumps({'status': {'error_code': 0, 'credit_count': 1}, 'data': {}}).encode()
+    latency = 0.0
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.payload)))
+        self.end_headers()
+        self.wfile.write(self.payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_server(handler=_StandInHandler) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _per_request_ms(fn, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1000
+
+
+def bench_transport(n: int = 500):
+    """Compare one-shot requests.get against the handler's pooled session."""
+    server = _start_server()
+    url = f'http://127.0.0.1:{server.server_port}'
+    endpoint = '/v1/global-metrics/quotes/latest'
+
+    # Uncached and unthrottled, so every call goes over the wire
+    handler = CoinMarketCapHandler(
+        'bench', connection_data={'api_key': 'bench', 'cache_ttl': {endpoint: 0}, 'requests_per_minute': 0}
+    )
+    handler.base_url = url
+
+    unpooled = _per_request_ms(lambda: requests.get(url + endpoint, headers=handler.headers).json(), n)
+    pooled = _per_request_ms(lambda: handler.call_coinmarketcap_api(endpoint), n)
+
+    server.shutdown()
+    print('transport (local stand-in server, plain HTTP)')
+    print(f'  requests.get    {unpooled:8.3f} ms/request')
+    print(f'  pooled session  {pooled:8.3f} ms/request')
+    print(f'  saved           {unpooled - pooled:8.3f} ms/request ({unpooled / pooled:.1f}x)')
+
+
+def _listings_payload(n: int) -> list:
+    return [
+        {
+            'id': i, 'name': f'Coin {i}', 'symbol': f'C{i}', 'slug': f'coin-{i}', 'cmc_rank': i,
+            'num_market_pairs': i % 500, 'circulating_supply': i * 1e6, 'total_supply': i * 2e6,
+            'max_supply': None if i % 3 else i * 3e6, 'date_added': '2013-04-28T00:00:00.000Z',
+            'tags': ['mineable', 'pow'], 'platform': None if i % 2 else {'name': 'Ethereum', 'token_address': '0x0'},
+            'quote': {'USD': {
+                'price': i * 1.5, 'volume_24h': i * 1e7, 'volume_change_24h': 1.2, 'percent_change_1h': 0.1,
+                'percent_change_24h': 2.5, 'percent_change_7d': -3.1, 'percent_change_30d': 10.4,
+                'market_cap': i * 1e9, 'market_cap_dominance': 0.5, 'fully_diluted_market_cap': i * 2e9,
+                'last_updated': '2024-01-01T00:00:00.000Z'
+            }}
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def _rows_baseline(records: list) -> pd.DataFrame:
+    """Row-at-a-time decoding, as the tables did before the columnar decoder."""
+    rows = []
+    for crypto_data in records:
+        quote = crypto_data.get('quote', {}).get('USD', {})
+        platform = crypto_data.get('platform')
+        rows.append([
+            crypto_data.get('id'), crypto_data.get('name'), crypto_data.get('symbol'), crypto_data.get('slug'),
+            crypto_data.get('cmc_rank'), crypto_data.get('num_market_pairs'), crypto_data.get('circulating_supply'),
+            crypto_data.get('total_supply'), crypto_data.get('max_supply'), crypto_data.get('date_added'),
+            platform.get('name') if platform else None, quote.get('price'), quote.get('volume_24h'),
+            quote.get('volume_change_24h'), quote.get('percent_change_1h'), quote.get('percent_change_24h'),
+            quote.get('percent_change_7d'), quote.get('percent_change_30d'), quote.get('market_cap'),
+            quote.get('market_cap_dominance'), quote.get('fully_diluted_market_cap'), quote.get('last_updated')
+        ])
+    return pd.DataFrame(rows, columns=CryptocurrencyQuotesTable.SCHEMA.columns)
+
+
+def _typed_rows_baseline(records: list) -> pd.DataFrame:
+    """Row-at-a-time decoding cast to the schema dtypes, i.e. the frame the columnar decoder returns."""
+    return _rows_baseline(records).astype(CryptocurrencyQuotesTable.SCHEMA.dtypes)
+
+
+def _measure(fn, records: list, repeat: int):
+    fn(records)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(records)
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+
+    tracemalloc.start()
+    fn(records)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024
+
+
+def bench_decode(sizes=(100, 1000, 5000), repeat: int = 20):
+    """
+    Compare row-at-a-time decoding with the columnar decoder on quotes-shaped payloads.
+
+    Plain row decoding leaves untyped columns, so the speedup is measured
+    against row decoding cast to the schema dtypes, which returns the same frame.
+    """
+    schema = CryptocurrencyQuotesTable.SCHEMA
+    print('decode (22 quote columns)')
+    print(
+        f'  {"rows":>6} {"rows ms":>9} {"typed rows ms":>14} {"columnar ms":>12} {"speedup":>8}'
+        f' {"rows KiB":>9} {"columnar KiB":>13}'
+    )
+    for n in sizes:
+        records = _listings_payload(n)
+        row_ms, row_kib = _measure(_rows_baseline, records, repeat)
+        typed_ms, _ = _measure(_typed_rows_baseline, records, repeat)
+        col_ms, col_kib = _measure(schema.decode, records, repeat)
+        print(
+            f'  {n:>6} {row_ms:>9.2f} {typed_ms:>14.2f} {col_ms:>12.2f} {typed_ms / col_ms:>7.1f}x'
+            f' {row_kib:>9.0f} {col_kib:>13.0f}'
+        )
+
+
+class _QuotesHandler(_StandInHandler):
+    """Answers quotes/latest with a quote per requested symbol, after a fixed API-like latency."""
+
+    latency = 0.1
+
+    def do_GET(self):
+        symbols = parse_qs(urlparse(self.path).query)['symbol'][0].split(',')
+        self.payload = json.dumps({'status': {'error_code': 0, 'credit_count': 1}, 'data': {
+            symbol: {'id': i, 'symbol': symbol, 'quote': {'USD': {'price': 1.0}}} for i, symbol in enumerate(symbols)
+        }}).encode()
+        super().do_GET()
+
+
+def bench_point_lookups(n: int = 50):
+    """Compare concurrent single-symbol quotes selects with and without micro-batching."""
+    server = _start_server(_QuotesHandler)
+    print(f'point lookups ({n} concurrent single-symbol selects, 100 ms API latency, 30 requests/minute)')
+    for window_ms in (0, 5):
+        handler = CoinMarketCapHandler('bench', connection_data={
+            'api_key': 'bench', 'symbol_index': False, 'quote_batch_window_ms': window_ms
+        })
+        handler.base_url = f'http://127.0.0.1:{server.server_port}'
+        table = handler._tables['quotes']
+        threads = [
+            threading.Thread(target=table.select, args=(parse_sql(f"SELECT * FROM quotes WHERE symbol = 'C{i}'"),))
+            for i in range(n)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        requests_sent = handler.single_flight.stats()['calls']
+        print(f'  window {window_ms} ms  {elapsed:7.2f} s  {n / elapsed:8.1f} lookups/s  {requests_sent:3d} requests')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    bench_transport()
+    bench_decode()
+    bench_point_lookups()
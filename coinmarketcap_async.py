@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+from typing import Any, Coroutine, Dict, Mapping, Optional, Tuple
+
+import aiohttp
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Return the event loop shared by all handler instances, starting it on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='coinmarketcap-async', daemon=True).start()
+        return _loop
+
+
+def run_sync(coro: Coroutine) -> Any:
+    """
+    Run a coroutine on the shared event loop and wait for its result.
+
+    This is the sync facade used by select(): it works the same whether or not
+    the calling thread already runs an event loop of its own.
+
+    Args:
+        coro (Coroutine): Coroutine to run
+
+    Returns:
+        Any: The coroutine's result
+    """
+    loop = _get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError('run_sync() cannot be called from the handler event loop; await the coroutine instead')
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+class AsyncTransport:
+    """
+    Pooled aiohttp transport with a cap on concurrent requests.
+
+    The client session and semaphore are created lazily on the shared event
+    loop, since both are bound to the loop they are created on.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        timeout: Tuple[float, float] = (5, 30),
+        max_concurrency: int = 8,
+        keep_alive: bool = True,
+        timed: bool = False
+    ):
+        """
+        Initialize the transport.
+
+        Args:
+            pool_size (int): Maximum number of pooled connections
+            timeout (tuple): Connect and read timeouts in seconds
+            max_concurrency (int): Maximum number of requests in flight, across every caller of the transport
+            keep_alive (bool): Reuse connections between requests
+            timed (bool): Trace connection setup, so get() can report it in `timings`
+        """
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.keep_alive = keep_alive
+        self.timed = timed
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, force_close=not self.keep_alive)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(sock_connect=self.timeout[0], sock_read=self.timeout[1]),
+                trace_configs=[_connection_trace()] if self.timed else None
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def get(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        params: Optional[Dict] = None,
+        timings: Optional[Dict[str, float]] = None
+    ) -> Tuple[int, Mapping[str, str], bytes]:
+        """
+        Send a GET request.
+
+        Args:
+            url (str): Request URL
+            headers (dict): Request headers
+            params (dict): Query parameters
+            timings (dict): If given, filled with the seconds spent setting up a new connection
+                (`connect`, only on a timed transport), waiting for the response headers (`ttfb`)
+                and reading the body (`download`)
+
+        Returns:
+            tuple: Status code, response headers and raw body
+        """
+        session = self._get_session()
+        query = {key: str(value) for key, value in (params or {}).items() if value is not None}
+        async with self._semaphore:
+            if timings is None:
+                async with session.get(url, headers=headers, params=query) as response:
+                    body = await response.read()
+                    return response.status, response.headers, body
+
+            started = time.perf_counter()
+            async with session.get(url, headers=headers, params=query, trace_request_ctx=timings) as response:
+                headers_at = time.perf_counter()
+                body = await response.read()
+                timings['download'] = time.perf_counter() - headers_at
+                timings['ttfb'] = headers_at - started - timings.get('connect', 0.0)
+                return response.status, response.headers, body
+
+    def close(self):
+        """Close pooled connections."""
+        if self._session is not None and not self._session.closed:
+            run_sync(self._session.close())
+
+
+def _connection_trace() -> aiohttp.TraceConfig:
+    """Trace config adding the time spent opening a new connection, DNS included, to a request's timings."""
+    async def on_start(session, context, params):
+        if context.trace_request_ctx is not None:
+            context.connect_started = time.perf_counter()
+
+    async def on_end(session, context, params):
+        if context.trace_request_ctx is not None:
+            context.trace_request_ctx['connect'] = time.perf_counter() - context.connect_started
+
+    trace = aiohttp.TraceConfig()
+    trace.on_connection_create_start.append(on_start)
+    trace.on_connection_create_end.append(on_end)
+    return trace
@@ -0,0 +1,110 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+
+class _Batch:
+    """Lookups collected for one group during a batching window."""
+
+    __slots__ = ('fetch', 'values', 'waiters', 'timer')
+
+    def __init__(self, fetch: Callable[[Hashable, List[str]], Awaitable[Dict[str, Any]]]):
+        self.fetch = fetch
+        self.values: Dict[str, None] = {}
+        self.waiters: List[asyncio.Future] = []
+        self.timer = None
+
+
+class MicroBatcher:
+    """
+    Merges concurrent small lookups into shared calls.
+
+    A lookup waits up to `window` seconds for other lookups of the same group
+    (e.g. the same endpoint params besides the coins), then all of their
+    values are fetched together and each lookup gets back the results of its
+    own values. A batch is sent early once it holds `max_size` values. All
+    lookups run on the event loop the handlers share, so one batcher can
+    serve lookups from several handler instances; a batch is fetched by the
+    lookup that opened it, whose query keeps its handler in use until then.
+    """
+
+    def __init__(self, window: float):
+        """
+        Initialize the batcher.
+
+        Args:
+            window (float): Seconds a lookup waits for others to join its batch
+        """
+        self.window = window
+        self.lookups = 0
+        self.batches = 0
+        self._pending: Dict[Hashable, _Batch] = {}
+        # The loop only keeps weak references to tasks
+        self._sending = set()
+
+    async def submit(
+        self,
+        group: Hashable,
+        values: List[str],
+        max_size: int,
+        fetch: Callable[[Hashable, List[str]], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Look up values within a batch.
+
+        Args:
+            group (hashable): Lookups of the same group can share a call
+            values (list): Values to look up
+            max_size (int): Values after which the batch is sent without waiting
+            fetch (callable): Coroutine function fetching the values of a group, returning results by value;
+                used if this lookup opens a new batch
+
+        Returns:
+            dict: Results of the values that were found, by value
+        """
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(group)
+        if batch is None:
+            batch = self._pending[group] = _Batch(fetch)
+            batch.timer = loop.call_later(self.window, self._flush, group, batch)
+
+        future = loop.create_future()
+        batch.values.update(dict.fromkeys(values))
+        batch.waiters.append(future)
+        self.lookups += 1
+        if len(batch.values) >= max_size:
+            batch.timer.cancel()
+            self._flush(group, batch)
+
+        found = await future
+        return {value: found[value] for value in values if value in found}
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return batching counters.
+
+        Returns:
+            dict: Lookups submitted and batches sent
+        """
+        return {'lookups': self.lookups, 'batches': self.batches}
+
+    def _flush(self, group: Hashable, batch: _Batch):
+        """Close a batch to new lookups and fetch it."""
+        if self._pending.get(group) is batch:
+            del self._pending[group]
+        self.batches += 1
+        task = asyncio.ensure_future(self._send(group, batch))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, group: Hashable, batch: _Batch):
+        """Fetch a batch and hand every waiting lookup the results, or the error."""
+        try:
+            found = await batch.fetch(group, list(batch.values))
+        except BaseException as e:
+            for future in batch.waiters:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future in batch.waiters:
+            if not future.done():
+                future.set_result(found)
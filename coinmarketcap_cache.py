@@ -0,0 +1,168 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+# Seconds a response stays fresh, matching how often CoinMarketCap refreshes each endpoint
+DEFAULT_TTLS = {
+    '/v1/cryptocurrency/listings/latest': 60,
+    '/v1/cryptocurrency/quotes/latest': 60,
+    '/v2/cryptocurrency/info': 86400,
+    '/v1/global-metrics/quotes/latest': 300
+}
+
+
+class ResponseCache:
+    """
+    Thread-safe TTL cache for API responses with LRU eviction.
+
+    Entries are keyed by endpoint plus normalized params and expire after the
+    TTL configured for their endpoint. The cache is bounded both by entry count
+    and by the total size of the cached payloads.
+    """
+
+    def __init__(
+        self,
+        ttls: Optional[Dict[str, float]] = None,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            ttls (dict): Per-endpoint TTL overrides in seconds; 0 disables caching for an endpoint
+            max_entries (int): Maximum number of cached responses
+            max_bytes (int): Maximum total size of cached responses in bytes
+        """
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+
+        self._entries: 'OrderedDict[str, Tuple[float, int, Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(endpoint: str, params: Optional[Dict] = None) -> str:
+        """
+        Build the cache key for a request.
+
+        Args:
+            endpoint (str): API endpoint path
+            params (dict): Query parameters
+
+        Returns:
+            str: Key that is identical for equivalent requests
+        """
+        normalized = []
+        for key, value in sorted((params or {}).items()):
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple)):
+                value = ','.join(str(v) for v in value)
+            normalized.append(f'{key}={value}')
+        return endpoint + '?' + '&'.join(normalized)
+
+    def ttl_for(self, endpoint: str) -> float:
+        """Return the TTL in seconds configured for an endpoint."""
+        return float(self.ttls.get(endpoint, 0))
+
+    def get(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
+        """
+        Look up a fresh cached response.
+
+        Args:
+            endpoint (str): API endpoint path
+            params (dict): Query parameters
+
+        Returns:
+            dict: Cached response, or None on a miss
+        """
+        key = self.make_key(endpoint, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def get_stale(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response even if it has expired.
+
+        Used as a fallback while the API is unavailable. Does not count as a hit or miss.
+
+        Args:
+            endpoint (str): API endpoint path
+            params (dict): Query parameters
+
+        Returns:
+            dict: Cached response, or None if it was never cached or has been evicted
+        """
+        key = self.make_key(endpoint, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[2] if entry is not None else None
+
+    def put(self, endpoint: str, params: Optional[Dict], response: Dict[str, Any], size: Optional[int] = None):
+        """
+        Store a response.
+
+        Args:
+            endpoint (str): API endpoint path
+            params (dict): Query parameters
+            response (dict): Parsed API response
+            size (int): Payload size in bytes; estimated from the response when omitted
+        """
+        ttl = self.ttl_for(endpoint)
+        if ttl <= 0:
+            return
+        if size is None:
+            size = len(json.dumps(response))
+        if size > self.max_bytes:
+            return
+
+        key = self.make_key(endpoint, params)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (time.monotonic() + ttl, size, response)
+            self.bytes += size
+
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all cached responses."""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return cache counters.
+
+        Returns:
+            dict: Hits, misses, evictions, entry count and cached bytes
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.bytes
+            }
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """
+    Collapses identical concurrent calls into one.
+
+    The first caller for a key runs the call; callers arriving while it is in
+    flight wait for it and share its result, or get its exception raised. In
+    flight calls are tracked as thread-safe futures, so blocking callers in
+    worker threads and coroutines on the event loop wait for the same call.
+    """
+
+    def __init__(self):
+        """Initialize the in-flight table and counters."""
+        self.calls = 0
+        self.coalesced = 0
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        """Return the future of the call in flight for a key, and whether the caller has to run it."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            self.calls += 1
+            return future, True
+
+    def _finish(self, key: str, future: Future, result: Any = None, error: BaseException = None):
+        """Publish the outcome of a call to its waiters; later callers start a new call."""
+        with self._lock:
+            del self._in_flight[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Run a blocking call, unless an identical one is in flight.
+
+        Args:
+            key (str): Identifies identical calls
+            fn (callable): Makes the call
+
+        Returns:
+            Any: Result of the call
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run a coroutine call, unless an identical one is in flight.
+
+        Args:
+            key (str): Identifies identical calls
+            fn (callable): Coroutine function making the call
+
+        Returns:
+            Any: Result of the call
+        """
+        future, leader = self._join(key)
+        if not leader:
+            # Shielded, so a cancelled waiter does not cancel the call the others wait for
+            return await asyncio.shield(asyncio.wrap_future(future))
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return coalescing counters.
+
+        Returns:
+            dict: Calls made, calls served by another in-flight call, and calls in flight
+        """
+        with self._lock:
+            return {'calls': self.calls, 'coalesced': self.coalesced, 'in_flight': len(self._in_flight)}
@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+
+class QueryCost:
+    """API usage attributed to one SQL query."""
+
+    __slots__ = ('query', 'started_at', 'duration_ms', 'calls', 'credits', 'cache_hits', 'bytes', 'endpoints', 'error')
+
+    def __init__(self, query: str):
+        self.query = query
+        self.started_at = datetime.now(timezone.utc)
+        self.duration_ms = 0.0
+        self.calls = 0
+        self.credits = 0
+        self.cache_hits = 0
+        self.bytes = 0
+        self.endpoints: Dict[str, int] = {}
+        self.error: Optional[str] = None
+
+    def as_record(self) -> Dict:
+        """Return the cost as a flat record; endpoints are listed as `endpoint:calls`."""
+        record = {name: getattr(self, name) for name in self.__slots__}
+        record['endpoints'] = ','.join(f'{endpoint}:{calls}' for endpoint, calls in self.endpoints.items())
+        return record
+
+
+# Cost of the query the current thread or task is running for, if any
+_current: ContextVar[Optional[QueryCost]] = ContextVar('coinmarketcap_query_cost', default=None)
+
+
+class CostLedger:
+    """
+    Bounded history of what each SQL query cost in API calls and credits.
+
+    The query being run is tracked in a context variable, which follows it
+    into the coroutines and tasks it starts, so calls are attributed to the
+    query that made them. A call shared by several queries, through request
+    coalescing or micro-batching, is charged to the query that sent it.
+    Calls made outside a query, e.g. by the background refresher, are not
+    recorded. Only the latest `max_queries` queries are kept.
+    """
+
+    def __init__(self, max_queries: int = 1000):
+        """
+        Initialize the ledger.
+
+        Args:
+            max_queries (int): Number of queries kept
+        """
+        self._queries: deque = deque(maxlen=max_queries)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, query: str) -> Iterator[QueryCost]:
+        """
+        Attribute the API usage within the block to a query.
+
+        Nested blocks are attributed to the outermost query.
+
+        Args:
+            query (str): SQL text of the query
+        """
+        cost = _current.get()
+        if cost is not None:
+            yield cost
+            return
+
+        cost = QueryCost(query)
+        token = _current.set(cost)
+        started = time.perf_counter()
+        try:
+            yield cost
+        except Exception as e:
+            cost.error = str(e)
+            raise
+        finally:
+            _current.reset(token)
+            cost.duration_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._queries.append(cost)
+
+    @staticmethod
+    def record_call(endpoint: str, credits: int, size: int):
+        """
+        Charge an API call to the current query.
+
+        Args:
+            endpoint (str): API endpoint path
+            credits (int): Credits the API charged for the call
+            size (int): Response size in bytes
+        """
+        cost = _current.get()
+        if cost is None:
+            return
+        cost.calls += 1
+        cost.credits += credits
+        cost.bytes += size
+        cost.endpoints[endpoint] = cost.endpoints.get(endpoint, 0) + 1
+
+    @staticmethod
+    def record_cache_hit():
+        """Count a response served without calling the API for the current query."""
+        cost = _current.get()
+        if cost is not None:
+            cost.cache_hits += 1
+
+    def records(self) -> List[Dict]:
+        """
+        Return the recorded queries, oldest first.
+
+        Returns:
+            list: Flat records, see QueryCost.as_record()
+        """
+        with self._lock:
+            queries = list(self._queries)
+        return [cost.as_record() for cost in queries]
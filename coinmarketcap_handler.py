@@ -1,6 +1,13 @@
 
+import asyncio
+import json
+import os
+import tempfile
+import time
+import aiohttp
 import requests
-from typing import Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+from typing import Callable, Optional, Dict, Any, List, Tuple
 from mindsdb.integrations.libs.api_handler import APIHandler
 from mindsdb.integrations.libs.response import (
     HandlerStatusResponse as StatusResponse,
@@ -9,11 +16,30 @@ from mindsdb.integrations.libs.response import (
 )
 from mindsdb.utilities import log
 from mindsdb_sql_parser import parse_sql
+from mindsdb_sql_parser.ast.base import ASTNode
+from .coinmarketcap_async import AsyncTransport, run_sync
+from .coinmarketcap_cache import ResponseCache
+from .coinmarketcap_coalesce import SingleFlight
+from .coinmarketcap_costs import CostLedger
+from .coinmarketcap_index import SymbolIndex
+from .coinmarketcap_metrics import LatencyMetrics, measuring_round_trip, record_round_trip
+from .coinmarketcap_store import HistoryStore
+from .coinmarketcap_rate_limiter import RateLimiter
+from .coinmarketcap_refresher import SNAPSHOT_ENDPOINTS, SnapshotRefresher
+from .coinmarketcap_resilience import RETRY_STATUS_CODES, CircuitBreaker, CircuitOpenError, RetryPolicy
+from .coinmarketcap_shared import shared
+from .coinmarketcap_tracing import SPAN_KIND_CLIENT, Tracer, params_hash, span, tracing
 from .coinmarketcap_tables import (
+    AdaptivePageSize,
     CryptocurrencyQuotesTable,
+    CryptocurrencyQuotesHistoricalTable,
+    CryptocurrencyOHLCVTable,
     CryptocurrencyListingsTable,
     CryptocurrencyInfoTable,
-    GlobalMetricsTable
+    GlobalMetricsTable,
+    UsageTable,
+    QueryCostsTable,
+    HandlerStatsTable
 )
 
 logger = log.getLogger(__name__)
@@ -51,11 +77,157 @@ class CoinMarketCapHandler(APIHandler):
         if self.api_key:
             self.headers['X-CMC_PRO_API_KEY'] = self.api_key
         
+        # HTTP transport
+        self.pool_size = int(connection_data.get('pool_size', 10))
+        self.keep_alive = connection_data.get('keep_alive', True)
+        self.timeout = (
+            float(connection_data.get('connect_timeout', 5)),
+            float(connection_data.get('read_timeout', 30))
+        )
+        if not self.keep_alive:
+            self.headers['Connection'] = 'close'
+        
+        # Latency histograms of API calls and table selects, off unless requested
+        self.metrics = LatencyMetrics(enabled=bool(connection_data.get('latency_metrics', False)))
+        
+        self.session = self._create_session()
+        self.async_transport = AsyncTransport(
+            pool_size=self.pool_size,
+            timeout=self.timeout,
+            max_concurrency=int(connection_data.get('max_concurrency', 8)),
+            keep_alive=self.keep_alive,
+            timed=self.metrics.enabled
+        )
+        
+        # Batching
+        self.symbol_batch_size = int(connection_data.get('symbol_batch_size', 100))
+        self.id_batch_size = int(connection_data.get('id_batch_size', 500))
+        self.historical_window_points = int(connection_data.get('historical_window_points', 10000))
+        self.historical_interval = str(connection_data.get('historical_interval', 'daily')).lower()
+        self.quote_batch_window = float(connection_data.get('quote_batch_window_ms', 5)) / 1000
+        self.listings_page_size = AdaptivePageSize(
+            initial=int(connection_data.get('listings_page_size', 1000)),
+            target_seconds=float(connection_data.get('listings_page_target_seconds', 1.0))
+        )
+        
+        # Quote currencies
+        convert = connection_data.get('convert', 'USD')
+        self.convert = [currency.strip().upper() for currency in (
+            convert.split(',') if isinstance(convert, str) else convert
+        ) if currency.strip()] or ['USD']
+        self.max_convert = int(connection_data.get('max_convert', 1))
+        self.quote_format = str(connection_data.get('quote_format', 'wide')).lower()
+        
+        # Local state persisted across handler instances
+        self.storage_dir = connection_data.get('storage_dir') or os.path.join(
+            tempfile.gettempdir(), 'mindsdb_coinmarketcap'
+        )
+        
+        # Symbol index resolving symbols and slugs to ids
+        self.symbol_index = None
+        if connection_data.get('symbol_index', True):
+            self.symbol_index = SymbolIndex(
+                os.path.join(self.storage_dir, 'sandbox_map.npy' if self.is_sandbox else 'map.npy'),
+                max_age=float(connection_data.get('symbol_index_max_age', 86400))
+            )
+        
+        # History already fetched by time-series tables, opened on first use
+        self.history_store_path = None
+        if connection_data.get('history_store', True):
+            self.history_store_path = os.path.join(
+                self.storage_dir, 'sandbox_history' if self.is_sandbox else 'history'
+            )
+        self._history_store = None
+        
+        # Response cache, shared by the handlers of the key with the same cache settings
+        cache_ttl = connection_data.get('cache_ttl') or {}
+        cache_max_entries = int(connection_data.get('cache_max_entries', 1024))
+        cache_max_bytes = int(connection_data.get('cache_max_bytes', 64 * 1024 * 1024))
+        self.cache_scope = (
+            self.base_url, self.api_key, tuple(sorted(cache_ttl.items())), cache_max_entries, cache_max_bytes
+        )
+        self.cache = shared(
+            'response_cache',
+            self.cache_scope,
+            lambda: ResponseCache(ttls=cache_ttl, max_entries=cache_max_entries, max_bytes=cache_max_bytes)
+        )
+        
+        # Identical requests in flight at the same time share one API call, across every handler of the key
+        self.single_flight = shared('single_flight', (self.base_url, self.api_key), SingleFlight)
+        
+        # Snapshots of hot requests kept fresh in the background, started by connect()
+        self.background_refresh = connection_data.get('background_refresh', False)
+        refresh_tables = connection_data.get('refresh_tables', 'listings,quotes,global_metrics')
+        if isinstance(refresh_tables, str):
+            refresh_tables = refresh_tables.split(',')
+        self.refresher = SnapshotRefresher(
+            fetch=self._fetch_snapshot,
+            ttl_for=self.cache.ttl_for,
+            endpoints=[
+                endpoint
+                for table in refresh_tables
+                for endpoint in SNAPSHOT_ENDPOINTS.get(table.strip().lower(), ())
+            ],
+            max_staleness=float(connection_data.get('refresh_max_staleness', 600))
+        )
+        
+        # Health checks, answered from recent successful responses when possible
+        self.health_check_interval = float(connection_data.get('health_check_interval', 60))
+        self._last_success = float('-inf')
+        self._health: Optional[Tuple[float, StatusResponse]] = None
+        
+        # API usage of recent queries, by every handler of the key
+        query_cost_history = int(connection_data.get('query_cost_history', 1000))
+        self.query_costs = shared(
+            'query_costs',
+            (self.base_url, self.api_key, query_cost_history),
+            lambda: CostLedger(max_queries=query_cost_history)
+        )
+        
+        # Spans of every query appended to a local trace file, off unless requested
+        trace_file = None
+        if connection_data.get('trace', False):
+            trace_file = connection_data.get('trace_file') or os.path.join(self.storage_dir, 'traces.jsonl')
+        self.tracer = Tracer(trace_file, service_name=f'mindsdb-coinmarketcap-{name}')
+        
+        # Plan limits, counted for the key across handler instances; the latest settings apply
+        requests_per_minute = connection_data.get('requests_per_minute', 30)
+        daily_credit_limit = connection_data.get('daily_credit_limit')
+        monthly_credit_limit = connection_data.get('monthly_credit_limit')
+        limits = {
+            'requests_per_minute': int(requests_per_minute) if requests_per_minute else None,
+            'daily_credit_limit': int(daily_credit_limit) if daily_credit_limit is not None else None,
+            'monthly_credit_limit': int(monthly_credit_limit) if monthly_credit_limit is not None else None
+        }
+        self.rate_limiter = shared('rate_limiter', (self.base_url, self.api_key), lambda: RateLimiter(**limits))
+        self.rate_limiter.set_limits(**limits)
+        
+        # Failure handling
+        self.retry_policy = RetryPolicy(
+            max_retries=int(connection_data.get('max_retries', 3)),
+            backoff_base=float(connection_data.get('retry_backoff_base', 0.5)),
+            backoff_max=float(connection_data.get('retry_backoff_max', 30))
+        )
+        self.circuit_breaker = CircuitBreaker(
+            failure_threshold=int(connection_data.get('circuit_failure_threshold', 5)),
+            reset_timeout=float(connection_data.get('circuit_reset_timeout', 30))
+        )
+        
         # Register available tables
         self._register_table('quotes', CryptocurrencyQuotesTable(self))
+        self._register_table('quotes_historical', CryptocurrencyQuotesHistoricalTable(self))
+        self._register_table('ohlcv', CryptocurrencyOHLCVTable(self))
         self._register_table('listings', CryptocurrencyListingsTable(self))
         self._register_table('info', CryptocurrencyInfoTable(self))
         self._register_table('global_metrics', GlobalMetricsTable(self))
+        self._register_table('usage', UsageTable(self))
+        self._register_table('query_costs', QueryCostsTable(self))
+        self._register_table('handler_stats', HandlerStatsTable(self))
+    
+    def _register_table(self, table_name: str, table_class: Any):
+        """Register a table, letting it know the name its latency is recorded under."""
+        table_class.name = table_name.lower()
+        super()._register_table(table_name, table_class)
         
     def connect(self) -> StatusResponse:
         """
@@ -64,25 +236,69 @@ class CoinMarketCapHandler(APIHandler):
         Returns:
             HandlerStatusResponse
         """
+        status = self._check_health()
+        self.is_connected = status.success
+        if status.success and self.background_refresh:
+            self.refresher.start()
+        return status
+    
+    def _check_health(self) -> StatusResponse:
+        """
+        Check the API is reachable and the key is valid, without spending credits.
+        
+        A successful API response within the last `health_check_interval`
+        seconds proves health on its own. Otherwise /v1/key/info, which is not
+        billed, is called, and its outcome is reused for the same interval. The
+        credits it reports as used are charged against the credit budget, so
+        the budget also covers usage from before a restart or other clients.
+        
+        Returns:
+            HandlerStatusResponse
+        """
+        now = time.monotonic()
+        if now - self._last_success < self.health_check_interval:
+            return StatusResponse(True)
+        if self._health is not None and now - self._health[0] < self.health_check_interval:
+            return self._health[1]
+        
         try:
-            # Test connection by making a simple API call
-            response = self.call_coinmarketcap_api('/v1/global-metrics/quotes/latest')
+            response = self.call_coinmarketcap_api('/v1/key/info')
             if response.get('status', {}).get('error_code') == 0:
-                self.is_connected = True
-                return StatusResponse(True)
+                usage = (response.get('data') or {}).get('usage') or {}
+                self.rate_limiter.seed_credits(
+                    int((usage.get('current_day') or {}).get('credits_used') or 0),
+                    int((usage.get('current_month') or {}).get('credits_used') or 0)
+                )
+                status = StatusResponse(True)
             else:
-                self.is_connected = False
                 error_msg = response.get('status', {}).get('error_message', 'Unknown error')
-                return StatusResponse(False, f"Connection failed: {error_msg}")
+                status = StatusResponse(False, f"Connection failed: {error_msg}")
         except Exception as e:
-            self.is_connected = False
             logger.error(f"Error connecting to CoinMarketCap: {e}")
-            return StatusResponse(False, f"Connection failed: {str(e)}")
+            status = StatusResponse(False, f"Connection failed: {str(e)}")
+        
+        self._health = (time.monotonic(), status)
+        return status
+    
+    def disconnect(self):
+        """
+        Close pooled connections held by the handler.
+        """
+        self.refresher.stop()
+        self.tracer.close()
+        self.session.close()
+        self.async_transport.close()
+        if self._history_store is not None:
+            self._history_store.close()
+            self._history_store = None
+        self.is_connected = False
     
     def check_connection(self) -> StatusResponse:
         """
         Check if the connection is alive and healthy.
         
+        Cheap enough to be probed often: see _check_health().
+        
         Returns:
             HandlerStatusResponse
         """
@@ -98,13 +314,77 @@ class CoinMarketCapHandler(APIHandler):
         Returns:
             HandlerResponse
         """
-        ast = parse_sql(query, dialect='mindsdb')
-        return self.query(ast)
+        with self.query_costs.track(query), self.tracer.span('native_query', **{'db.statement': query}):
+            with span('parse'):
+                ast = parse_sql(query, dialect='mindsdb')
+            return self.query(ast)
+    
+    def query(self, query: ASTNode) -> Response:
+        """
+        Run a parsed query, recording the API usage it causes in `query_costs`.
+        
+        When tracing, the query gets a span of its own, the root of its trace
+        unless native_query() started one.
+        
+        Args:
+            query (ASTNode): Parsed query
+            
+        Returns:
+            HandlerResponse
+        """
+        statement = str(query)
+        with self.query_costs.track(statement), self.tracer.span('query', **{'db.statement': statement}):
+            return super().query(query)
+    
+    def prometheus_metrics(self) -> str:
+        """
+        Dump the latency histograms in the Prometheus text exposition format.
+        
+        Empty unless the handler was created with `latency_metrics` enabled.
+        
+        Returns:
+            str: Metrics text, e.g. to serve to a Prometheus scraper
+        """
+        return self.metrics.to_prometheus()
+    
+    @property
+    def history_store(self) -> Optional[HistoryStore]:
+        """The local history store, or None if it is disabled."""
+        if self._history_store is None and self.history_store_path is not None:
+            self._history_store = HistoryStore(self.history_store_path)
+        return self._history_store
+    
+    def _create_session(self) -> requests.Session:
+        """
+        Create the pooled HTTP session used for all API calls.
+        
+        The session is shared by concurrent select() calls. Its state is never
+        mutated after creation; headers and timeouts are passed per request,
+        and urllib3's connection pool handles thread-safe connection reuse.
+        
+        Returns:
+            requests.Session
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            pool_block=True
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
     
     def call_coinmarketcap_api(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
         """
         Call CoinMarketCap API endpoint.
         
+        Successful responses are served from the response cache while fresh.
+        Identical calls already in flight are waited for instead of being sent
+        again. Calls that reach the API are paced by the rate limiter, and the
+        credits they are charged are recorded against the plan budget. While the
+        circuit breaker is open, the last cached response is served if there is one.
+        
         Args:
             endpoint (str): API endpoint path
             params (dict): Optional query parameters
@@ -112,15 +392,291 @@ class CoinMarketCapHandler(APIHandler):
         Returns:
             dict: API response data
         """
-        url = self.base_url + endpoint
-        
+        cached = self._get_cached(endpoint, params)
+        if cached is not None:
+            return cached
+        return self.single_flight.do(
+            ResponseCache.make_key(endpoint, params), lambda: self._call_api(endpoint, params)
+        )
+    
+    def _call_api(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        """Send a call to the API and process its response."""
         try:
-            response = requests.get(url, headers=self.headers, params=params or {})
-            response.raise_for_status()
-            return response.json()
+            response = self._send_request(endpoint, params)
+            return self._process_response(endpoint, params, self._decode(endpoint, response.json), len(response.content))
         except requests.exceptions.RequestException as e:
             logger.error(f"API request failed: {e}")
             raise
         except Exception as e:
             logger.error(f"Unexpected error in API call: {e}")
             raise
+    
+    async def acall_coinmarketcap_api(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        """
+        Call CoinMarketCap API endpoint without blocking the event loop.
+        
+        Same semantics as call_coinmarketcap_api(), sent through the async transport
+        so that many calls can be in flight at once.
+        
+        Args:
+            endpoint (str): API endpoint path
+            params (dict): Optional query parameters
+            
+        Returns:
+            dict: API response data
+        """
+        cached = self._get_cached(endpoint, params)
+        if cached is not None:
+            return cached
+        return await self.single_flight.ado(
+            ResponseCache.make_key(endpoint, params), lambda: self._acall_api(endpoint, params)
+        )
+    
+    async def _acall_api(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        """Async counterpart of _call_api()."""
+        try:
+            body = await self._asend_request(endpoint, params)
+            return self._process_response(endpoint, params, self._decode(endpoint, lambda: json.loads(body)), len(body))
+        except (requests.exceptions.RequestException, aiohttp.ClientError) as e:
+            logger.error(f"API request failed: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error in API call: {e}")
+            raise
+    
+    async def afetch_all(self, calls: List[Tuple[str, Optional[Dict]]]) -> List[Dict[str, Any]]:
+        """
+        Run several API calls concurrently.
+        
+        Concurrency is capped by the transport and paced by the rate limiter.
+        
+        Args:
+            calls (list): (endpoint, params) pairs
+            
+        Returns:
+            list: API responses in the order of `calls`
+        """
+        return await asyncio.gather(
+            *(self.acall_coinmarketcap_api(endpoint, params) for endpoint, params in calls)
+        )
+    
+    def fetch_all(self, calls: List[Tuple[str, Optional[Dict]]]) -> List[Dict[str, Any]]:
+        """
+        Blocking counterpart of afetch_all().
+        
+        Args:
+            calls (list): (endpoint, params) pairs
+            
+        Returns:
+            list: API responses in the order of `calls`
+        """
+        return run_sync(self.afetch_all(calls))
+    
+    def _get_cached(self, endpoint: str, params: Optional[Dict]) -> Optional[Dict[str, Any]]:
+        """
+        Return a cached response if the API should not be called.
+        
+        Returns:
+            dict: Background snapshot, fresh cached response, a stale one while the circuit breaker is open, or None
+        """
+        hashed = params_hash(endpoint, params) if tracing() else None
+        with span('cache_lookup', endpoint=endpoint, params_hash=hashed) as lookup:
+            snapshot = self.refresher.get(endpoint, params)
+            if snapshot is not None:
+                self.query_costs.record_cache_hit()
+                lookup.set('cache.result', 'snapshot')
+                return snapshot
+            
+            cached = self.cache.get(endpoint, params)
+            if cached is not None:
+                self.query_costs.record_cache_hit()
+                lookup.set('cache.result', 'fresh')
+                return cached
+            
+            if not self.circuit_breaker.allow():
+                stale = self.cache.get_stale(endpoint, params)
+                if stale is not None:
+                    logger.warning(f"Circuit breaker open, serving cached response for {endpoint}")
+                    self.query_costs.record_cache_hit()
+                    lookup.set('cache.result', 'stale')
+                    return stale
+                raise CircuitOpenError(
+                    f"CoinMarketCap API is unavailable after repeated failures, "
+                    f"retrying in {self.circuit_breaker.retry_in():.0f}s"
+                )
+            lookup.set('cache.result', 'miss')
+            return None
+    
+    def _process_response(self, endpoint: str, params: Optional[Dict], data: Dict[str, Any], size: int) -> Dict[str, Any]:
+        """
+        Record the credits charged for a response and cache it if it succeeded.
+        
+        Returns:
+            dict: The response data
+        """
+        credits = data.get('status', {}).get('credit_count') or 0
+        self.rate_limiter.record_credits(credits)
+        self.query_costs.record_call(endpoint, credits, size)
+        if data.get('status', {}).get('error_code', 0) == 0:
+            self._last_success = time.monotonic()
+            self.cache.put(endpoint, params, data, size)
+            self.refresher.put(endpoint, params, data)
+        return data
+    
+    def _fetch_snapshot(self, endpoint: str, params: Optional[Dict]) -> Dict[str, Any]:
+        """
+        Call the API for the background refresher, bypassing snapshots and the response cache.
+        
+        Args:
+            endpoint (str): API endpoint path
+            params (dict): Query parameters
+            
+        Returns:
+            dict: API response data
+        """
+        if not self.circuit_breaker.allow():
+            raise CircuitOpenError(f"CoinMarketCap API is unavailable, retrying in {self.circuit_breaker.retry_in():.0f}s")
+        response = self._send_request(endpoint, params)
+        return self._process_response(endpoint, params, self._decode(endpoint, response.json), len(response.content))
+    
+    def _decode(self, endpoint: str, parse: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Parse a JSON response body with `parse`, timing it when latency metrics are enabled."""
+        with span('decode', endpoint=endpoint):
+            if not self.metrics.enabled:
+                return parse()
+            started = time.perf_counter()
+            data = parse()
+            self.metrics.observe(endpoint, 'decode', time.perf_counter() - started)
+            return data
+    
+    def _retry_delay(self, endpoint: str, attempt: int, error: Exception, retry_after: Optional[float]) -> float:
+        """
+        Decide whether a failed attempt is retried.
+        
+        Returns:
+            float: Seconds to wait before the next attempt
+            
+        Raises:
+            Exception: `error`, once no retries are left
+        """
+        delay = self.retry_policy.delay(attempt, retry_after)
+        if delay is None:
+            self.circuit_breaker.record_failure()
+            raise error
+        
+        self.retry_policy.record_retry()
+        logger.warning(f"Retrying {endpoint} in {delay:.2f}s (attempt {attempt + 1}): {error}")
+        return delay
+    
+    @staticmethod
+    def _http_span(endpoint: str, params: Optional[Dict], attempt: int):
+        """Span of one HTTP attempt; a no-op unless the current query is traced."""
+        return span(
+            f'GET {endpoint}', SPAN_KIND_CLIENT,
+            endpoint=endpoint,
+            params_hash=params_hash(endpoint, params) if tracing() else None,
+            **{'http.request.method': 'GET', 'http.request.resend_count': attempt}
+        )
+    
+    def _send_request(self, endpoint: str, params: Optional[Dict] = None) -> requests.Response:
+        """
+        Send a GET request, retrying throttled and transient failures.
+        
+        Args:
+            endpoint (str): API endpoint path
+            params (dict): Optional query parameters
+            
+        Returns:
+            requests.Response: Successful response
+        """
+        url = self.base_url + endpoint
+        attempt = 0
+        
+        try:
+            while True:
+                self.rate_limiter.acquire()
+                retry_after = None
+                try:
+                    started = time.perf_counter() if self.metrics.enabled else 0.0
+                    with self._http_span(endpoint, params, attempt) as request:
+                        response = self.session.get(
+                            url,
+                            headers=self.headers,
+                            params=params or {},
+                            timeout=self.timeout
+                        )
+                        request.set('http.response.status_code', response.status_code)
+                        request.set('http.response.body.size', len(response.content))
+                    if self.metrics.enabled:
+                        # requests sets `elapsed` once the headers are in, before reading the body
+                        ttfb = response.elapsed.total_seconds()
+                        self.metrics.observe_call(
+                            endpoint, {'ttfb': ttfb, 'download': time.perf_counter() - started - ttfb}
+                        )
+                    if response.status_code in RETRY_STATUS_CODES:
+                        retry_after = RetryPolicy.parse_retry_after(response.headers.get('Retry-After'))
+                        error = requests.exceptions.HTTPError(
+                            f"{response.status_code} Error for url: {response.url}",
+                            response=response
+                        )
+                    else:
+                        self.circuit_breaker.record_success()
+                        response.raise_for_status()
+                        return response
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    error = e
+                
+                time.sleep(self._retry_delay(endpoint, attempt, error, retry_after))
+                attempt += 1
+        except BaseException:
+            # Any other way out, e.g. a truncated body or a cancelled task, must not leave a probe half-open
+            self.circuit_breaker.abort_probe()
+            raise
+    
+    async def _asend_request(self, endpoint: str, params: Optional[Dict] = None) -> bytes:
+        """
+        Async counterpart of _send_request().
+        
+        Args:
+            endpoint (str): API endpoint path
+            params (dict): Optional query parameters
+            
+        Returns:
+            bytes: Body of the successful response
+        """
+        url = self.base_url + endpoint
+        attempt = 0
+        
+        try:
+            while True:
+                wait = self.rate_limiter.reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                retry_after = None
+                try:
+                    timings = {} if self.metrics.enabled or measuring_round_trip() else None
+                    with self._http_span(endpoint, params, attempt) as request:
+                        status, headers, body = await self.async_transport.get(url, self.headers, params, timings)
+                        request.set('http.response.status_code', status)
+                        request.set('http.response.body.size', len(body))
+                    if timings:
+                        record_round_trip(timings)
+                        if self.metrics.enabled:
+                            self.metrics.observe_call(endpoint, timings)
+                    if status in RETRY_STATUS_CODES:
+                        retry_after = RetryPolicy.parse_retry_after(headers.get('Retry-After'))
+                        error = requests.exceptions.HTTPError(f"{status} Error for url: {url}")
+                    else:
+                        self.circuit_breaker.record_success()
+                        if status >= 400:
+                            raise requests.exceptions.HTTPError(f"{status} Error for url: {url}")
+                        return body
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    error = e
+                
+                await asyncio.sleep(self._retry_delay(endpoint, attempt, error, retry_after))
+                attempt += 1
+        except BaseException:
+            # Any other way out, e.g. a truncated body or a cancelled task, must not leave a probe half-open
+            self.circuit_breaker.abort_probe()
+            raise
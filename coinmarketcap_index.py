@@ -0,0 +1,233 @@
+import asyncio
+import os
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from mindsdb.utilities import log
+
+logger = log.getLogger(__name__)
+
+
+MAP_ENDPOINT = '/v1/cryptocurrency/map'
+
+# Largest page the map endpoint serves
+MAP_PAGE_SIZE = 5000
+
+# Sorts after every real rank, so unranked coins lose symbol collisions
+_UNRANKED = np.iinfo(np.int32).max
+
+
+class SymbolIndex:
+    """
+    Local index of every coin in /v1/cryptocurrency/map.
+
+    Symbols are not unique on CoinMarketCap, so queries are resolved to ids
+    through this index. The index is a numpy structured array sorted by
+    symbol, with the best candidate for each symbol (active first, then best
+    rank) first. It is persisted with np.save and memory-mapped on load, so a
+    new handler starts without downloading or parsing the map again. The map
+    is downloaded again once the file is older than `max_age`; after a failed
+    download, the stale index is used for `retry_after` seconds before the
+    next attempt.
+    """
+
+    def __init__(self, path: str, max_age: float = 86400, retry_after: float = 300):
+        """
+        Initialize the index.
+
+        Args:
+            path (str): File the index is persisted to
+            max_age (float): Seconds after which the index is downloaded again
+            retry_after (float): Seconds to wait after a failed download before trying again
+        """
+        self.path = path
+        self.max_age = max_age
+        self.retry_after = retry_after
+        self._array: Optional[np.ndarray] = None
+        self._built_at = 0.0
+        self._retry_at = 0.0
+        self._slugs: Optional[Dict[str, int]] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def __len__(self) -> int:
+        return 0 if self._array is None else len(self._array)
+
+    def is_fresh(self) -> bool:
+        """Return True when the index is loaded and younger than `max_age`."""
+        return self._array is not None and time.time() - self._built_at < self.max_age
+
+    def load(self) -> bool:
+        """
+        Memory-map the persisted index, if there is one.
+
+        Returns:
+            bool: True if an index was loaded
+        """
+        try:
+            array = np.load(self.path, mmap_mode='r')
+            built_at = os.path.getmtime(self.path)
+        except (OSError, ValueError) as e:
+            if os.path.exists(self.path):
+                logger.warning(f"Could not load the CoinMarketCap symbol index from {self.path}: {e}")
+            return False
+        self._array = array
+        self._built_at = built_at
+        self._slugs = None
+        return True
+
+    async def aensure(self, fetch: Callable[[str, Dict], Awaitable[Dict[str, Any]]]) -> bool:
+        """
+        Make sure a usable index is loaded, downloading it when missing or expired.
+
+        A failed download is logged and an expired index keeps being used,
+        without another download attempt for `retry_after` seconds.
+
+        Args:
+            fetch (callable): Coroutine function calling an API endpoint with params
+
+        Returns:
+            bool: True if an index is available
+        """
+        if self.is_fresh():
+            return True
+        if time.time() < self._retry_at:
+            return self._array is not None
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._array is None:
+                self.load()
+            if self.is_fresh() or time.time() < self._retry_at:
+                return self._array is not None
+            try:
+                await self.arefresh(fetch)
+            except Exception as e:
+                self._retry_at = time.time() + self.retry_after
+                logger.warning(f"Could not refresh the CoinMarketCap symbol index: {e}")
+        return self._array is not None
+
+    async def arefresh(self, fetch: Callable[[str, Dict], Awaitable[Dict[str, Any]]]):
+        """
+        Download the full map, persist it and load it.
+
+        Args:
+            fetch (callable): Coroutine function calling an API endpoint with params
+        """
+        records = []
+        start = 1
+        while True:
+            response = await fetch(MAP_ENDPOINT, {
+                'listing_status': 'active,inactive',
+                'aux': 'platform,is_active',
+                'start': start,
+                'limit': MAP_PAGE_SIZE
+            })
+            status = response.get('status', {})
+            if status.get('error_code', 0) != 0:
+                raise RuntimeError(status.get('error_message', 'Unknown error'))
+            page = response.get('data') or []
+            if not isinstance(page, list):
+                raise RuntimeError(f'Unexpected {MAP_ENDPOINT} response')
+            records.extend(page)
+            if len(page) < MAP_PAGE_SIZE:
+                break
+            start += MAP_PAGE_SIZE
+
+        if not records:
+            raise RuntimeError(f'{MAP_ENDPOINT} returned no coins')
+        self.save(self.build(records))
+        self.load()
+
+    def save(self, array: np.ndarray):
+        """Persist an index atomically, so concurrent readers never see a partial file."""
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npy')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def build(records: List[Dict]) -> np.ndarray:
+        """
+        Build the index array from map records.
+
+        Args:
+            records (list): Records from the `data` field of map responses
+
+        Returns:
+            np.ndarray: Structured array sorted by symbol, best candidate first
+        """
+        def encode(values):
+            return [(value or '').encode('utf-8') for value in values]
+
+        symbols = encode(str(record.get('symbol') or '').upper() for record in records)
+        slugs = encode(record.get('slug') for record in records)
+        addresses = encode((record.get('platform') or {}).get('token_address') for record in records)
+
+        array = np.zeros(len(records), dtype=[
+            ('id', np.int32),
+            ('rank', np.int32),
+            ('is_active', np.bool_),
+            ('symbol', f'S{max(map(len, symbols), default=1) or 1}'),
+            ('slug', f'S{max(map(len, slugs), default=1) or 1}'),
+            ('token_address', f'S{max(map(len, addresses), default=1) or 1}')
+        ])
+        array['id'] = [record.get('id') or 0 for record in records]
+        array['rank'] = [record.get('rank') or 0 for record in records]
+        array['is_active'] = [bool(record.get('is_active', 1)) for record in records]
+        array['symbol'] = symbols
+        array['slug'] = slugs
+        array['token_address'] = addresses
+
+        rank = np.where(array['rank'] > 0, array['rank'], _UNRANKED)
+        return array[np.lexsort((rank, ~array['is_active'], array['symbol']))]
+
+    def resolve_symbols(self, symbols: Iterable[str]) -> Tuple[List[int], List[str]]:
+        """
+        Resolve symbols to ids.
+
+        When several coins share a symbol, the active one with the best rank wins.
+
+        Args:
+            symbols (list): Symbols, in any case
+
+        Returns:
+            tuple: Ids in the order of `symbols`, and the upper-cased symbols the
+            index does not know, e.g. coins listed since it was downloaded
+        """
+        symbols = [str(symbol).upper() for symbol in symbols]
+        if not symbols:
+            return [], []
+        keys = self._array['symbol']
+        # Longer keys would be truncated by the fixed-width dtype and could match a different symbol
+        fits = np.array([len(symbol.encode('utf-8')) <= keys.dtype.itemsize for symbol in symbols])
+        needles = np.array([symbol.encode('utf-8') if fit else b'' for symbol, fit in zip(symbols, fits)], dtype=keys.dtype)
+        positions = np.minimum(np.searchsorted(keys, needles), len(keys) - 1)
+        found = fits & (keys[positions] == needles)
+        ids = [int(i) for i in self._array['id'][positions[found]]]
+        return ids, [symbol for symbol, hit in zip(symbols, found) if not hit]
+
+    def resolve_slugs(self, slugs: Iterable[str]) -> List[int]:
+        """
+        Resolve slugs to ids.
+
+        Args:
+            slugs (list): Slugs, e.g. `bitcoin`
+
+        Returns:
+            list: Ids in the order of `slugs`; unknown slugs are skipped
+        """
+        if self._slugs is None:
+            self._slugs = dict(zip(
+                (slug.decode('utf-8') for slug in self._array['slug']),
+                (int(i) for i in self._array['id'])
+            ))
+        return [self._slugs[slug] for slug in (str(slug).lower() for slug in slugs) if slug in self._slugs]
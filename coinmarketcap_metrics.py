@@ -0,0 +1,272 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+
+# Stages of an API call, recorded per endpoint
+CALL_STAGES = ('connect', 'ttfb', 'download', 'decode')
+
+# Stages of a table select, recorded per table
+SELECT_STAGES = ('extract', 'build', 'select')
+
+# Upper bounds of the histogram buckets in seconds; the last bucket is unbounded
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Latency distribution in fixed buckets, as Prometheus histograms keep it."""
+
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        """Add one measurement."""
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile by interpolating within its bucket.
+
+        Args:
+            q (float): Quantile between 0 and 1
+
+        Returns:
+            float: Estimated latency in seconds, at most the largest measurement
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKETS[index - 1] if index > 0 else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+
+# Table whose select is running in the current thread or task, while metrics are enabled
+_table: ContextVar[Optional[Tuple['LatencyMetrics', str]]] = ContextVar('coinmarketcap_metrics_table', default=None)
+
+
+def record_select_stage(stage: str, started: float):
+    """
+    Record a stage of the running table select, if it is being measured.
+
+    Args:
+        stage (str): One of SELECT_STAGES
+        started (float): time.perf_counter() at the start of the stage
+    """
+    current = _table.get()
+    if current is not None:
+        current[0].observe(current[1], stage, time.perf_counter() - started)
+
+
+def measuring_select() -> bool:
+    """True if the running table select is being measured."""
+    return _table.get() is not None
+
+
+class RoundTrip:
+    """
+    Context manager measuring the HTTP round trip of the API call made within it.
+
+    Only connection setup and the request on the wire count, not the waits for
+    the rate limiter or a free connection before it. `seconds` stays None when
+    no request was sent, e.g. the response came from the cache.
+    """
+
+    __slots__ = ('seconds', 'token')
+
+    def __init__(self):
+        self.seconds: Optional[float] = None
+
+    def __enter__(self) -> 'RoundTrip':
+        self.token = _round_trip.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _round_trip.reset(self.token)
+
+
+# Round trip measured for the API call made in the current thread or task
+_round_trip: ContextVar[Optional[RoundTrip]] = ContextVar('coinmarketcap_round_trip', default=None)
+
+
+def measuring_round_trip() -> bool:
+    """True if the API call made in the current thread or task is being measured."""
+    return _round_trip.get() is not None
+
+
+def record_round_trip(timings: Dict[str, float]):
+    """
+    Record the round trip of an API request, if it is being measured.
+
+    Args:
+        timings (dict): Seconds by stage, as filled in by the async transport
+    """
+    current = _round_trip.get()
+    if current is not None:
+        current.seconds = sum(timings.values())
+
+
+class LatencyMetrics:
+    """
+    Latency histograms of the handler's hot path.
+
+    API calls are measured per endpoint: connection setup, time to the first
+    byte of the response, body download and JSON decoding. Table selects are
+    measured per table: extracting the rows from the decoded records, building
+    the DataFrame, and the whole select. When disabled nothing is timed, and
+    callers skip their clock reads by checking `enabled` first.
+    """
+
+    def __init__(self, enabled: bool = False):
+        """
+        Initialize the metrics.
+
+        Args:
+            enabled (bool): Record measurements
+        """
+        self.enabled = enabled
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, scope: str, stage: str, seconds: float):
+        """
+        Record one measurement.
+
+        Args:
+            scope (str): Endpoint path or table name
+            stage (str): One of CALL_STAGES or SELECT_STAGES
+            seconds (float): Duration
+        """
+        key = (scope, stage)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def observe_call(self, endpoint: str, timings: Dict[str, float]):
+        """
+        Record the stages of an API call.
+
+        Args:
+            endpoint (str): API endpoint path
+            timings (dict): Seconds by stage, for the stages that were measured
+        """
+        for stage, seconds in timings.items():
+            self.observe(endpoint, stage, seconds)
+
+    def measure_select(self, table: str) -> '_SelectTimer':
+        """
+        Measure a table select, attributing the stages recorded within it to the table.
+
+        Args:
+            table (str): Table name
+
+        Returns:
+            _SelectTimer: Context manager timing the select
+        """
+        return _SelectTimer(self, table)
+
+    def records(self) -> List[Dict]:
+        """
+        Return a summary of every histogram.
+
+        Returns:
+            list: Records with the scope, stage, count and latency statistics in milliseconds
+        """
+        with self._lock:
+            return [
+                {
+                    'scope': scope,
+                    'stage': stage,
+                    'count': histogram.count,
+                    'total_ms': histogram.sum * 1000,
+                    'mean_ms': histogram.sum / histogram.count * 1000,
+                    'p50_ms': histogram.quantile(0.5) * 1000,
+                    'p90_ms': histogram.quantile(0.9) * 1000,
+                    'p99_ms': histogram.quantile(0.99) * 1000,
+                    'max_ms': histogram.max * 1000
+                }
+                for (scope, stage), histogram in sorted(self._histograms.items())
+            ]
+
+    def to_prometheus(self, prefix: str = 'coinmarketcap') -> str:
+        """
+        Dump the histograms in the Prometheus text exposition format.
+
+        Args:
+            prefix (str): Metric name prefix
+
+        Returns:
+            str: One `<prefix>_call_seconds` and one `<prefix>_select_seconds` histogram family
+        """
+        with self._lock:
+            histograms = sorted(
+                (scope, stage, list(histogram.counts), histogram.count, histogram.sum)
+                for (scope, stage), histogram in self._histograms.items()
+            )
+
+        lines = []
+        for family, label, stages, help_text in (
+            ('call_seconds', 'endpoint', CALL_STAGES, 'Latency of CoinMarketCap API calls by stage'),
+            ('select_seconds', 'table', SELECT_STAGES, 'Latency of table selects by stage')
+        ):
+            name = f'{prefix}_{family}'
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for scope, stage, counts, count, total in histograms:
+                if stage not in stages:
+                    continue
+                labels = f'{label}="{_escape(scope)}",stage="{stage}"'
+                cumulative = 0
+                for bound, bucket_count in zip(BUCKETS, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f'{name}_sum{{{labels}}} {total}')
+                lines.append(f'{name}_count{{{labels}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """Drop every measurement."""
+        with self._lock:
+            self._histograms.clear()
+
+
+class _SelectTimer:
+    """Context manager measuring a table select; see LatencyMetrics.measure_select()."""
+
+    __slots__ = ('metrics', 'table', 'token', 'started')
+
+    def __init__(self, metrics: LatencyMetrics, table: str):
+        self.metrics = metrics
+        self.table = table
+
+    def __enter__(self):
+        self.token = _table.set((self.metrics, self.table))
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.table, 'select', time.perf_counter() - self.started)
+        _table.reset(self.token)
+
+
+def _escape(value: str) -> str:
+    """Escape a Prometheus label value."""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,178 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+
+class CreditBudgetExceededError(Exception):
+    """Raised when the configured daily or monthly credit budget is used up."""
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter that also tracks API credit consumption.
+
+    The bucket holds one minute worth of requests and refills continuously, so
+    calls beyond the per-minute cap are queued behind each other instead of
+    being sent in bursts that CoinMarketCap answers with HTTP 429. Credits are
+    counted from the `status.credit_count` field of each response, and calls
+    fail fast once the daily or monthly budget is spent.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        daily_credit_limit: Optional[int] = None,
+        monthly_credit_limit: Optional[int] = None
+    ):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            requests_per_minute (int): Plan request cap per minute; None disables throttling
+            daily_credit_limit (int): Credits allowed per UTC day; None means unlimited
+            monthly_credit_limit (int): Credits allowed per UTC calendar month; None means unlimited
+        """
+        self.requests_per_minute = requests_per_minute
+        self.daily_credit_limit = daily_credit_limit
+        self.monthly_credit_limit = monthly_credit_limit
+
+        self._tokens = float(requests_per_minute or 0)
+        self._refilled_at = time.monotonic()
+
+        self._day = None
+        self._month = None
+        self.credits_today = 0
+        self.credits_this_month = 0
+        self.throttled = 0
+
+        self._lock = threading.Lock()
+
+    def _roll_periods(self):
+        now = datetime.now(timezone.utc)
+        day, month = now.date(), (now.year, now.month)
+        if day != self._day:
+            self._day = day
+            self.credits_today = 0
+        if month != self._month:
+            self._month = month
+            self.credits_this_month = 0
+
+    def _check_budget(self):
+        self._roll_periods()
+        if self.daily_credit_limit is not None and self.credits_today >= self.daily_credit_limit:
+            raise CreditBudgetExceededError(
+                f'Daily CoinMarketCap credit budget of {self.daily_credit_limit} is used up; '
+                'it resets at 00:00 UTC'
+            )
+        if self.monthly_credit_limit is not None and self.credits_this_month >= self.monthly_credit_limit:
+            raise CreditBudgetExceededError(
+                f'Monthly CoinMarketCap credit budget of {self.monthly_credit_limit} is used up'
+            )
+
+    def reserve(self) -> float:
+        """
+        Reserve a slot for one request.
+
+        Returns:
+            float: Seconds the caller must wait before sending the request
+
+        Raises:
+            CreditBudgetExceededError: If the credit budget is used up
+        """
+        with self._lock:
+            self._check_budget()
+            if not self.requests_per_minute:
+                return 0.0
+
+            now = time.monotonic()
+            rate = self.requests_per_minute / 60.0
+            self._tokens = min(
+                float(self.requests_per_minute),
+                self._tokens + (now - self._refilled_at) * rate
+            )
+            self._refilled_at = now
+
+            # Tokens may go negative: each waiting caller holds its place in the queue
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            self.throttled += 1
+            return -self._tokens / rate
+
+    def set_limits(
+        self,
+        requests_per_minute: Optional[int] = None,
+        daily_credit_limit: Optional[int] = None,
+        monthly_credit_limit: Optional[int] = None
+    ):
+        """
+        Apply new limits, keeping the requests and credits already counted.
+
+        Args:
+            requests_per_minute (int): Plan request cap per minute; None disables throttling
+            daily_credit_limit (int): Credits allowed per UTC day; None means unlimited
+            monthly_credit_limit (int): Credits allowed per UTC calendar month; None means unlimited
+        """
+        with self._lock:
+            if requests_per_minute != self.requests_per_minute:
+                self._tokens = min(self._tokens, float(requests_per_minute or 0))
+            self.requests_per_minute = requests_per_minute
+            self.daily_credit_limit = daily_credit_limit
+            self.monthly_credit_limit = monthly_credit_limit
+
+    def seed_credits(self, credits_today: int, credits_this_month: int):
+        """
+        Account for credits the API reports as used, e.g. by other processes or before a restart.
+
+        Counts only go up: credits charged since the report are already included.
+
+        Args:
+            credits_today (int): Credits used in the current UTC day
+            credits_this_month (int): Credits used in the current UTC month
+        """
+        with self._lock:
+            self._roll_periods()
+            self.credits_today = max(self.credits_today, credits_today)
+            self.credits_this_month = max(self.credits_this_month, credits_this_month)
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def record_credits(self, credits: int):
+        """
+        Record credits charged for a response.
+
+        Args:
+            credits (int): Value of `status.credit_count` from the response
+        """
+        with self._lock:
+            self._roll_periods()
+            self.credits_today += credits
+            self.credits_this_month += credits
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        """
+        Return limiter counters.
+
+        Returns:
+            dict: Credits used and remaining in the current periods and the number of throttled calls
+        """
+        with self._lock:
+            self._roll_periods()
+            return {
+                'credits_today': self.credits_today,
+                'credits_this_month': self.credits_this_month,
+                'daily_credits_left': (
+                    None if self.daily_credit_limit is None
+                    else max(self.daily_credit_limit - self.credits_today, 0)
+                ),
+                'monthly_credits_left': (
+                    None if self.monthly_credit_limit is None
+                    else max(self.monthly_credit_limit - self.credits_this_month, 0)
+                ),
+                'throttled': self.throttled
+            }
@@ -0,0 +1,227 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from mindsdb.utilities import log
+
+from .coinmarketcap_cache import ResponseCache
+
+logger = log.getLogger(__name__)
+
+
+# Endpoints each snapshot table reads; quotes without a coin filter read listings
+SNAPSHOT_ENDPOINTS = {
+    'listings': ('/v1/cryptocurrency/listings/latest',),
+    'quotes': ('/v1/cryptocurrency/quotes/latest', '/v1/cryptocurrency/listings/latest'),
+    'global_metrics': ('/v1/global-metrics/quotes/latest',)
+}
+
+# Seconds to wait before retrying a snapshot whose refresh failed, at most
+_FAILURE_BACKOFF = 30.0
+
+
+class _Snapshot:
+    """Latest response of one request, and when to refresh it."""
+
+    __slots__ = ('endpoint', 'params', 'response', 'fetched_at', 'read_at', 'refresh_at')
+
+    def __init__(self, endpoint: str, params: Optional[Dict], read_at: float, refresh_at: float):
+        self.endpoint = endpoint
+        self.params = dict(params or {})
+        self.response: Optional[Dict[str, Any]] = None
+        self.fetched_at = 0.0
+        self.read_at = read_at
+        self.refresh_at = refresh_at
+
+
+class SnapshotRefresher:
+    """
+    Background thread keeping the latest responses of hot requests in memory.
+
+    A read of a configured endpoint registers its request as hot. The thread
+    then refetches every hot request once its snapshot is older than the
+    endpoint's TTL, in step with how often CoinMarketCap updates it. Reads are
+    served from the snapshot without waiting: a snapshot past its TTL is
+    still served and wakes the thread to refresh it, up to `max_staleness`
+    seconds old, after which the read goes to the API again. Requests not read
+    for `max_staleness` seconds stop being refreshed.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str, Optional[Dict]], Dict[str, Any]],
+        ttl_for: Callable[[str], float],
+        endpoints: Iterable[str],
+        max_staleness: float = 600,
+        max_keys: int = 64
+    ):
+        """
+        Initialize the refresher.
+
+        Args:
+            fetch (callable): Calls an endpoint with params on the API, bypassing snapshots
+            ttl_for (callable): Returns the TTL of an endpoint in seconds
+            endpoints (list): Endpoints whose requests are kept fresh
+            max_staleness (float): Age in seconds past which a snapshot is no longer served
+            max_keys (int): Maximum number of requests kept fresh at once
+        """
+        self.fetch = fetch
+        self.ttl_for = ttl_for
+        self.endpoints = frozenset(endpoints)
+        self.max_staleness = max_staleness
+        self.max_keys = max_keys
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.failures = 0
+
+        self._snapshots: Dict[str, _Snapshot] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        """True while the refresh thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the refresh thread, if it is not running yet."""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='coinmarketcap-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the refresh thread and drop the snapshots."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._lock:
+            self._snapshots.clear()
+
+    def get(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
+        """
+        Look up the snapshot of a request, registering the request as hot.
+
+        Args:
+            endpoint (str): API endpoint path
+            params (dict): Query parameters
+
+        Returns:
+            dict: Snapshot response, or None if the API has to be called
+        """
+        ttl = self.ttl_for(endpoint)
+        if endpoint not in self.endpoints or ttl <= 0 or not self.running:
+            return None
+
+        key = ResponseCache.make_key(endpoint, params)
+        now = time.monotonic()
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is None:
+                if len(self._snapshots) < self.max_keys:
+                    # The caller fetches it now; the thread takes over once it is stored
+                    self._snapshots[key] = _Snapshot(endpoint, params, now, now + ttl)
+                return None
+            snapshot.read_at = now
+            if snapshot.response is None:
+                return None
+            age = now - snapshot.fetched_at
+            if age > max(self.max_staleness, ttl):
+                return None
+            if age <= ttl:
+                self.hits += 1
+                return snapshot.response
+            self.stale_hits += 1
+        self._wake.set()
+        return snapshot.response
+
+    def put(self, endpoint: str, params: Optional[Dict], response: Dict[str, Any]):
+        """
+        Store a successful response of a hot request.
+
+        Args:
+            endpoint (str): API endpoint path
+            params (dict): Query parameters
+            response (dict): Parsed API response
+        """
+        key = ResponseCache.make_key(endpoint, params)
+        now = time.monotonic()
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is None:
+                return
+            snapshot.response = response
+            snapshot.fetched_at = now
+            snapshot.refresh_at = now + self.ttl_for(endpoint)
+        # The thread may be waiting for the first snapshot to schedule
+        self._wake.set()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return refresher counters.
+
+        Returns:
+            dict: Fresh and stale hits, background refreshes, failed refreshes and hot requests
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'refreshes': self.refreshes,
+                'failures': self.failures,
+                'snapshots': len(self._snapshots)
+            }
+
+    def _run(self):
+        """Refresh due snapshots until stopped, sleeping until the next one is due."""
+        while not self._stop.is_set():
+            for key, snapshot in self._due():
+                if self._stop.is_set():
+                    return
+                self._refresh(key, snapshot)
+            self._wake.wait(self._next_wait())
+            self._wake.clear()
+
+    def _due(self) -> Iterable[Tuple[str, _Snapshot]]:
+        """Return the snapshots to refresh now, dropping those nobody reads anymore."""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for key, snapshot in list(self._snapshots.items()):
+                if now - snapshot.read_at > max(self.max_staleness, self.ttl_for(snapshot.endpoint)):
+                    del self._snapshots[key]
+                elif snapshot.refresh_at <= now:
+                    due.append((key, snapshot))
+        return due
+
+    def _next_wait(self) -> Optional[float]:
+        """Seconds until the next snapshot is due, or None to wait for a read."""
+        with self._lock:
+            if not self._snapshots:
+                return None
+            return max(min(snapshot.refresh_at for snapshot in self._snapshots.values()) - time.monotonic(), 0.01)
+
+    def _refresh(self, key: str, snapshot: _Snapshot):
+        """Refetch one snapshot; a failure keeps the old response and is retried later."""
+        try:
+            response = self.fetch(snapshot.endpoint, snapshot.params)
+            status = response.get('status', {})
+            if status.get('error_code', 0) != 0:
+                raise RuntimeError(status.get('error_message', 'Unknown error'))
+        except Exception as e:
+            logger.warning(f"Could not refresh the snapshot of {key}: {e}")
+            with self._lock:
+                self.failures += 1
+                snapshot.refresh_at = time.monotonic() + min(self.ttl_for(snapshot.endpoint), _FAILURE_BACKOFF)
+            return
+
+        self.put(snapshot.endpoint, snapshot.params, response)
+        with self._lock:
+            self.refreshes += 1
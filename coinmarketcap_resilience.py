@@ -0,0 +1,176 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+
+# Responses worth retrying: throttling and transient server-side failures
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker is open and no cached response is available."""
+
+
+class RetryPolicy:
+    """
+    Bounded exponential backoff with full jitter.
+
+    A `Retry-After` header sent by the API takes precedence over the computed
+    backoff. Waits longer than `backoff_max` are not attempted at all, so a
+    worker thread is never parked for longer than that.
+    """
+
+    def __init__(self, max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 30.0):
+        """
+        Initialize the retry policy.
+
+        Args:
+            max_retries (int): Retries after the first attempt
+            backoff_base (float): Backoff ceiling in seconds for the first retry; doubles on each retry
+            backoff_max (float): Longest wait in seconds before giving up
+        """
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """
+        Parse a `Retry-After` header.
+
+        Args:
+            value (str): Header value, either delay seconds or an HTTP date
+
+        Returns:
+            float: Seconds to wait, or None if the header is missing or malformed
+        """
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        Compute the wait before the next attempt.
+
+        Args:
+            attempt (int): Zero-based number of the attempt that just failed
+            retry_after (float): Wait requested by the API, if any
+
+        Returns:
+            float: Seconds to wait, or None if the request should not be retried
+        """
+        if attempt >= self.max_retries:
+            return None
+        if retry_after is not None:
+            return retry_after if retry_after <= self.backoff_max else None
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def record_retry(self):
+        """Count a retried request."""
+        with self._lock:
+            self.retries += 1
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker guarding the API.
+
+    After `failure_threshold` consecutive failed requests the breaker opens and
+    calls fail fast for `reset_timeout` seconds. It then lets a single probe
+    request through; success closes the breaker, failure opens it again. A
+    probe that ends without an answer from the API also reopens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Initialize the circuit breaker.
+
+        Args:
+            failure_threshold (int): Consecutive failures that open the breaker
+            reset_timeout (float): Seconds the breaker stays open before a probe is allowed
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.times_opened = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Check whether a request may be sent.
+
+        Returns:
+            bool: False while the breaker is open
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def retry_in(self) -> float:
+        """Return seconds until the breaker allows a probe request."""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(self.reset_timeout - (time.monotonic() - self._opened_at), 0.0)
+
+    def record_success(self):
+        """Record a request that reached the API and got an answer."""
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def abort_probe(self):
+        """Reopen a half-open breaker whose probe ended without an answer from the API, so another probe follows."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def record_failure(self):
+        """Record a request that failed after all retries."""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return breaker state.
+
+        Returns:
+            dict: Current state, consecutive failures and how often the breaker opened
+        """
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'times_opened': self.times_opened
+            }
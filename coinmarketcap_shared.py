@@ -0,0 +1,38 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+_registry: Dict[Tuple[str, Hashable], Any] = {}
+_lock = threading.Lock()
+
+
+def shared(kind: str, key: Hashable, factory: Callable[[], Any]) -> Any:
+    """
+    Return the process-wide object of a kind for a key, creating it on first use.
+
+    MindsDB creates a handler instance for every query running concurrently on
+    a database and drops instances that stay idle, so state that concurrent
+    queries must see, or that has to outlive an instance (rate limits, credit
+    budgets, cached responses, requests in flight), is kept here instead. Keys
+    hold the API key and base URL, plus the settings the object is built from,
+    so handlers configured differently do not share it.
+
+    Args:
+        kind (str): What the object is, e.g. `rate_limiter`
+        key (hashable): Identifies the API key and settings the object belongs to
+        factory (callable): Creates the object
+
+    Returns:
+        Any: The shared object
+    """
+    with _lock:
+        obj = _registry.get((kind, key))
+        if obj is None:
+            obj = _registry[(kind, key)] = factory()
+        return obj
+
+
+def clear():
+    """Drop every shared object, so the next handler starts afresh."""
+    with _lock:
+        _registry.clear()
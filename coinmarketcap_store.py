@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import threading
+from typing import Iterable, List, NamedTuple, Tuple
+
+import pandas as pd
+
+from .coinmarketcap_tsdb import TimeSeriesStore
+
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS spans (
+    dataset TEXT NOT NULL,
+    coin_id INTEGER NOT NULL,
+    interval TEXT NOT NULL,
+    convert TEXT NOT NULL,
+    span_start INTEGER NOT NULL,
+    span_end INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS spans_by_series ON spans (dataset, coin_id, interval, convert);
+'''
+
+_EPOCH = pd.Timestamp(0, tz='UTC')
+
+
+def to_epoch(timestamps):
+    """Convert a UTC timestamp, or a Series of them, to integer unix seconds."""
+    return (timestamps - _EPOCH) // pd.Timedelta(seconds=1)
+
+
+class Series(NamedTuple):
+    """A stored time series: the rows of a dataset at one interval, quoted in one currency."""
+
+    dataset: str
+    interval: str
+    convert: str
+    time_column: str
+    period: str
+
+    @property
+    def path(self) -> str:
+        """Directory of the series in the time-series store."""
+        return os.path.join(self.dataset, self.interval, self.convert)
+
+
+class HistoryStore:
+    """
+    Local store of fetched history and of the time spans already fetched.
+
+    Rows are kept in a columnar TimeSeriesStore; a span, kept in SQLite,
+    records that every row of a coin's series within [span_start, span_end]
+    has been fetched, so later queries only request the gaps between spans.
+    Overlapping and adjacent spans are merged on insert. Span times are unix
+    seconds.
+    """
+
+    def __init__(self, root: str):
+        """
+        Open the store, creating it if needed.
+
+        Args:
+            root (str): Directory holding the span index and the series
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._connection = sqlite3.connect(
+            os.path.join(root, 'spans.sqlite'), check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.series = TimeSeriesStore(root)
+
+    def missing(self, series: Series, coin_id: int, start: int, end: int) -> List[Tuple[int, int]]:
+        """
+        Return the parts of [start, end] not covered by stored spans.
+
+        Args:
+            series (Series): Stored series
+            coin_id (int): CoinMarketCap id
+            start (int): Range start
+            end (int): Range end
+
+        Returns:
+            list: (start, end) gaps in time order
+        """
+        with self._lock:
+            spans = self._connection.execute(
+                'SELECT span_start, span_end FROM spans '
+                'WHERE dataset = ? AND coin_id = ? AND interval = ? AND convert = ? '
+                'AND span_end >= ? AND span_start <= ? ORDER BY span_start',
+                (series.dataset, coin_id, series.interval, series.convert, start, end)
+            ).fetchall()
+
+        gaps = []
+        cursor = start
+        for span_start, span_end in spans:
+            if span_start > cursor:
+                gaps.append((cursor, span_start))
+            cursor = max(cursor, span_end)
+        if cursor < end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def add(self, series: Series, rows: pd.DataFrame, spans: Iterable[Tuple[int, int, int]]):
+        """
+        Store fetched rows and record the spans they cover.
+
+        Rows are written before their spans, so a span never covers rows that
+        are not stored.
+
+        Args:
+            series (Series): Stored series
+            rows (pd.DataFrame): Rows with `id` and `series.time_column` columns
+            spans (list): (coin id, start, end) spans that were fetched completely
+        """
+        self.series.append(
+            series.path, rows.dropna(subset=['id', series.time_column]), series.time_column, series.period
+        )
+        with self._lock, self._connection:
+            self._connection.execute('BEGIN')
+            for coin_id, start, end in spans:
+                self._add_span(series, coin_id, start, end)
+
+    def _add_span(self, series: Series, coin_id: int, start: int, end: int):
+        """Insert a span, merging it with the spans it overlaps or touches."""
+        key = (series.dataset, coin_id, series.interval, series.convert)
+        where = 'WHERE dataset = ? AND coin_id = ? AND interval = ? AND convert = ? AND span_end >= ? AND span_start <= ?'
+        overlapping = self._connection.execute(
+            f'SELECT MIN(span_start), MAX(span_end) FROM spans {where}', (*key, start, end)
+        ).fetchone()
+        if overlapping[0] is not None:
+            start, end = min(start, overlapping[0]), max(end, overlapping[1])
+        self._connection.execute(f'DELETE FROM spans {where}', (*key, start, end))
+        self._connection.execute('INSERT INTO spans VALUES (?, ?, ?, ?, ?, ?)', (*key, start, end))
+
+    def read(self, series: Series, coin_ids: List[int], start: int, end: int, columns: List[str]) -> pd.DataFrame:
+        """
+        Read stored rows.
+
+        Args:
+            series (Series): Stored series
+            coin_ids (list): CoinMarketCap ids
+            start (int): Earliest time
+            end (int): Latest time
+            columns (list): Columns to return
+
+        Returns:
+            pd.DataFrame: Rows ordered by time, then id
+        """
+        return self.series.scan(
+            series.path, coin_ids, series.time_column,
+            pd.Timestamp(start, unit='s', tz='UTC'), pd.Timestamp(end, unit='s', tz='UTC'),
+            period=series.period, columns=columns
+        )
+
+    def close(self):
+        """Close the span index."""
+        with self._lock:
+            self._connection.close()
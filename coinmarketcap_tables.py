@@ -1,289 +1,1423 @@
-from typing import List, Optional, Dict, Any
+import asyncio
+import math
+import re
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Dict, Any, Tuple
 from mindsdb.integrations.libs.api_handler import APITable
 from mindsdb.integrations.utilities.sql_utils import extract_comparison_conditions
-from mindsdb_sql_parser.ast import Constant
+from mindsdb_sql_parser.ast import Constant, Identifier
 import pandas as pd
+from .coinmarketcap_async import run_sync
+from .coinmarketcap_batcher import MicroBatcher
+from .coinmarketcap_decoder import DATETIME, FLOAT, INT, STR, Schema
+from .coinmarketcap_metrics import RoundTrip
+from .coinmarketcap_shared import shared
+from .coinmarketcap_store import Series, to_epoch
+from .coinmarketcap_tracing import span
+from .coinmarketcap_tsdb import partition_period
 
 
-class CoinMarketCapTable:
-    """Base class for CoinMarketCap tables."""
+class CoinMarketCapTable(APITable):
+    """
+    Base class for CoinMarketCap tables.
     
-    def __init__(self, handler):
-        self.handler = handler
+    Tables implement aselect(); select() is the blocking facade MindsDB calls.
+    Each table declares its columns once in SCHEMA, which drives get_columns(),
+    decoding and dtypes.
+    """
+    
+    SCHEMA = Schema([])
+    
+    # Optional fields of the endpoint, in the order the API documents them: aux field -> columns it carries
+    AUX_FIELDS: Dict[str, Tuple[str, ...]] = {}
+    
+    # Intervals fetched by time-series tables when the query gives no start time
+    DEFAULT_POINTS = 100
+    
+    # Name the handler registered the table under
+    name: Optional[str] = None
+    
+    # Time-series tables: name of their series in the history store, and the column they are ordered by
+    DATASET: Optional[str] = None
+    TIME_COLUMN: Optional[str] = None
     
     def get_columns(self) -> List[str]:
         """Return the list of columns for this table."""
-        raise NotImplementedError()
+        return self.SCHEMA.columns
     
     def select(self, query) -> pd.DataFrame:
         """Execute a SELECT query on this table."""
+        with span('select', table=self.name) as select:
+            if not self.handler.metrics.enabled:
+                df = run_sync(self.aselect(query))
+            else:
+                with self.handler.metrics.measure_select(self.name):
+                    df = run_sync(self.aselect(query))
+            select.set('rows', len(df))
+            return df
+    
+    async def aselect(self, query) -> pd.DataFrame:
+        """Execute a SELECT query on this table without blocking the event loop."""
         raise NotImplementedError()
-
-
-class CryptocurrencyQuotesTable(APITable):
-    """Table for cryptocurrency quotes/prices."""
     
-    def get_columns(self) -> List[str]:
+    @staticmethod
+    def _get_values(conditions: List, column: str) -> Optional[List]:
+        """Return the values of a `column = x` or `column IN (...)` condition."""
+        for op, arg1, arg2 in conditions:
+            if arg1 == column and op.lower() in ('=', 'in'):
+                return list(arg2) if isinstance(arg2, (list, tuple)) else [arg2]
+        return None
+    
+    async def _resolve_ids(self, conditions: List) -> Optional[Tuple[List[int], List[str]]]:
+        """
+        Resolve `id`, `symbol` and `slug` predicates to coin ids.
+        
+        Symbols and slugs are looked up in the handler's symbol index; several
+        predicates narrow each other down, as they are ANDed.
+        
+        Args:
+            conditions (list): Conditions from extract_comparison_conditions()
+            
+        Returns:
+            tuple: Ids in the order of the first predicate, and the symbols the
+            index does not know; None if the query has no such predicate or
+            symbols and slugs cannot be resolved locally
+        """
+        predicates = [
+            (column, values) for column, values in (
+                (column, self._get_values(conditions, column)) for column in ('id', 'symbol', 'slug')
+            )
+            if values is not None
+        ]
+        if not predicates:
+            return None
+        
+        index = self.handler.symbol_index
+        if any(column != 'id' for column, _ in predicates):
+            if index is None or not await index.aensure(self.handler.acall_coinmarketcap_api):
+                return None
+        
+        ids = None
+        unresolved = []
+        for column, values in predicates:
+            if column == 'id':
+                resolved = [int(value) for value in values]
+            elif column == 'symbol':
+                resolved, unresolved = index.resolve_symbols(values)
+            else:
+                resolved = index.resolve_slugs(values)
+            ids = resolved if ids is None else [i for i in ids if i in set(resolved)]
+        return list(dict.fromkeys(ids)), unresolved
+    
+    async def _get_coin_lookup(self, conditions: List) -> Optional[List[Tuple[str, List, List]]]:
+        """
+        Choose how the coins selected by `id`, `symbol` and `slug` predicates are requested.
+        
+        Ids resolved through the symbol index are preferred. Symbols the index
+        does not know yet, and without an index slugs and then symbols, are
+        sent to the API as they are.
+        
+        Args:
+            conditions (list): Conditions from extract_comparison_conditions()
+            
+        Returns:
+            list: Lookups, each with the API param (`id`, `slug` or `symbol`), its
+            values and the conditions left to filter on locally; None if no coin
+            is selected
+        """
+        resolved = await self._resolve_ids(conditions)
+        if resolved is not None:
+            ids, symbols = resolved
+            lookups = [('id', ids, ('id', 'symbol', 'slug'))] if ids or not symbols else []
+            if symbols:
+                # The index can be a day old, so coins listed since are looked up by symbol
+                lookups.append(('symbol', symbols, ('symbol',)))
+        else:
+            key = next((column for column in ('slug', 'symbol') if self._get_values(conditions, column)), None)
+            if key is None:
+                return None
+            lookups = [(key, self._get_values(conditions, key), (key,))]
+        
         return [
-            'id', 'name', 'symbol', 'slug', 'cmc_rank', 'num_market_pairs',
-            'circulating_supply', 'total_supply', 'max_supply', 'date_added',
-            'platform', 'price', 'volume_24h', 'volume_change_24h',
-            'percent_change_1h', 'percent_change_24h', 'percent_change_7d',
-            'percent_change_30d', 'market_cap', 'market_cap_dominance',
-            'fully_diluted_market_cap', 'last_updated'
+            (key, values, [
+                condition for condition in conditions
+                if not (condition[1] in consumed and condition[0] in ('=', 'in')) and condition[1] not in QUERY_OPTIONS
+            ])
+            for key, values, consumed in lookups
         ]
     
-    def select(self, query) -> pd.DataFrame:
-        """Get cryptocurrency quotes."""
-        conditions = extract_comparison_conditions(query.where)
+    @staticmethod
+    async def _select_lookups(lookups: List[Tuple[str, List, List]], select) -> pd.DataFrame:
+        """
+        Select the coins of every lookup concurrently and combine the rows.
+        
+        Args:
+            lookups (list): Lookups from _get_coin_lookup()
+            select (callable): Coroutine function returning the rows of a lookup's param and values
+            
+        Returns:
+            pd.DataFrame: Rows of every lookup, each filtered by its own residual conditions
+        """
+        frames = await asyncio.gather(*(select(key, values) for key, values, _ in lookups))
+        frames = [_filter_dataframe(df, residual) for df, (_, _, residual) in zip(frames, lookups)]
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    
+    @staticmethod
+    def _get_projection(query, conditions: List) -> Optional[List[str]]:
+        """
+        Return the columns a query needs: those it selects, filters on or sorts by.
+        
+        Args:
+            query: The SELECT query
+            conditions (list): Conditions from extract_comparison_conditions()
+            
+        Returns:
+            list: Column names, or None when every column is needed
+        """
+        targets = getattr(query, 'targets', None)
+        if not isinstance(targets, list) or not targets:
+            return None
+        # Anything but plain column references (*, expressions, functions) may read any column
+        if not all(isinstance(target, Identifier) for target in targets):
+            return None
+        
+        columns = [target.parts[-1] for target in targets]
+        columns.extend(arg1 for _, arg1, _ in conditions)
+        columns.extend(order_by.field.parts[-1] for order_by in (query.order_by or []))
+        return columns
+    
+    def _get_aux(self, columns: Optional[List[str]]) -> str:
+        """
+        Build the smallest `aux` param that still returns the given columns.
         
-        # Fix conditions processing - it returns a list of tuples
-        symbols = None
+        Args:
+            columns (list): Needed columns; None means all of them
+            
+        Returns:
+            str: Comma-separated aux fields
+        """
+        if columns is not None:
+            columns = set(columns)
+        aux = [
+            field for field, carried in self.AUX_FIELDS.items()
+            if columns is None or columns.intersection(carried)
+        ]
+        # An empty aux is rejected by the API, so fall back to the first optional field
+        return ','.join(aux or list(self.AUX_FIELDS)[:1])
+    
+    def _get_currencies(self, conditions: List) -> List[str]:
+        """Return the quote currencies of a query: a `convert` predicate, else the connection's default."""
+        values = self._get_values(conditions, 'convert') or self.handler.convert
+        # A value may list several currencies, e.g. `convert` = 'USD,EUR'
+        currencies = (currency.strip().upper() for value in values for currency in str(value).split(','))
+        return list(dict.fromkeys(currency for currency in currencies if currency))
+    
+    def _get_quote_format(self, conditions: List) -> str:
+        """Return `wide` or `long`, from a `quote_format` predicate or the connection's default."""
+        values = self._get_values(conditions, 'quote_format')
+        return str(values[0]).lower() if values else self.handler.quote_format
+    
+    @staticmethod
+    def _get_quote_columns(columns: Optional[List[str]], currencies: List[str]) -> Optional[List[str]]:
+        """Add the base column of every currency-suffixed column, e.g. `price` for `price_eur`."""
+        if columns is None:
+            return None
+        suffixes = [f'_{currency.lower()}' for currency in currencies[1:]]
+        return columns + [
+            column[:-len(suffix)] for column in columns for suffix in suffixes if column.endswith(suffix)
+        ]
+    
+    def _decode_quotes(self, schema: Schema, records: List[Dict], currencies: List[str], quote_format: str) -> pd.DataFrame:
+        """
+        Decode records holding quotes in several currencies.
+        
+        Args:
+            schema (Schema): Table schema, with quote fields under `quote.USD`
+            records (list): Records with one quote per currency
+            currencies (list): Quote currencies, the first one filling the plain columns
+            quote_format (str): `wide` for `<column>_<currency>` columns, `long` for a row per currency
+            
+        Returns:
+            pd.DataFrame: Decoded rows
+        """
+        if quote_format == 'long':
+            frames = [
+                _quote_schema(schema, (currency,)).decode(records).assign(convert=currency)
+                for currency in currencies
+            ]
+            # Interleave the per-currency frames so each coin's rows stay together
+            return pd.concat(frames).sort_index(kind='stable').reset_index(drop=True)
+        return _quote_schema(schema, tuple(currencies)).decode(records)
+    
+    async def _fetch_converted(self, fetch, currencies: List[str], key=None) -> List[Dict]:
+        """
+        Fetch coins quoted in several currencies, within the plan's `convert` limit per request.
+        
+        Currencies beyond the limit are requested in further concurrent calls,
+        and the quotes are merged into one record per coin.
+        
+        Args:
+            fetch (callable): Coroutine function fetching records for a `convert` param value
+            currencies (list): Quote currencies
+            key (callable): Identifies the same record across calls; defaults to the coin id
+            
+        Returns:
+            list: Records of the first call, with the quotes of every call
+        """
+        results = await asyncio.gather(*(
+            fetch(','.join(chunk)) for chunk in _chunk(currencies, self.handler.max_convert)
+        ))
+        records = results[0]
+        if len(results) == 1:
+            return records
+        
+        key = key or (lambda record: record.get('id'))
+        quotes = {}
+        for result in results:
+            for record in result:
+                quotes.setdefault(key(record), {}).update(record.get('quote') or {})
+        return [{**record, 'quote': quotes[key(record)]} for record in records]
+    
+    def _plan_time_calls(self, key: str, values: List[str], start: pd.Timestamp, end: pd.Timestamp, step: pd.Timedelta) -> List[Dict]:
+        """
+        Split a request into calls returning at most `historical_window_points` points each.
+        
+        Short ranges put several coins into one call; long ranges get one coin
+        per call, over consecutive time windows.
+        
+        Args:
+            key (str): `id` or `symbol`
+            values (list): Requested ids or symbols
+            start (pd.Timestamp): Start of the range
+            end (pd.Timestamp): End of the range
+            step (pd.Timedelta): Length of one interval
+            
+        Returns:
+            list: Params of each call
+        """
+        max_points = self.handler.historical_window_points
+        points = max(int((end - start) / step), 1)
+        if points < max_points:
+            batch_size = min(max_points // points, self.handler.id_batch_size)
+            windows = [(start, end)]
+        else:
+            batch_size = 1
+            windows = _time_windows(start, end, step * max_points)
+        
+        return [
+            {key: ','.join(chunk), 'time_start': window_start.isoformat(), 'time_end': window_end.isoformat()}
+            for chunk in _chunk(values, batch_size)
+            for window_start, window_end in windows
+        ]
+    
+    def _get_time_range(self, conditions: List, step: pd.Timedelta, column: str) -> Tuple[pd.Timestamp, pd.Timestamp, List]:
+        """
+        Read the requested time range from conditions on a time column.
+        
+        Without a start time, the last DEFAULT_POINTS intervals are fetched.
+        
+        Args:
+            conditions (list): Conditions from extract_comparison_conditions()
+            step (pd.Timedelta): Length of one interval
+            column (str): Time column the range applies to
+            
+        Returns:
+            tuple: Start and end of the range to fetch, and the conditions with
+            timestamps parsed, to apply exact bounds locally
+        """
+        starts, ends = [], []
+        residual = []
         for op, arg1, arg2 in conditions:
-            if arg1 == 'symbol':
-                if op == '=':
-                    symbols = [arg2] if isinstance(arg2, str) else arg2
-                elif op == 'IN':
-                    symbols = arg2 if isinstance(arg2, list) else [arg2]
+            if arg1 == column and op in ('between', '>', '>=', '=', '<', '<='):
+                if op == 'between':
+                    arg2 = tuple(_to_timestamp(value) for value in arg2)
+                    starts.append(arg2[0])
+                    ends.append(arg2[1])
+                else:
+                    arg2 = _to_timestamp(arg2)
+                    if op in ('>', '>=', '='):
+                        starts.append(arg2)
+                    if op in ('<', '<=', '='):
+                        ends.append(arg2)
+            residual.append([op, arg1, arg2])
+        
+        end = min(ends) if ends else pd.Timestamp.now(tz='UTC')
+        start = max(starts) if starts else end - self.DEFAULT_POINTS * step
+        return start, end, residual
+    
+    async def _get_history(
+        self,
+        key: str,
+        values: List[str],
+        interval: str,
+        step: pd.Timedelta,
+        currency: str,
+        start: pd.Timestamp,
+        end: pd.Timestamp,
+        fetch
+    ) -> pd.DataFrame:
+        """
+        Get the time series of one currency, fetching only what the history store does not hold yet.
+        
+        Args:
+            key (str): `id` or `symbol`
+            values (list): Requested ids or symbols
+            interval (str): Interval of the series
+            step (pd.Timedelta): Length of one interval
+            currency (str): Quote currency
+            start (pd.Timestamp): Earliest time
+            end (pd.Timestamp): Latest time
+            fetch (callable): Coroutine function fetching the records of planned calls, given the interval and currency
+            
+        Returns:
+            pd.DataFrame: Rows in schema column order
+        """
+        schema = _quote_schema(self.SCHEMA, (currency,))
+        store = self.handler.history_store
+        if store is None or key != 'id':
+            # Without ids, rows cannot be matched to stored series before they are fetched
+            calls = self._plan_time_calls(key, values, start, end, step)
+            return schema.decode(await fetch(calls, interval, currency))
+        
+        series = Series(self.DATASET, interval, currency, self.TIME_COLUMN, partition_period(step.total_seconds()))
+        ids = [int(value) for value in values]
+        range_start, range_end = int(to_epoch(start)), int(to_epoch(end))
+        
+        def find_gaps() -> Dict[Tuple[int, int], List[int]]:
+            # Coins missing the same span are fetched together
+            gaps = {}
+            for coin_id in ids:
+                for gap in store.missing(series, coin_id, range_start, range_end):
+                    gaps.setdefault(gap, []).append(coin_id)
+            return gaps
+        
+        # The span index and the Parquet segments are read and written in worker threads, off the event loop
+        gaps = await asyncio.to_thread(find_gaps)
+        if gaps:
+            calls = [
+                call
+                for (gap_start, gap_end), coin_ids in gaps.items()
+                for call in self._plan_time_calls(
+                    'id', [str(coin_id) for coin_id in coin_ids],
+                    pd.Timestamp(gap_start, unit='s', tz='UTC'), pd.Timestamp(gap_end, unit='s', tz='UTC'), step
+                )
+            ]
+            rows = schema.decode(await fetch(calls, interval, currency))
+            
+            # The latest interval is still open and keeps changing, so spans only cover closed ones
+            closed = int(time.time() - step.total_seconds())
+            spans = [
+                (coin_id, gap_start, min(gap_end, closed))
+                for (gap_start, gap_end), coin_ids in gaps.items()
+                for coin_id in coin_ids
+                if min(gap_end, closed) >= gap_start
+            ]
+            await asyncio.to_thread(store.add, series, rows, spans)
+        
+        stored = await asyncio.to_thread(store.read, series, ids, range_start, range_end, self.SCHEMA.columns)
+        return stored.astype(self.SCHEMA.dtypes)
+    
+    def _combine_currencies(self, frames: List[pd.DataFrame], currencies: List[str], quote_format: str) -> pd.DataFrame:
+        """Combine per-currency time series into wide `<column>_<currency>` columns or a long frame."""
+        if quote_format == 'long':
+            frames = [frame.assign(convert=currency) for frame, currency in zip(frames, currencies)]
+            return pd.concat(frames, ignore_index=True)
         
-        # Default to top cryptocurrencies if no symbol specified
+        df = frames[0]
+        values = [name for name, path, _ in self.SCHEMA.fields if path.startswith(QUOTE_PATH)]
+        for frame, currency in zip(frames[1:], currencies[1:]):
+            suffixed = frame[['id', self.TIME_COLUMN, *values]].rename(
+                columns={name: f'{name}_{currency.lower()}' for name in values}
+            )
+            df = df.merge(suffixed, on=['id', self.TIME_COLUMN], how='left')
+        return df
+    
+    @staticmethod
+    def _push_down_filters(conditions: List) -> Tuple[Dict, List]:
+        """
+        Translate WHERE conditions into listings API filter params.
+        
+        Range predicates become `*_min`/`*_max` params. The API bounds are
+        inclusive, so range predicates are also kept as residual conditions to
+        apply strict comparisons locally.
+        
+        Args:
+            conditions (list): Conditions from extract_comparison_conditions()
+            
+        Returns:
+            tuple: API params and the conditions to filter on locally
+        """
         params = {}
-        if symbols:
-            params['symbol'] = ','.join(symbols)
+        residual = []
+        for op, arg1, arg2 in conditions:
+            if arg1 in LISTINGS_PARAM_FILTERS:
+                values = list(arg2) if op == 'in' and isinstance(arg2, (list, tuple)) else [arg2]
+                if op not in ('=', 'in') or len(values) != 1:
+                    raise NotImplementedError(f"Only `{arg1} = <value>` is supported on '{arg1}'")
+                params[arg1] = values[0]
+                continue
+            if arg1 in QUERY_OPTIONS:
+                continue
+            
+            residual.append([op, arg1, arg2])
+            if arg1 not in LISTINGS_RANGE_FILTERS:
+                continue
+            if op in ('>', '>=', '=', 'between'):
+                low = arg2[0] if op == 'between' else arg2
+                params[f'{arg1}_min'] = max(low, params.get(f'{arg1}_min', low))
+            if op in ('<', '<=', '=', 'between'):
+                high = arg2[1] if op == 'between' else arg2
+                params[f'{arg1}_max'] = min(high, params.get(f'{arg1}_max', high))
+        return params, residual
+    
+    @staticmethod
+    def _get_order(query) -> List[Tuple[str, bool]]:
+        """Return the ORDER BY of a query as (column, ascending) keys."""
+        return [
+            (order_by.field.parts[-1], (order_by.direction or 'ASC').upper() != 'DESC')
+            for order_by in (query.order_by or [])
+        ]
+    
+    @staticmethod
+    def _push_down_order(query) -> Tuple[Dict, List[Tuple[str, bool]]]:
+        """
+        Translate ORDER BY into listings API sort params.
+        
+        Only the first sort key can be sent to the API. When it is not
+        supported, or when there are further keys, the whole ORDER BY is
+        returned to be applied locally, and a LIMIT must then not be sent
+        to the API either.
+        
+        Args:
+            query: The SELECT query
+            
+        Returns:
+            tuple: API params and the (column, ascending) keys to sort on locally
+        """
+        order = CoinMarketCapTable._get_order(query)
+        if not order or order[0][0] not in LISTINGS_SORT_COLUMNS:
+            return {}, order
+        
+        column, ascending = order[0]
+        if column == 'cmc_rank':
+            # Rank 1 is the largest market cap
+            params = {'sort': 'market_cap', 'sort_dir': 'desc' if ascending else 'asc'}
         else:
-            params['limit'] = 100  # Default limit
+            params = {'sort': column, 'sort_dir': 'asc' if ascending else 'desc'}
+        return params, order if len(order) > 1 else []
+    
+    async def _select_listings(
+        self,
+        query,
+        conditions: List,
+        schema: Schema,
+        currencies: List[str],
+        quote_format: str,
+        aux: str,
+        limit: Optional[int]
+    ) -> pd.DataFrame:
+        """
+        Answer a query from the listings endpoint, pushing filters and the sort order down.
         
-        # Get data from API
-        response = self.handler.call_coinmarketcap_api('/v1/cryptocurrency/quotes/latest', params)
+        LIMIT is only sent to the API when it returns exactly the rows the
+        query keeps. With conditions left to apply locally, pages are fetched
+        until LIMIT rows pass them; with an ORDER BY applied locally, every
+        matching coin is fetched. Without LIMIT or conditions, the top 100 coins
+        by market cap are returned. Listings are only requested in the
+        currencies one request can hold; further currencies are added for the
+        coins the query keeps.
         
-        if 'data' not in response:
-            return pd.DataFrame(columns=self.get_columns())
+        Args:
+            query: The SELECT query
+            conditions (list): Conditions from extract_comparison_conditions()
+            schema (Schema): Schema of the columns to decode
+            currencies (list): Quote currencies
+            quote_format (str): `wide` or `long`
+            aux (str): Optional fields to request
+            limit (int): LIMIT of the query, if any
+            
+        Returns:
+            pd.DataFrame: Filtered, sorted and limited rows
+        """
+        filter_params, residual = self._push_down_filters(conditions)
+        order_params, local_order = self._push_down_order(query)
+        params = {'aux': aux, **filter_params, **order_params}
         
-        # Process response data
-        rows = []
-        data = response['data']
+        # Conditions on the currencies beyond the first request are applied once those are added
+        listed, extra = currencies[:self.handler.max_convert], currencies[self.handler.max_convert:]
+        extra_suffixes = tuple(f'_{currency.lower()}' for currency in extra)
+        listed_residual = [condition for condition in residual if not condition[1].endswith(extra_suffixes)]
         
-        # Handle both symbol-based and listing-based responses
-        if isinstance(data, dict):
-            # Symbol-based response
-            for symbol, crypto_data in data.items():
-                rows.append(self._process_crypto_data(crypto_data))
-        elif isinstance(data, list):
-            # Listing-based response
-            for crypto_data in data:
-                rows.append(self._process_crypto_data(crypto_data))
+        keep = None
+        if limit is None:
+            # Default to top cryptocurrencies unless filters select the coins
+            fetch_limit = None if filter_params or residual else 100
+        elif local_order:
+            fetch_limit = None
+        else:
+            fetch_limit = limit
+            if residual and len(listed_residual) == len(residual):
+                # The conditions only need the listed currencies, so the fetched rows can be filtered as they arrive
+                filter_schema = _quote_schema(
+                    self.SCHEMA.select(self._get_quote_columns([arg1 for _, arg1, _ in residual], listed)),
+                    tuple(listed)
+                )
+                
+                def keep(rows: List[Dict]) -> int:
+                    return len(_filter_dataframe(filter_schema.decode(rows), residual))
+            elif residual:
+                fetch_limit = None
         
-        return pd.DataFrame(rows, columns=self.get_columns())
+        data = await self._fetch_listings({**params, 'convert': ','.join(listed)}, fetch_limit, keep)
+        if extra:
+            trim = len(listed_residual) == len(residual) and not any(
+                column.endswith(extra_suffixes) for column, _ in local_order
+            )
+            data = await self._add_currencies(
+                data, listed, extra, listed_residual, local_order if trim else [], limit if trim else None
+            )
+        df = _filter_dataframe(self._decode_quotes(schema, data, currencies, quote_format), residual)
+        df = _sort_dataframe(df, local_order)
+        return df.head(limit) if limit is not None else df
     
-    def _process_crypto_data(self, crypto_data: Dict) -> List:
-        """Process individual cryptocurrency data."""
-        quote = crypto_data.get('quote', {}).get('USD', {})
-        platform = crypto_data.get('platform')
+    async def _add_currencies(
+        self,
+        records: List[Dict],
+        listed: List[str],
+        extra: List[str],
+        residual: List,
+        order: List[Tuple[str, bool]],
+        limit: Optional[int]
+    ) -> List[Dict]:
+        """
+        Add quotes in further currencies to listings, for the coins a query keeps.
+        
+        Coins failing the conditions on the listed currencies are dropped, and
+        the sort order and LIMIT are applied when they do not depend on the
+        further currencies. Only the remaining coins are then requested by id
+        from the quotes endpoint, instead of paging through every listing
+        again for each further currency.
+        
+        Args:
+            records (list): Listings quoted in the listed currencies
+            listed (list): Currencies the records are quoted in
+            extra (list): Currencies to add
+            residual (list): Conditions on the listed currencies to apply locally
+            order (list): (column, ascending) keys to sort on before applying the limit
+            limit (int): Number of coins to keep; None keeps every coin passing the conditions
+            
+        Returns:
+            list: The kept records, in order, quoted in every currency
+        """
+        columns = ['id', *(arg1 for _, arg1, _ in residual), *(column for column, _ in order)]
+        filter_schema = _quote_schema(self.SCHEMA.select(self._get_quote_columns(columns, listed)), tuple(listed))
+        ids = _sort_dataframe(_filter_dataframe(filter_schema.decode(records), residual), order)['id']
+        ids = [int(i) for i in (ids.head(limit) if limit is not None else ids)]
+        if not ids:
+            return []
+        
+        calls = [
+            ('/v1/cryptocurrency/quotes/latest', {'id': ','.join(map(str, chunk)), 'convert': ','.join(currencies)})
+            for currencies in _chunk(extra, self.handler.max_convert)
+            for chunk in _chunk(ids, self.handler.id_batch_size)
+        ]
+        quotes = {}
+        for response in await self.handler.afetch_all(calls):
+            for record in (response.get('data') or {}).values():
+                quotes.setdefault(record.get('id'), {}).update(record.get('quote') or {})
         
+        by_id = {record.get('id'): record for record in records}
         return [
-            crypto_data.get('id'),
-            crypto_data.get('name'),
-            crypto_data.get('symbol'),
-            crypto_data.get('slug'),
-            crypto_data.get('cmc_rank'),
-            crypto_data.get('num_market_pairs'),
-            crypto_data.get('circulating_supply'),
-            crypto_data.get('total_supply'),
-            crypto_data.get('max_supply'),
-            crypto_data.get('date_added'),
-            platform.get('name') if platform else None,
-            quote.get('price'),
-            quote.get('volume_24h'),
-            quote.get('volume_change_24h'),
-            quote.get('percent_change_1h'),
-            quote.get('percent_change_24h'),
-            quote.get('percent_change_7d'),
-            quote.get('percent_change_30d'),
-            quote.get('market_cap'),
-            quote.get('market_cap_dominance'),
-            quote.get('fully_diluted_market_cap'),
-            quote.get('last_updated')
+            {**by_id[i], 'quote': {**(by_id[i].get('quote') or {}), **quotes.get(i, {})}}
+            for i in ids
         ]
+    
+    async def _fetch_listings(self, params: Dict, limit: Optional[int], keep=None) -> List[Dict]:
+        """
+        Fetch up to `limit` coins from the listings endpoint, paginating as needed.
+        
+        The first page is fetched alone: it measures latency and reports the
+        universe size. Further pages are fetched in concurrent batches until the
+        limit, the reported total or a short page is reached.
+        
+        Args:
+            params (dict): Request parameters other than the page bounds
+            limit (int): Maximum number of rows; None fetches every matching row
+            keep (callable): Counts the fetched rows a query keeps; pages are then fetched until it reaches `limit`
+            
+        Returns:
+            list: Coin payloads in the order returned by the API
+        """
+        page_size = self.handler.listings_page_size
+        first_size = page_size.current if limit is None else min(limit, page_size.current)
+        response, rows = await self._fetch_listings_page(params, 1, first_size)
+        
+        total = response.get('status', {}).get('total_count')
+        end = min(x for x in (None if keep else limit, total, float('inf')) if x is not None)
+        exhausted = len(rows) < first_size
+        while not exhausted and len(rows) < end:
+            wanted = end
+            if keep is not None:
+                kept = keep(rows)
+                if kept >= limit:
+                    break
+                # Estimate the rows still needed from the share of fetched rows kept so far
+                wanted = min(end, len(rows) + math.ceil((limit - kept) * len(rows) / max(kept, 1)))
+            
+            pages = []
+            start = len(rows) + 1
+            while start <= wanted and len(pages) < self.handler.async_transport.max_concurrency:
+                size = int(min(page_size.current, wanted - start + 1))
+                pages.append((start, size))
+                start += size
+            
+            results = await asyncio.gather(*(self._fetch_listings_page(params, *page) for page in pages))
+            for (_, size), (_, page_rows) in zip(pages, results):
+                rows.extend(page_rows)
+                if len(page_rows) < size:
+                    exhausted = True
+                    break
+        
+        return rows
+    
+    async def _fetch_listings_page(self, params: Dict, start: int, limit: int) -> Tuple[Dict, List[Dict]]:
+        """
+        Fetch one page of listings.
+        
+        Args:
+            params (dict): Request parameters other than the page bounds
+            start (int): 1-based offset of the first row
+            limit (int): Number of rows
+            
+        Returns:
+            tuple: The API response and its coin payloads
+        """
+        # Waits for the rate limiter or a free connection say nothing about how long a page takes
+        with RoundTrip() as round_trip:
+            response = await self.handler.acall_coinmarketcap_api(
+                '/v1/cryptocurrency/listings/latest',
+                {**params, 'start': start, 'limit': limit}
+            )
+        data = response.get('data') or []
+        if round_trip.seconds is not None:
+            self.handler.listings_page_size.observe(len(data), round_trip.seconds)
+        return response, data
 
 
-class CryptocurrencyListingsTable(APITable):
-    """Table for cryptocurrency listings."""
+# Pseudo-columns that set request options instead of filtering rows
+QUERY_OPTIONS = ('limit', 'convert', 'quote_format', 'interval')
+
+# Pseudo-columns of the listings endpoint sent as params of the same name, which take a single value
+LISTINGS_PARAM_FILTERS = ('cryptocurrency_type', 'tag')
+
+# Listings columns the API can filter on with `<column>_min` / `<column>_max` params
+LISTINGS_RANGE_FILTERS = ('price', 'market_cap', 'volume_24h', 'percent_change_24h', 'circulating_supply')
+
+# Sortable columns of the listings endpoint; cmc_rank maps onto market_cap
+LISTINGS_SORT_COLUMNS = (
+    'cmc_rank', 'name', 'symbol', 'date_added', 'market_cap', 'price', 'circulating_supply',
+    'total_supply', 'max_supply', 'num_market_pairs', 'volume_24h', 'percent_change_1h',
+    'percent_change_24h', 'percent_change_7d'
+)
+
+_OPERATORS = {
+    '=': lambda column, value: column == value,
+    '!=': lambda column, value: column != value,
+    '<>': lambda column, value: column != value,
+    '<': lambda column, value: column < value,
+    '<=': lambda column, value: column <= value,
+    '>': lambda column, value: column > value,
+    '>=': lambda column, value: column >= value,
+    'in': lambda column, value: column.isin(value),
+    'not in': lambda column, value: ~column.isin(value),
+    'between': lambda column, value: column.between(*value)
+}
+
+
+def _filter_dataframe(df: pd.DataFrame, conditions: List) -> pd.DataFrame:
+    """
+    Apply conditions the API could not evaluate to a result DataFrame.
     
-    def get_columns(self) -> List[str]:
-        return [
-            'id', 'name', 'symbol', 'slug', 'cmc_rank', 'num_market_pairs',
-            'circulating_supply', 'total_supply', 'max_supply', 'date_added',
-            'platform', 'price', 'volume_24h', 'percent_change_24h',
-            'market_cap', 'last_updated'
+    MindsDB does not filter the rows a table returns again, so a condition
+    that cannot be applied is an error rather than a condition to skip.
+    """
+    mask = pd.Series(True, index=df.index)
+    for op, arg1, arg2 in conditions:
+        if arg1 not in df.columns:
+            raise NotImplementedError(f"Filtering on column '{arg1}' is not supported")
+        if op not in _OPERATORS:
+            raise NotImplementedError(f"Operator '{op}' is not supported on column '{arg1}'")
+        column = df[arg1]
+        sample = arg2[0] if isinstance(arg2, (list, tuple)) and arg2 else arg2
+        if isinstance(sample, (int, float)) and not isinstance(sample, bool):
+            column = pd.to_numeric(column, errors='coerce')
+        mask &= _OPERATORS[op](column, arg2).fillna(False).astype(bool)
+    return df[mask].reset_index(drop=True)
+
+
+def _sort_dataframe(df: pd.DataFrame, order: List[Tuple[str, bool]]) -> pd.DataFrame:
+    """Apply an ORDER BY the API could not evaluate to a result DataFrame."""
+    order = [(column, ascending) for column, ascending in order if column in df.columns]
+    if not order:
+        return df
+    return df.sort_values(
+        [column for column, _ in order],
+        ascending=[ascending for _, ascending in order],
+        kind='stable'
+    ).reset_index(drop=True)
+
+
+@lru_cache(maxsize=256)
+def _quote_schema(schema: Schema, currencies: Tuple[str, ...]) -> Schema:
+    """
+    Rebase the `quote.USD` fields of a schema onto other currencies.
+    
+    The first currency fills the plain columns; every further currency adds
+    its quote fields again as `<column>_<currency>` columns.
+    """
+    fields = []
+    for name, path, dtype in schema.fields:
+        if path.startswith(QUOTE_PATH):
+            fields.append((name, f'quote.{currencies[0]}.{path[len(QUOTE_PATH):]}', dtype))
+        else:
+            fields.append((name, path, dtype))
+    for currency in currencies[1:]:
+        fields.extend(
+            (f'{name}_{currency.lower()}', f'quote.{currency}.{path[len(QUOTE_PATH):]}', dtype)
+            for name, path, dtype in schema.fields if path.startswith(QUOTE_PATH)
+        )
+    return Schema(fields)
+
+
+def _normalize_coin_key(key: str, value: Any) -> str:
+    """Normalize an id, slug or symbol to the form used in requests and cache keys."""
+    if key == 'id':
+        return str(int(value))
+    if key == 'slug':
+        return str(value).lower()
+    return str(value).upper()
+
+
+def _chunk(items: List, max_size: int) -> List[List]:
+    """Split items into the fewest chunks of at most max_size, with sizes as even as possible."""
+    if not items:
+        return []
+    count = -(-len(items) // max_size)
+    size, extra = divmod(len(items), count)
+    chunks, start = [], 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
+
+
+# Prefix of quote fields in table schemas, rebased onto the requested `convert` currencies
+QUOTE_PATH = 'quote.USD.'
+
+# Columns of a coin with its USD quote, shared by the quotes and listings tables
+COIN_SCHEMA = Schema([
+    ('id', 'id', INT),
+    ('name', 'name', STR),
+    ('symbol', 'symbol', STR),
+    ('slug', 'slug', STR),
+    ('cmc_rank', 'cmc_rank', INT),
+    ('num_market_pairs', 'num_market_pairs', INT),
+    ('circulating_supply', 'circulating_supply', FLOAT),
+    ('total_supply', 'total_supply', FLOAT),
+    ('max_supply', 'max_supply', FLOAT),
+    ('date_added', 'date_added', STR),
+    ('platform', 'platform.name', STR),
+    ('price', 'quote.USD.price', FLOAT),
+    ('volume_24h', 'quote.USD.volume_24h', FLOAT),
+    ('volume_change_24h', 'quote.USD.volume_change_24h', FLOAT),
+    ('percent_change_1h', 'quote.USD.percent_change_1h', FLOAT),
+    ('percent_change_24h', 'quote.USD.percent_change_24h', FLOAT),
+    ('percent_change_7d', 'quote.USD.percent_change_7d', FLOAT),
+    ('percent_change_30d', 'quote.USD.percent_change_30d', FLOAT),
+    ('market_cap', 'quote.USD.market_cap', FLOAT),
+    ('market_cap_dominance', 'quote.USD.market_cap_dominance', FLOAT),
+    ('fully_diluted_market_cap', 'quote.USD.fully_diluted_market_cap', FLOAT),
+    ('last_updated', 'quote.USD.last_updated', STR)
+])
+
+# Optional fields of the listings and quotes endpoints that carry COIN_SCHEMA columns; `tags` is never needed
+COIN_AUX_FIELDS = {
+    'num_market_pairs': ('num_market_pairs',),
+    'cmc_rank': ('cmc_rank',),
+    'date_added': ('date_added',),
+    'platform': ('platform',),
+    'max_supply': ('max_supply',),
+    'circulating_supply': ('circulating_supply',),
+    'total_supply': ('total_supply',)
+}
+
+
+class AdaptivePageSize:
+    """
+    Page size for a paginated endpoint, tuned from measured page latency.
+    
+    Each observed page moves the size halfway towards the number of rows that
+    would take about `target_seconds` to fetch, within the endpoint's bounds.
+    """
+    
+    def __init__(self, initial: int = 1000, minimum: int = 100, maximum: int = 5000, target_seconds: float = 1.0):
+        self.current = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+    
+    def observe(self, rows: int, seconds: float):
+        """Record how long a page of `rows` rows took to fetch."""
+        # Pages served from the cache say nothing about API latency
+        if rows <= 0 or seconds < 0.001:
+            return
+        ideal = min(max(rows * self.target_seconds / seconds, self.minimum), self.maximum)
+        self.current = max(int((self.current + ideal) / 2) // 100 * 100, self.minimum)
+
+
+# Coins whose cached quote the quotes table can find in a cached batch response
+MAX_CACHED_QUOTES = 65536
+
+
+class CryptocurrencyQuotesTable(CoinMarketCapTable):
+    """Table for cryptocurrency quotes/prices."""
+    
+    SCHEMA = COIN_SCHEMA
+    AUX_FIELDS = COIN_AUX_FIELDS
+    
+    ENDPOINT = '/v1/cryptocurrency/quotes/latest'
+    
+    def __init__(self, handler):
+        super().__init__(handler)
+        # Concurrent small lookups with the same params share one request, across every handler of the key
+        self.batcher = shared(
+            'quote_batcher',
+            (handler.base_url, handler.api_key, handler.quote_batch_window),
+            lambda: MicroBatcher(window=handler.quote_batch_window)
+        )
+        # Batch response params and data key of each coin's latest quote, by (key, value, aux, convert);
+        # shared like the response cache it points into
+        self._cached_quotes: 'OrderedDict[Tuple[str, str, str, str], Tuple[Dict, str]]' = shared(
+            'cached_quotes', handler.cache_scope, OrderedDict
+        )
+    
+    async def aselect(self, query) -> pd.DataFrame:
+        """Get cryptocurrency quotes."""
+        conditions = extract_comparison_conditions(query.where)
+        currencies = self._get_currencies(conditions)
+        quote_format = self._get_quote_format(conditions)
+        
+        columns = self._get_quote_columns(self._get_projection(query, conditions), currencies)
+        aux = self._get_aux(columns)
+        schema = self.SCHEMA.select(columns)
+        
+        # Coins selected by id, symbol or slug are requested directly
+        lookups = await self._get_coin_lookup(conditions)
+        if lookups is not None:
+            async def select(key: str, values: List) -> pd.DataFrame:
+                data = await self._fetch_converted(lambda convert: self._fetch_quotes(key, values, aux, convert), currencies)
+                return self._decode_quotes(schema, data, currencies, quote_format)
+            
+            df = _sort_dataframe(await self._select_lookups(lookups, select), self._get_order(query))
+            return df.head(int(query.limit.value)) if query.limit else df
+        
+        # Without a coin filter, quotes come from the listings endpoint, which can filter, sort and page
+        limit = int(query.limit.value) if query.limit else None
+        return await self._select_listings(query, conditions, schema, currencies, quote_format, aux, limit)
+    
+    async def _fetch_quotes(self, key: str, values: List, aux: str, convert: str = 'USD') -> List[Dict]:
+        """
+        Fetch quotes for a list of ids, slugs or symbols in concurrent chunks.
+        
+        Coins whose quote came in a batch response that is still cached are not
+        requested again. Lookups of fewer coins than a request holds are merged
+        with concurrent lookups when micro-batching is enabled.
+        
+        Args:
+            key (str): `id`, `slug` or `symbol`
+            values (list): Requested ids, slugs or symbols
+            aux (str): Optional fields to request
+            convert (str): Comma-separated quote currencies
+            
+        Returns:
+            list: Quote payloads in the requested order; unknown coins are skipped
+        """
+        values = list(dict.fromkeys(_normalize_coin_key(key, value) for value in values))
+        batch_size = self.handler.id_batch_size if key == 'id' else self.handler.symbol_batch_size
+        
+        found = {}
+        missing = []
+        for value in values:
+            cached = self._get_cached_quote((key, value, aux, convert))
+            if cached is not None:
+                found[value] = cached
+                self.handler.query_costs.record_cache_hit()
+            else:
+                missing.append(value)
+        
+        if missing and self.batcher.window > 0 and len(missing) < batch_size:
+            found.update(await self.batcher.submit((key, aux, convert), missing, batch_size, self._request_batch))
+        elif missing:
+            found.update(await self._request_quotes(key, missing, aux, convert))
+        
+        return [found[value] for value in values if value in found]
+    
+    async def _request_batch(self, group: Tuple[str, str, str], values: List[str]) -> Dict[str, Dict]:
+        """Fetch a micro-batch; the group holds the `key`, `aux` and `convert` its lookups share."""
+        key, aux, convert = group
+        return await self._request_quotes(key, values, aux, convert)
+    
+    async def _request_quotes(self, key: str, values: List[str], aux: str, convert: str) -> Dict[str, Dict]:
+        """
+        Request quotes in concurrent chunks and remember where each coin's quote is cached.
+        
+        The handler caches every response as a whole, so a coin's quote is
+        found again in the response it came with instead of in an entry of its
+        own, which would evict a cache entry per coin.
+        
+        Returns:
+            dict: Quote payloads by normalized id, slug or symbol
+        """
+        batch_size = self.handler.id_batch_size if key == 'id' else self.handler.symbol_batch_size
+        calls = [
+            (self.ENDPOINT, {key: ','.join(chunk), 'aux': aux, 'convert': convert, 'skip_invalid': 'true'})
+            for chunk in _chunk(values, batch_size)
         ]
+        found = {}
+        for (_, params), response in zip(calls, await self.handler.afetch_all(calls)):
+            # Symbol requests are keyed by symbol, id and slug requests by id
+            for data_key, crypto_data in (response.get('data') or {}).items():
+                value = _normalize_coin_key(key, crypto_data.get(key))
+                found[value] = crypto_data
+                self._cached_quotes[(key, value, aux, convert)] = (params, data_key)
+                self._cached_quotes.move_to_end((key, value, aux, convert))
+        while len(self._cached_quotes) > MAX_CACHED_QUOTES:
+            self._cached_quotes.popitem(last=False)
+        return found
     
-    def select(self, query) -> pd.DataFrame:
+    def _get_cached_quote(self, coin: Tuple[str, str, str, str]) -> Optional[Dict]:
+        """Return a coin's quote from its cached batch response, or None if that expired or was evicted."""
+        location = self._cached_quotes.get(coin)
+        if location is None:
+            return None
+        params, data_key = location
+        cached = self.handler.cache.get(self.ENDPOINT, params)
+        if cached is None:
+            self._cached_quotes.pop(coin, None)
+            return None
+        self._cached_quotes.move_to_end(coin)
+        return cached['data'][data_key]
+
+
+class CryptocurrencyListingsTable(CoinMarketCapTable):
+    """Table for cryptocurrency listings."""
+    
+    SCHEMA = COIN_SCHEMA
+    AUX_FIELDS = COIN_AUX_FIELDS
+    
+    async def aselect(self, query) -> pd.DataFrame:
         """Get cryptocurrency listings."""
         conditions = extract_comparison_conditions(query.where)
+        currencies = self._get_currencies(conditions)
+        quote_format = self._get_quote_format(conditions)
         
-        # Set up parameters
-        params = {
-            'limit': 100,  # Default limit
-            'convert': 'USD'
-        }
+        # Only request the optional fields the query uses
+        columns = self._get_quote_columns(self._get_projection(query, conditions), currencies)
         
-        # Fix conditions processing
+        # LIMIT, or a `limit` predicate
+        limit = None
         for op, arg1, arg2 in conditions:
             if arg1 == 'limit' and op == '=':
-                params['limit'] = arg2
+                limit = int(arg2)
+        if query.limit:
+            limit = int(query.limit.value)
         
-        # Handle limit from query object
-        if hasattr(query, 'limit') and query.limit:
-            params['limit'] = query.limit.value
+        return await self._select_listings(
+            query, conditions, self.SCHEMA.select(columns), currencies, quote_format, self._get_aux(columns), limit
+        )
+
+
+# Seconds per `interval` alias of the historical endpoints; other intervals are written as e.g. `15m`, `4h`, `7d`
+INTERVAL_ALIASES = {'hourly': 3600, 'daily': 86400, 'weekly': 7 * 86400, 'monthly': 30 * 86400, 'yearly': 365 * 86400}
+_INTERVAL_UNITS = {'m': 60, 'h': 3600, 'd': 86400}
+
+
+def _interval_seconds(interval: str) -> int:
+    """Return the length of a historical `interval` in seconds."""
+    if interval in INTERVAL_ALIASES:
+        return INTERVAL_ALIASES[interval]
+    match = re.fullmatch(r'(\d+)([mhd])', interval)
+    if not match:
+        raise ValueError(
+            f"Unsupported interval '{interval}', use e.g. '5m', '1h', '1d' or one of {', '.join(INTERVAL_ALIASES)}"
+        )
+    return int(match.group(1)) * _INTERVAL_UNITS[match.group(2)]
+
+
+def _to_timestamp(value: Any) -> pd.Timestamp:
+    """Parse a timestamp given as unix seconds or a date string, as UTC."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return pd.Timestamp(value, unit='s', tz='UTC')
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize('UTC') if timestamp.tzinfo is None else timestamp.tz_convert('UTC')
+
+
+def _time_windows(start: pd.Timestamp, end: pd.Timestamp, step: pd.Timedelta) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """Split [start, end] into consecutive windows of at most `step`."""
+    windows = []
+    while start < end:
+        windows.append((start, min(start + step, end)))
+        start += step
+    return windows or [(start, end)]
+
+
+def _flatten_time_series(responses: List[Dict]) -> List[Dict]:
+    """Turn the per-coin `quotes` lists of historical responses into one record per coin and point in time."""
+    records = []
+    for response in responses:
+        for coins in (response.get('data') or {}).values():
+            # v2 returns a coin per requested id, or a list of coins per requested symbol
+            for coin in coins if isinstance(coins, list) else [coins]:
+                coin_fields = {'id': coin.get('id'), 'name': coin.get('name'), 'symbol': coin.get('symbol')}
+                records.extend({**coin_fields, **point} for point in coin.get('quotes') or [])
+    return records
+
+
+class CryptocurrencyQuotesHistoricalTable(CoinMarketCapTable):
+    """
+    Table for historical cryptocurrency quotes.
+    
+    Points of coins selected by id are kept in the handler's history store,
+    and only the spans of time not stored yet are requested from the API.
+    """
+    
+    SCHEMA = Schema([
+        ('id', 'id', INT),
+        ('name', 'name', STR),
+        ('symbol', 'symbol', STR),
+        ('timestamp', 'timestamp', DATETIME),
+        ('price', 'quote.USD.price', FLOAT),
+        ('volume_24h', 'quote.USD.volume_24h', FLOAT),
+        ('market_cap', 'quote.USD.market_cap', FLOAT),
+        ('circulating_supply', 'quote.USD.circulating_supply', FLOAT),
+        ('total_supply', 'quote.USD.total_supply', FLOAT)
+    ])
+    AUX_FIELDS = {
+        'price': ('price',),
+        'volume': ('volume_24h',),
+        'market_cap': ('market_cap',),
+        'circulating_supply': ('circulating_supply',),
+        'total_supply': ('total_supply',)
+    }
+    
+    ENDPOINT = '/v2/cryptocurrency/quotes/historical'
+    DATASET = 'quotes_historical'
+    TIME_COLUMN = 'timestamp'
+    
+    async def aselect(self, query) -> pd.DataFrame:
+        """Get historical quotes."""
+        conditions = extract_comparison_conditions(query.where)
+        currencies = self._get_currencies(conditions)
         
-        # Get data from API
-        response = self.handler.call_coinmarketcap_api('/v1/cryptocurrency/listings/latest', params)
+        lookups = await self._get_coin_lookup(conditions)
+        if lookups is None:
+            raise ValueError('quotes_historical requires a symbol, slug or id condition')
+        if any(key == 'slug' for key, _, _ in lookups):
+            raise ValueError('quotes_historical can only select coins by slug when the symbol index is enabled')
         
-        if 'data' not in response:
-            return pd.DataFrame(columns=self.get_columns())
+        interval = str((self._get_values(conditions, 'interval') or [self.handler.historical_interval])[0]).lower()
+        step = pd.Timedelta(seconds=_interval_seconds(interval))
+        lookups = [(key, values, self._get_time_range(residual, step, 'timestamp')[2]) for key, values, residual in lookups]
+        start, end, _ = self._get_time_range(conditions, step, 'timestamp')
+        quote_format = self._get_quote_format(conditions)
         
-        # Process response data
-        rows = []
-        for crypto_data in response['data']:
-            quote = crypto_data.get('quote', {}).get('USD', {})
-            platform = crypto_data.get('platform')
+        async def select(key: str, values: List) -> pd.DataFrame:
+            values = list(dict.fromkeys(_normalize_coin_key(key, value) for value in values))
+            if self.handler.history_store is not None and key == 'id':
+                # Stored points keep every column, so the projection is not pushed down
+                frames = await asyncio.gather(*(
+                    self._get_history(key, values, interval, step, currency, start, end, self._fetch_points)
+                    for currency in currencies
+                ))
+                df = self._combine_currencies(frames, currencies, quote_format)
+            else:
+                columns = self._get_quote_columns(self._get_projection(query, conditions), currencies)
+                if columns is not None:
+                    # Needed to drop the points windows share and to sort by time
+                    columns = columns + ['id', 'timestamp']
+                calls = self._plan_time_calls(key, values, start, end, step)
+                aux = self._get_aux(columns)
+                
+                data = await self._fetch_converted(
+                    lambda convert: self._fetch_points(calls, interval, convert, aux),
+                    currencies,
+                    key=lambda record: (record.get('id'), record.get('timestamp'))
+                )
+                df = self._decode_quotes(self.SCHEMA.select(columns), data, currencies, quote_format)
             
-            rows.append([
-                crypto_data.get('id'),
-                crypto_data.get('name'),
-                crypto_data.get('symbol'),
-                crypto_data.get('slug'),
-                crypto_data.get('cmc_rank'),
-                crypto_data.get('num_market_pairs'),
-                crypto_data.get('circulating_supply'),
-                crypto_data.get('total_supply'),
-                crypto_data.get('max_supply'),
-                crypto_data.get('date_added'),
-                platform.get('name') if platform else None,
-                quote.get('price'),
-                quote.get('volume_24h'),
-                quote.get('percent_change_24h'),
-                quote.get('market_cap'),
-                quote.get('last_updated')
-            ])
+            # Windows share their boundary points
+            return df.drop_duplicates(subset=[column for column in ('id', 'timestamp', 'convert') if column in df.columns])
         
-        return pd.DataFrame(rows, columns=self.get_columns())
+        df = await self._select_lookups(lookups, select)
+        df = _sort_dataframe(df, self._get_order(query) or [('timestamp', True), ('id', True)])
+        return df.head(int(query.limit.value)) if query.limit else df
+    
+    async def _fetch_points(self, calls: List[Dict], interval: str, convert: str, aux: Optional[str] = None) -> List[Dict]:
+        """Fetch historical quotes concurrently and flatten them into one record per coin and point in time."""
+        params = {'interval': interval, 'aux': aux or self._get_aux(None), 'convert': convert, 'skip_invalid': 'true'}
+        responses = await self.handler.afetch_all([(self.ENDPOINT, {**params, **call}) for call in calls])
+        return _flatten_time_series(responses)
 
 
-class CryptocurrencyInfoTable(APITable):
-    """Table for cryptocurrency information."""
+class CryptocurrencyOHLCVTable(CoinMarketCapTable):
+    """
+    Table for historical OHLCV bars.
     
-    def get_columns(self) -> List[str]:
-        return [
-            'id', 'name', 'symbol', 'category', 'description', 'slug',
-            'logo', 'subreddit', 'notice', 'platform', 'date_added',
-            'twitter_username', 'is_hidden', 'date_launched',
-            'contract_address', 'self_reported_circulating_supply',
-            'self_reported_market_cap', 'self_reported_tags'
-        ]
+    Bars of coins selected by id are kept in the handler's history store, and
+    only the spans of time not stored yet are requested from the API.
+    """
     
-    def select(self, query) -> pd.DataFrame:
-        """Get cryptocurrency information."""
+    SCHEMA = Schema([
+        ('id', 'id', INT),
+        ('name', 'name', STR),
+        ('symbol', 'symbol', STR),
+        ('time_open', 'time_open', DATETIME),
+        ('time_close', 'time_close', DATETIME),
+        ('open', 'quote.USD.open', FLOAT),
+        ('high', 'quote.USD.high', FLOAT),
+        ('low', 'quote.USD.low', FLOAT),
+        ('close', 'quote.USD.close', FLOAT),
+        ('volume', 'quote.USD.volume', FLOAT),
+        ('market_cap', 'quote.USD.market_cap', FLOAT)
+    ])
+    
+    ENDPOINT = '/v2/cryptocurrency/ohlcv/historical'
+    DATASET = 'ohlcv'
+    TIME_COLUMN = 'time_open'
+    
+    async def aselect(self, query) -> pd.DataFrame:
+        """Get historical OHLCV bars."""
         conditions = extract_comparison_conditions(query.where)
+        currencies = self._get_currencies(conditions)
         
-        # Fix conditions processing
-        symbols = None
-        for op, arg1, arg2 in conditions:
-            if arg1 == 'symbol':
-                if op == '=':
-                    symbols = [arg2] if isinstance(arg2, str) else arg2
-                elif op == 'IN':
-                    symbols = arg2 if isinstance(arg2, list) else [arg2]
+        lookups = await self._get_coin_lookup(conditions)
+        if lookups is None:
+            raise ValueError('ohlcv requires a symbol, slug or id condition')
+        if any(key == 'slug' for key, _, _ in lookups):
+            raise ValueError('ohlcv can only select coins by slug when the symbol index is enabled')
         
-        if not symbols:
-            # Default to Bitcoin if no symbol specified
-            symbols = ['BTC']
+        interval = str((self._get_values(conditions, 'interval') or [self.handler.historical_interval])[0]).lower()
+        step = pd.Timedelta(seconds=_interval_seconds(interval))
+        if step < pd.Timedelta(hours=1):
+            raise ValueError(f"ohlcv does not support intervals below one hour, got '{interval}'")
+        lookups = [(key, values, self._get_time_range(residual, step, 'time_open')[2]) for key, values, residual in lookups]
+        start, end, _ = self._get_time_range(conditions, step, 'time_open')
+        quote_format = self._get_quote_format(conditions)
         
-        params = {'symbol': ','.join(symbols)}
+        async def select(key: str, values: List) -> pd.DataFrame:
+            values = list(dict.fromkeys(_normalize_coin_key(key, value) for value in values))
+            frames = await asyncio.gather(*(
+                self._get_history(key, values, interval, step, currency, start, end, self._fetch_bars)
+                for currency in currencies
+            ))
+            return self._combine_currencies(frames, currencies, quote_format)
         
-        # Get data from API
-        response = self.handler.call_coinmarketcap_api('/v2/cryptocurrency/info', params)
+        df = await self._select_lookups(lookups, select)
+        df = _sort_dataframe(df, self._get_order(query) or [('time_open', True), ('id', True)])
+        return df.head(int(query.limit.value)) if query.limit else df
+    
+    async def _fetch_bars(self, calls: List[Dict], interval: str, currency: str) -> List[Dict]:
+        """Fetch bars concurrently and flatten them into one record per coin and bar."""
+        params = {
+            'interval': interval,
+            'time_period': 'hourly' if _interval_seconds(interval) < 86400 else 'daily',
+            'convert': currency,
+            'skip_invalid': 'true'
+        }
+        responses = await self.handler.afetch_all([(self.ENDPOINT, {**params, **call}) for call in calls])
+        return _flatten_time_series(responses)
+
+
+class CryptocurrencyInfoTable(CoinMarketCapTable):
+    """Table for cryptocurrency information."""
+    
+    SCHEMA = Schema([
+        ('id', 'id', INT),
+        ('name', 'name', STR),
+        ('symbol', 'symbol', STR),
+        ('category', 'category', STR),
+        ('description', 'description', STR),
+        ('slug', 'slug', STR),
+        ('logo', 'logo', STR),
+        ('subreddit', 'subreddit', STR),
+        ('notice', 'notice', STR),
+        ('platform', 'platform.name', STR),
+        ('date_added', 'date_added', STR),
+        ('twitter_username', 'twitter_username', STR),
+        ('is_hidden', 'is_hidden', INT),
+        ('date_launched', 'date_launched', STR),
+        ('contract_address', 'platform.token_address', STR),
+        ('self_reported_circulating_supply', 'self_reported_circulating_supply', FLOAT),
+        ('self_reported_market_cap', 'self_reported_market_cap', FLOAT),
+        ('self_reported_tags', 'self_reported_tags', STR)
+    ])
+    # `urls`, `tags` and `status` carry no column and are never requested
+    AUX_FIELDS = {
+        'logo': ('logo',),
+        'description': ('description',),
+        'platform': ('platform', 'contract_address'),
+        'date_added': ('date_added',),
+        'notice': ('notice',)
+    }
+    
+    async def aselect(self, query) -> pd.DataFrame:
+        """Get cryptocurrency information."""
+        conditions = extract_comparison_conditions(query.where)
+        
+        # Long descriptions and URL lists are only requested when selected
+        columns = self._get_projection(query, conditions)
+        schema = self.SCHEMA.select(columns)
+        aux = self._get_aux(columns)
         
-        if 'data' not in response:
-            return pd.DataFrame(columns=self.get_columns())
+        lookups = await self._get_coin_lookup(conditions)
+        if lookups is None:
+            # Default to Bitcoin if no coin specified
+            lookups = await self._get_coin_lookup([['=', 'symbol', 'BTC']])
         
-        # Process response data
-        rows = []
-        for symbol, crypto_data in response['data'].items():
-            platform = crypto_data.get('platform')
+        async def select(key: str, values: List) -> pd.DataFrame:
+            values = list(dict.fromkeys(_normalize_coin_key(key, value) for value in values))
+            batch_size = self.handler.id_batch_size if key == 'id' else self.handler.symbol_batch_size
+            calls = [
+                ('/v2/cryptocurrency/info', {key: ','.join(chunk), 'aux': aux, 'skip_invalid': 'true'})
+                for chunk in _chunk(values, batch_size)
+            ]
             
-            rows.append([
-                crypto_data.get('id'),
-                crypto_data.get('name'),
-                crypto_data.get('symbol'),
-                crypto_data.get('category'),
-                crypto_data.get('description'),
-                crypto_data.get('slug'),
-                crypto_data.get('logo'),
-                crypto_data.get('subreddit'),
-                crypto_data.get('notice'),
-                platform.get('name') if platform else None,
-                crypto_data.get('date_added'),
-                crypto_data.get('twitter_username'),
-                crypto_data.get('is_hidden'),
-                crypto_data.get('date_launched'),
-                platform.get('token_address') if platform else None,
-                crypto_data.get('self_reported_circulating_supply'),
-                crypto_data.get('self_reported_market_cap'),
-                crypto_data.get('self_reported_tags')
-            ])
+            # v2 returns a coin per requested id or slug, or a list of coins per requested symbol
+            records = []
+            for response in await self.handler.afetch_all(calls):
+                for crypto_data in (response.get('data') or {}).values():
+                    records.extend(crypto_data if isinstance(crypto_data, list) else [crypto_data])
+            return schema.decode(records)
         
-        return pd.DataFrame(rows, columns=self.get_columns())
+        return await self._select_lookups(lookups, select)
 
 
-class GlobalMetricsTable(APITable):
+class GlobalMetricsTable(CoinMarketCapTable):
     """Table for global cryptocurrency market metrics."""
     
-    def get_columns(self) -> List[str]:
-        return [
-            'active_cryptocurrencies', 'total_cryptocurrencies', 'active_market_pairs',
-            'active_exchanges', 'total_exchanges', 'eth_dominance', 'btc_dominance',
-            'total_market_cap', 'total_volume_24h', 'total_volume_24h_reported',
-            'altcoin_volume_24h', 'altcoin_market_cap', 'defi_volume_24h',
-            'defi_volume_24h_reported', 'defi_market_cap', 'stablecoin_volume_24h',
-            'stablecoin_volume_24h_reported', 'stablecoin_market_cap',
-            'derivatives_volume_24h', 'derivatives_volume_24h_reported',
-            'quote_last_updated'
-        ]
+    SCHEMA = Schema([
+        ('active_cryptocurrencies', 'active_cryptocurrencies', INT),
+        ('total_cryptocurrencies', 'total_cryptocurrencies', INT),
+        ('active_market_pairs', 'active_market_pairs', INT),
+        ('active_exchanges', 'active_exchanges', INT),
+        ('total_exchanges', 'total_exchanges', INT),
+        ('eth_dominance', 'eth_dominance', FLOAT),
+        ('btc_dominance', 'btc_dominance', FLOAT),
+        ('total_market_cap', 'quote.USD.total_market_cap', FLOAT),
+        ('total_volume_24h', 'quote.USD.total_volume_24h', FLOAT),
+        ('total_volume_24h_reported', 'quote.USD.total_volume_24h_reported', FLOAT),
+        ('altcoin_volume_24h', 'quote.USD.altcoin_volume_24h', FLOAT),
+        ('altcoin_market_cap', 'quote.USD.altcoin_market_cap', FLOAT),
+        ('defi_volume_24h', 'quote.USD.defi_volume_24h', FLOAT),
+        ('defi_volume_24h_reported', 'quote.USD.defi_volume_24h_reported', FLOAT),
+        ('defi_market_cap', 'quote.USD.defi_market_cap', FLOAT),
+        ('stablecoin_volume_24h', 'quote.USD.stablecoin_volume_24h', FLOAT),
+        ('stablecoin_volume_24h_reported', 'quote.USD.stablecoin_volume_24h_reported', FLOAT),
+        ('stablecoin_market_cap', 'quote.USD.stablecoin_market_cap', FLOAT),
+        ('derivatives_volume_24h', 'quote.USD.derivatives_volume_24h', FLOAT),
+        ('derivatives_volume_24h_reported', 'quote.USD.derivatives_volume_24h_reported', FLOAT),
+        ('quote_last_updated', 'quote.USD.last_updated', STR)
+    ])
     
-    def select(self, query) -> pd.DataFrame:
+    async def aselect(self, query) -> pd.DataFrame:
         """Get global market metrics."""
-        # No specific conditions needed for global metrics
-        response = self.handler.call_coinmarketcap_api('/v1/global-metrics/quotes/latest')
-        
-        if 'data' not in response:
-            return pd.DataFrame(columns=self.get_columns())
-        
-        data = response['data']
-        quote = data.get('quote', {}).get('USD', {})
-        
-        row = [
-            data.get('active_cryptocurrencies'),
-            data.get('total_cryptocurrencies'),
-            data.get('active_market_pairs'),
-            data.get('active_exchanges'),
-            data.get('total_exchanges'),
-            data.get('eth_dominance'),
-            data.get('btc_dominance'),
-            quote.get('total_market_cap'),
-            quote.get('total_volume_24h'),
-            quote.get('total_volume_24h_reported'),
-            quote.get('altcoin_volume_24h'),
-            quote.get('altcoin_market_cap'),
-            quote.get('defi_volume_24h'),
-            quote.get('defi_volume_24h_reported'),
-            quote.get('defi_market_cap'),
-            quote.get('stablecoin_volume_24h'),
-            quote.get('stablecoin_volume_24h_reported'),
-            quote.get('stablecoin_market_cap'),
-            quote.get('derivatives_volume_24h'),
-            quote.get('derivatives_volume_24h_reported'),
-            quote.get('last_updated')
-        ]
+        conditions = extract_comparison_conditions(query.where)
+        currencies = self._get_currencies(conditions)
         
-        return pd.DataFrame([row], columns=self.get_columns())
+        async def fetch(convert: str) -> List[Dict]:
+            response = await self.handler.acall_coinmarketcap_api(
+                '/v1/global-metrics/quotes/latest', {'convert': convert}
+            )
+            return [response['data']] if 'data' in response else []
+        
+        data = await self._fetch_converted(fetch, currencies)
+        return self._decode_quotes(self.SCHEMA, data, currencies, self._get_quote_format(conditions))
+
+
+class UsageTable(CoinMarketCapTable):
+    """Table for the plan limits and current usage of the API key."""
+    
+    SCHEMA = Schema([
+        ('credit_limit_daily', 'plan.credit_limit_daily', INT),
+        ('credit_limit_daily_reset', 'plan.credit_limit_daily_reset', STR),
+        ('credit_limit_daily_reset_timestamp', 'plan.credit_limit_daily_reset_timestamp', DATETIME),
+        ('credit_limit_monthly', 'plan.credit_limit_monthly', INT),
+        ('credit_limit_monthly_reset', 'plan.credit_limit_monthly_reset', STR),
+        ('credit_limit_monthly_reset_timestamp', 'plan.credit_limit_monthly_reset_timestamp', DATETIME),
+        ('rate_limit_minute', 'plan.rate_limit_minute', INT),
+        ('requests_made_minute', 'usage.current_minute.requests_made', INT),
+        ('requests_left_minute', 'usage.current_minute.requests_left', INT),
+        ('credits_used_day', 'usage.current_day.credits_used', INT),
+        ('credits_left_day', 'usage.current_day.credits_left', INT),
+        ('credits_used_month', 'usage.current_month.credits_used', INT),
+        ('credits_left_month', 'usage.current_month.credits_left', INT)
+    ])
+    
+    async def aselect(self, query) -> pd.DataFrame:
+        """Get the API key's plan limits and usage; /v1/key/info costs no credits."""
+        response = await self.handler.acall_coinmarketcap_api('/v1/key/info')
+        return self.SCHEMA.decode([response['data']] if 'data' in response else [])
+
+
+class QueryCostsTable(CoinMarketCapTable):
+    """Table of the API calls, credits, cache hits and bytes each recent query cost."""
+    
+    SCHEMA = Schema([
+        ('started_at', 'started_at', DATETIME),
+        ('query', 'query', STR),
+        ('duration_ms', 'duration_ms', FLOAT),
+        ('calls', 'calls', INT),
+        ('credits', 'credits', INT),
+        ('cache_hits', 'cache_hits', INT),
+        ('bytes', 'bytes', INT),
+        ('endpoints', 'endpoints', STR),
+        ('error', 'error', STR)
+    ])
+    
+    async def aselect(self, query) -> pd.DataFrame:
+        """Get the recorded query costs, oldest first."""
+        conditions = [
+            [op, arg1, tuple(map(_to_timestamp, arg2)) if isinstance(arg2, (list, tuple)) else _to_timestamp(arg2)]
+            if arg1 == 'started_at' else [op, arg1, arg2]
+            for op, arg1, arg2 in extract_comparison_conditions(query.where)
+        ]
+        df = _filter_dataframe(self.SCHEMA.decode(self.handler.query_costs.records()), conditions)
+        df = _sort_dataframe(df, self._get_order(query))
+        return df.head(int(query.limit.value)) if query.limit else df
+
+
+class HandlerStatsTable(CoinMarketCapTable):
+    """Table of the latency histograms of API calls by endpoint and of selects by table."""
+    
+    SCHEMA = Schema([
+        ('scope', 'scope', STR),
+        ('stage', 'stage', STR),
+        ('count', 'count', INT),
+        ('total_ms', 'total_ms', FLOAT),
+        ('mean_ms', 'mean_ms', FLOAT),
+        ('p50_ms', 'p50_ms', FLOAT),
+        ('p90_ms', 'p90_ms', FLOAT),
+        ('p99_ms', 'p99_ms', FLOAT),
+        ('max_ms', 'max_ms', FLOAT)
+    ])
+    
+    async def aselect(self, query) -> pd.DataFrame:
+        """Get the latency statistics recorded so far; empty unless latency metrics are enabled."""
+        df = _filter_dataframe(
+            self.SCHEMA.decode(self.handler.metrics.records()), extract_comparison_conditions(query.where)
+        )
+        df = _sort_dataframe(df, self._get_order(query))
+        return df.head(int(query.limit.value)) if query.limit else df
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from .coinmarketcap_cache import ResponseCache
+
+
+# OpenTelemetry span kinds and status codes, as numbered in the OTLP protocol
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+_STATUS_ERROR = 2
+
+
+class Span:
+    """One timed operation of a trace."""
+
+    __slots__ = ('tracer', 'trace_id', 'span_id', 'parent_id', 'name', 'kind', 'start', 'end', 'attributes', 'error')
+
+    def __init__(self, tracer: 'Tracer', name: str, parent: Optional['Span'], kind: int, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.kind = kind
+        self.start = time.time_ns()
+        self.end = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, key: str, value: Any):
+        """Set an attribute, e.g. one only known once the operation is done."""
+        self.attributes[key] = value
+
+    def to_otlp(self) -> Dict:
+        """Return the span in the OTLP/JSON encoding."""
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start),
+            'endTimeUnixNano': str(self.end),
+            'attributes': _otlp_attributes(self.attributes)
+        }
+        if self.parent_id is not None:
+            span['parentSpanId'] = self.parent_id
+        if self.error is not None:
+            span['status'] = {'code': _STATUS_ERROR, 'message': self.error}
+        return span
+
+
+class _NoopSpan:
+    """Stands in for a span when nothing is traced."""
+
+    __slots__ = ()
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+# Span the current thread or task runs in, if it is traced
+_current: ContextVar[Optional[Span]] = ContextVar('coinmarketcap_span', default=None)
+
+
+class _SpanScope:
+    """Context manager running a block in a new span."""
+
+    __slots__ = ('tracer', 'name', 'parent', 'kind', 'attributes', 'span', 'token')
+
+    def __init__(self, tracer: 'Tracer', name: str, parent: Optional[Span], kind: int, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.kind = kind
+        self.attributes = attributes
+
+    def __enter__(self) -> Span:
+        self.span = Span(self.tracer, self.name, self.parent, self.kind, self.attributes)
+        if self.parent is None:
+            self.tracer.start_trace(self.span)
+        self.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.span.end = time.time_ns()
+        if exc is not None:
+            self.span.error = f'{exc_type.__name__}: {exc}'
+        _current.reset(self.token)
+        self.tracer.finish(self.span)
+        return False
+
+
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes):
+    """
+    Run a block in a child span of the current span.
+
+    Outside a traced query this is a no-op, so instrumented code costs a
+    context variable lookup when tracing is off.
+
+    Args:
+        name (str): Span name
+        kind (int): OTLP span kind
+        attributes: Span attributes
+
+    Returns:
+        context manager: Yields the span, or a stand-in ignoring attributes
+    """
+    parent = _current.get()
+    if parent is None:
+        return _NOOP
+    return _SpanScope(parent.tracer, name, parent, kind, attributes)
+
+
+def tracing() -> bool:
+    """True if the current thread or task runs in a traced query."""
+    return _current.get() is not None
+
+
+def params_hash(endpoint: str, params: Optional[Dict]) -> str:
+    """Short stable hash identifying the params of a request, without putting them in the trace."""
+    return hashlib.sha256(ResponseCache.make_key(endpoint, params).encode()).hexdigest()[:16]
+
+
+class Tracer:
+    """
+    Writes the spans of traced queries to a local file.
+
+    Each query the handler runs becomes a trace: its root span covers the
+    whole query, and the spans of the work it causes (parsing, the table
+    select, cache lookups, HTTP calls, decoding, DataFrame building) are
+    linked to it through a context variable, which follows the query into
+    the coroutines and tasks it starts. Once the root span ends, the trace
+    is appended to the file as one line of OTLP/JSON, the format of the
+    OpenTelemetry collector's file exporter.
+    """
+
+    def __init__(self, path: Optional[str], service_name: str = 'mindsdb-coinmarketcap'):
+        """
+        Initialize the tracer.
+
+        Args:
+            path (str): JSON lines file the traces are appended to; None disables tracing
+            service_name (str): `service.name` resource attribute of the traces
+        """
+        self.path = path
+        self.enabled = path is not None
+        self.service_name = service_name
+        self._pending: Dict[str, List[Span]] = {}
+        self._file = None
+        self._lock = threading.Lock()
+
+    def span(self, name: str, kind: int = SPAN_KIND_INTERNAL, **attributes):
+        """
+        Run a block in a span, starting a new trace if none is running.
+
+        Args:
+            name (str): Span name
+            kind (int): OTLP span kind
+            attributes: Span attributes
+
+        Returns:
+            context manager: Yields the span, or a stand-in if tracing is disabled
+        """
+        if not self.enabled:
+            return _NOOP
+        return _SpanScope(self, name, _current.get(), kind, attributes)
+
+    def finish(self, span: Span):
+        """Collect an ended span; the root span ending writes out its trace."""
+        with self._lock:
+            if span.parent_id is not None and span.trace_id in self._pending:
+                self._pending[span.trace_id].append(span)
+                return
+            if span.parent_id is None:
+                spans = self._pending.pop(span.trace_id, [])
+                spans.append(span)
+            else:
+                # Ended after its trace was written, e.g. a shared request other queries still waited on
+                spans = [span]
+            self._write(spans)
+
+    def start_trace(self, span: Span):
+        """Start collecting the spans of a new trace."""
+        with self._lock:
+            self._pending.setdefault(span.trace_id, [])
+
+    def _write(self, spans: List[Span]):
+        """Append spans to the file as one OTLP/JSON line."""
+        if self._file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        line = {
+            'resourceSpans': [{
+                'resource': {'attributes': _otlp_attributes({'service.name': self.service_name})},
+                'scopeSpans': [{
+                    'scope': {'name': 'coinmarketcap_handler'},
+                    'spans': [span.to_otlp() for span in spans]
+                }]
+            }]
+        }
+        self._file.write(json.dumps(line, separators=(',', ':')) + '\n')
+        self._file.flush()
+
+    def close(self):
+        """Close the trace file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict]:
+    """Encode attributes as OTLP/JSON key-value pairs; 64-bit integers are strings in OTLP/JSON."""
+    encoded = []
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            encoded.append({'key': key, 'value': {'boolValue': value}})
+        elif isinstance(value, int):
+            encoded.append({'key': key, 'value': {'intValue': str(value)}})
+        elif isinstance(value, float):
+            encoded.append({'key': key, 'value': {'doubleValue': value}})
+        else:
+            encoded.append({'key': key, 'value': {'stringValue': str(value)}})
+    return encoded
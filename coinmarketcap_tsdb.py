@@ -0,0 +1,226 @@
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# Partition name format per partition period
+PARTITION_FORMATS = {'day': '%Y-%m-%d', 'month': '%Y-%m', 'year': '%Y'}
+
+SEGMENT_SUFFIX = '.parquet'
+
+
+def partition_period(step_seconds: float) -> str:
+    """
+    Choose how finely a series is partitioned in time.
+
+    Partitions are sized to hold tens to hundreds of points: series finer
+    than hourly get a partition per day, hourly to sub-daily series one per
+    month, and daily or coarser series one per year.
+
+    Args:
+        step_seconds (float): Length of one interval
+
+    Returns:
+        str: `day`, `month` or `year`
+    """
+    if step_seconds < 3600:
+        return 'day'
+    if step_seconds < 86400:
+        return 'month'
+    return 'year'
+
+
+class TimeSeriesStore:
+    """
+    Columnar, compressed on-disk store of time series, one directory per series.
+
+    Rows are partitioned by coin and time period:
+    `<series>/<coin id>/<period>/<segment>.parquet`. Each write appends a new
+    immutable segment to the partitions it touches; segments are written to a
+    temporary file and renamed, so readers never see a partial one. Once a
+    partition holds `compact_after` segments they are merged into one, keeping
+    the latest row for each (id, time). Stores sharing a root, e.g. handlers
+    with the same `storage_dir`, may compact a partition at the same time:
+    every compaction writes the same merged segment, and one finding segments
+    already removed by another leaves the partition to it.
+
+    Segments are Parquet files compressed with zstd, with dictionary-encoded
+    strings, delta-encoded timestamps and ids, and byte-stream-split floats.
+    Scans memory-map the segments of the partitions overlapping the requested
+    range and use the row group statistics to skip rows out of it.
+    """
+
+    def __init__(self, root: str, compact_after: int = 8):
+        """
+        Initialize the store.
+
+        Args:
+            root (str): Directory holding the series
+            compact_after (int): Segments per partition that trigger a compaction
+        """
+        self.root = root
+        self.compact_after = compact_after
+        self._lock = threading.Lock()
+
+    def append(self, series: str, frame: pd.DataFrame, time_column: str, period: str = 'day'):
+        """
+        Append rows to a series.
+
+        Args:
+            series (str): Series path relative to the root, e.g. `ohlcv/daily/USD`
+            frame (pd.DataFrame): Rows with an integer `id` column and a UTC `time_column`
+            time_column (str): Column the series is ordered by
+            period (str): Partition period, see PARTITION_FORMATS
+        """
+        if frame.empty:
+            return
+        frame = frame.sort_values([time_column, 'id'], kind='stable')
+        partitions = frame[time_column].dt.strftime(PARTITION_FORMATS[period])
+
+        with self._lock:
+            for (coin_id, partition), rows in frame.groupby([frame['id'], partitions], sort=False):
+                directory = os.path.join(self.root, series, str(int(coin_id)), partition)
+                self._write_segment(directory, pa.Table.from_pandas(rows, preserve_index=False))
+                if len(self._segments(directory)) >= self.compact_after:
+                    self._compact(directory, time_column)
+
+    def scan(
+        self,
+        series: str,
+        coin_ids: Iterable[int],
+        time_column: str,
+        start: pd.Timestamp,
+        end: pd.Timestamp,
+        period: str = 'day',
+        columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Read the rows of some coins within a time range.
+
+        Args:
+            series (str): Series path relative to the root
+            coin_ids (list): CoinMarketCap ids
+            time_column (str): Column the series is ordered by
+            start (pd.Timestamp): Earliest time, inclusive
+            end (pd.Timestamp): Latest time, inclusive
+            period (str): Partition period the series was written with
+            columns (list): Columns to return; None returns every stored column
+
+        Returns:
+            pd.DataFrame: Rows ordered by time, then id; empty with `columns` if nothing is stored
+        """
+        fmt = PARTITION_FORMATS[period]
+        first, last = start.strftime(fmt), end.strftime(fmt)
+        filters = [(time_column, '>=', start), (time_column, '<=', end)]
+
+        tables = []
+        for coin_id in coin_ids:
+            coin_dir = os.path.join(self.root, series, str(int(coin_id)))
+            if not os.path.isdir(coin_dir):
+                continue
+            # Partition names sort in time order, so the overlapping ones are a lexicographic range
+            for partition in sorted(os.listdir(coin_dir)):
+                if first <= partition <= last:
+                    tables.extend(self._read_partition(os.path.join(coin_dir, partition), columns, filters))
+
+        if not tables:
+            return pd.DataFrame(columns=columns or ['id', time_column])
+        frame = pa.concat_tables(tables, promote_options='default').to_pandas()
+        # Later segments hold newer values for the rows they repeat
+        frame = frame.drop_duplicates(['id', time_column], keep='last')
+        return frame.sort_values([time_column, 'id'], kind='stable').reset_index(drop=True)
+
+    def compact(self, series: str, time_column: str):
+        """
+        Merge the segments of every partition of a series that holds more than one.
+
+        Args:
+            series (str): Series path relative to the root
+            time_column (str): Column the series is ordered by
+        """
+        with self._lock:
+            for directory, _, _ in os.walk(os.path.join(self.root, series)):
+                self._compact(directory, time_column)
+
+    @staticmethod
+    def _segments(directory: str) -> List[str]:
+        """Return the segment files of a partition, oldest first."""
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        return [
+            os.path.join(directory, name) for name in sorted(names)
+            if name.endswith(SEGMENT_SUFFIX) and not name.startswith('.')
+        ]
+
+    def _read_partition(self, directory: str, columns: Optional[List[str]], filters: List) -> List[pa.Table]:
+        """Memory-map the segments of a partition, listing them again if a compaction removed one meanwhile."""
+        for _ in range(3):
+            try:
+                return [
+                    pq.read_table(path, columns=columns, filters=filters, memory_map=True)
+                    for path in self._segments(directory)
+                ]
+            except FileNotFoundError:
+                continue
+        raise RuntimeError(f'Segments of {directory} kept changing while being read')
+
+    @staticmethod
+    def _write_segment(directory: str, table: pa.Table, name: Optional[str] = None):
+        """Write a segment atomically; segment names sort in write order."""
+        os.makedirs(directory, exist_ok=True)
+        name = name or f'{time.time_ns():020d}{SEGMENT_SUFFIX}'
+
+        encodings: Dict[str, str] = {}
+        dictionary = []
+        for field in table.schema:
+            if pa.types.is_integer(field.type) or pa.types.is_timestamp(field.type):
+                encodings[field.name] = 'DELTA_BINARY_PACKED'
+            elif pa.types.is_floating(field.type):
+                encodings[field.name] = 'BYTE_STREAM_SPLIT'
+            elif pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+                dictionary.append(field.name)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix=SEGMENT_SUFFIX)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pq.write_table(
+                    table, f, compression='zstd', use_dictionary=dictionary, column_encoding=encodings
+                )
+            os.replace(tmp_path, os.path.join(directory, name))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _compact(self, directory: str, time_column: str):
+        """Merge the segments of a partition into one, keeping the latest row for each (id, time)."""
+        segments = self._segments(directory)
+        if len(segments) < 2:
+            return
+        try:
+            tables = [pq.read_table(path, memory_map=True) for path in segments]
+        except FileNotFoundError:
+            # Another store sharing the root compacted the partition meanwhile
+            return
+        table = pa.concat_tables(tables, promote_options='default')
+        frame = table.to_pandas().drop_duplicates(['id', time_column], keep='last')
+        frame = frame.sort_values([time_column, 'id'], kind='stable')
+
+        # The merged segment replaces the newest one, so it still sorts before segments written later
+        self._write_segment(
+            directory,
+            pa.Table.from_pandas(frame, schema=table.schema, preserve_index=False),
+            name=os.path.basename(segments[-1])
+        )
+        for path in segments[:-1]:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
@@ -7,6 +7,191 @@ connection_args = {
         'type': 'bool',
         'description': 'Use sandbox API',
         'default': False
+    },
+    'pool_size': {
+        'type': 'int',
+        'description': 'Maximum number of pooled keep-alive connections to the API',
+        'default': 10
+    },
+    'keep_alive': {
+        'type': 'bool',
+        'description': 'Reuse HTTP connections between requests',
+        'default': True
+    },
+    'connect_timeout': {
+        'type': 'int',
+        'description': 'Seconds to wait for a connection to the API to be established',
+        'default': 5
+    },
+    'read_timeout': {
+        'type': 'int',
+        'description': 'Seconds to wait for the API to send a response',
+        'default': 30
+    },
+    'max_concurrency': {
+        'type': 'int',
+        'description': 'Maximum number of API requests the handler may have in flight at once, shared by all of its concurrent queries',
+        'default': 8
+    },
+    'symbol_batch_size': {
+        'type': 'int',
+        'description': 'Maximum number of symbols sent in one quotes request; longer IN lists are split and fetched concurrently',
+        'default': 100
+    },
+    'id_batch_size': {
+        'type': 'int',
+        'description': 'Maximum number of coin ids per quotes or info request',
+        'default': 500
+    },
+    'quote_batch_window_ms': {
+        'type': 'int',
+        'description': 'Milliseconds a small quotes lookup waits to share one request with concurrent lookups; 0 disables micro-batching',
+        'default': 5
+    },
+    'convert': {
+        'type': 'str',
+        'description': 'Comma-separated quote currencies, e.g. "USD,EUR,BTC"; the first one fills the plain price columns',
+        'default': 'USD'
+    },
+    'max_convert': {
+        'type': 'int',
+        'description': 'Currencies the API plan allows per request; more currencies are fetched in concurrent requests',
+        'default': 1
+    },
+    'quote_format': {
+        'type': 'str',
+        'description': '"wide" for <column>_<currency> columns, "long" for one row per coin and currency',
+        'default': 'wide'
+    },
+    'historical_interval': {
+        'type': 'str',
+        'description': 'Default interval of quotes_historical, e.g. "5m", "1h", "daily"',
+        'default': 'daily'
+    },
+    'historical_window_points': {
+        'type': 'int',
+        'description': 'Maximum data points per historical request; longer ranges are split into windows fetched concurrently',
+        'default': 10000
+    },
+    'history_store': {
+        'type': 'bool',
+        'description': 'Keep fetched ohlcv bars and quotes_historical points in a local columnar store and only request missing time spans',
+        'default': True
+    },
+    'storage_dir': {
+        'type': 'str',
+        'description': 'Directory for local state such as the symbol index; defaults to a directory under the system temp dir'
+    },
+    'symbol_index': {
+        'type': 'bool',
+        'description': 'Resolve symbols and slugs to coin ids with a local copy of /v1/cryptocurrency/map',
+        'default': True
+    },
+    'symbol_index_max_age': {
+        'type': 'int',
+        'description': 'Seconds after which the local symbol index is downloaded again',
+        'default': 86400
+    },
+    'listings_page_size': {
+        'type': 'int',
+        'description': 'Initial page size for listings; it then adapts to measured latency within 100-5000 rows',
+        'default': 1000
+    },
+    'listings_page_target_seconds': {
+        'type': 'float',
+        'description': 'Fetch time per listings page the adaptive page size aims for',
+        'default': 1.0
+    },
+    'cache_ttl': {
+        'type': 'dict',
+        'description': 'Per-endpoint response cache TTL in seconds, e.g. {"/v2/cryptocurrency/info": 86400}; 0 disables caching for an endpoint'
+    },
+    'cache_max_entries': {
+        'type': 'int',
+        'description': 'Maximum number of cached API responses',
+        'default': 1024
+    },
+    'cache_max_bytes': {
+        'type': 'int',
+        'description': 'Maximum total size of cached API responses in bytes',
+        'default': 67108864
+    },
+    'health_check_interval': {
+        'type': 'int',
+        'description': 'Seconds a health check result, or a successful API response, proves the connection healthy; 0 checks every time',
+        'default': 60
+    },
+    'background_refresh': {
+        'type': 'bool',
+        'description': 'Keep the latest responses of hot listings, quotes and global_metrics requests in memory, refreshed by a background thread started on connect',
+        'default': False
+    },
+    'refresh_tables': {
+        'type': 'str',
+        'description': 'Comma-separated tables whose requests the background refresher keeps fresh',
+        'default': 'listings,quotes,global_metrics'
+    },
+    'refresh_max_staleness': {
+        'type': 'int',
+        'description': 'Seconds past which a background snapshot is no longer served and reads go to the API',
+        'default': 600
+    },
+    'query_cost_history': {
+        'type': 'int',
+        'description': 'Number of recent queries whose API calls, credits, cache hits and bytes are kept in the query_costs table',
+        'default': 1000
+    },
+    'latency_metrics': {
+        'type': 'bool',
+        'description': 'Record latency histograms of API call stages per endpoint and of select stages per table, shown in the handler_stats table',
+        'default': False
+    },
+    'trace': {
+        'type': 'bool',
+        'description': 'Write spans of every query (parsing, table select, cache lookups, HTTP calls, decoding, DataFrame building) to a local trace file as OTLP JSON lines',
+        'default': False
+    },
+    'trace_file': {
+        'type': 'str',
+        'description': 'Path of the trace file written when trace is enabled; defaults to traces.jsonl in storage_dir'
+    },
+    'requests_per_minute': {
+        'type': 'int',
+        'description': 'Plan request cap per minute across queries using the API key; calls beyond it are delayed. 0 disables throttling',
+        'default': 30
+    },
+    'daily_credit_limit': {
+        'type': 'int',
+        'description': 'Credits queries using the API key may spend per UTC day before failing fast'
+    },
+    'monthly_credit_limit': {
+        'type': 'int',
+        'description': 'Credits queries using the API key may spend per UTC calendar month before failing fast'
+    },
+    'max_retries': {
+        'type': 'int',
+        'description': 'Retries for throttled (429), server error (5xx) and connection failures',
+        'default': 3
+    },
+    'retry_backoff_base': {
+        'type': 'float',
+        'description': 'Backoff ceiling in seconds for the first retry; doubles on each retry',
+        'default': 0.5
+    },
+    'retry_backoff_max': {
+        'type': 'float',
+        'description': 'Longest wait in seconds between retries, including Retry-After',
+        'default': 30
+    },
+    'circuit_failure_threshold': {
+        'type': 'int',
+        'description': 'Consecutive failed requests after which calls fail fast or serve cached data',
+        'default': 5
+    },
+    'circuit_reset_timeout': {
+        'type': 'int',
+        'description': 'Seconds to fail fast before the API is probed again',
+        'default': 30
     }
 }
 connection_args_example = {
@@ -1,11 +1,98 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
+import requests
 from unittest.mock import Mock, patch
+from mindsdb_sql_parser import parse_sql
 from coinmarketcap_handler.coinmarketcap_handler import CoinMarketCapHandler
-from coinmarketcap_handler.coinmarketcap_tables import CryptocurrencyQuotesTable
+from coinmarketcap_handler.coinmarketcap_tables import (
+    AdaptivePageSize,
+    CryptocurrencyInfoTable,
+    CryptocurrencyListingsTable,
+    CryptocurrencyQuotesTable
+)
+from coinmarketcap_handler.coinmarketcap_cache import ResponseCache
+from coinmarketcap_handler.coinmarketcap_decoder import BOOL, DATETIME, FLOAT, INT, STR, Schema
+from coinmarketcap_handler.coinmarketcap_index import SymbolIndex
+from coinmarketcap_handler.coinmarketcap_tsdb import TimeSeriesStore
+from coinmarketcap_handler.coinmarketcap_rate_limiter import RateLimiter, CreditBudgetExceededError
+from coinmarketcap_handler.coinmarketcap_refresher import SnapshotRefresher
+from coinmarketcap_handler.coinmarketcap_resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+from coinmarketcap_handler import coinmarketcap_shared
+
+
+class HandlerTestCase(unittest.TestCase):
+    """Test case whose handlers do not see state shared by the handlers of earlier tests."""
+    
+    def run(self, result=None):
+        coinmarketcap_shared.clear()
+        return super().run(result)
 
 
-class TestCoinMarketCapHandler(unittest.TestCase):
+class StandInServer:
+    """Local stand-in for the CoinMarketCap API."""
+    
+    def __init__(self, body=None, delay=0.0):
+        self.body = body if body is not None else {'status': {'error_code': 0, 'credit_count': 1}, 'data': {}}
+        self.delay = delay
+        self.faults = []
+        self.requests = []
+        self.client_ports = set()
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def do_GET(self):
+                url = urlparse(self.path)
+                server.requests.append((url.path, parse_qs(url.query)))
+                server.client_ports.add(self.client_address[1])
+                if server.delay:
+                    time.sleep(server.delay)
+                status, body, headers = 200, server.body, {}
+                if server.faults:
+                    status, body, headers = server.faults.pop(0)
+                if callable(body):
+                    body = body(url.path, parse_qs(url.query))
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+            
+            def log_message(self, *args):
+                pass
+        
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler, bind_and_activate=False)
+        self.httpd.request_queue_size = 128
+        self.httpd.server_bind()
+        self.httpd.server_activate()
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+    
+    def __enter__(self):
+        self.thread.start()
+        return self
+    
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TestCoinMarketCapHandler(HandlerTestCase):
     """Test cases for CoinMarketCap handler."""
     
     def setUp(self):
@@ -14,7 +101,8 @@ class TestCoinMarketCapHandler(unittest.TestCase):
             'test_coinmarketcap',
             connection_data={
                 'api_key': 'test_api_key',
-                'sandbox': True
+                'sandbox': True,
+                'symbol_index': False
             }
         )
     
@@ -28,7 +116,7 @@ class TestCoinMarketCapHandler(unittest.TestCase):
         self.assertIn('info', self.handler._tables)
         self.assertIn('global_metrics', self.handler._tables)
     
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_successful_connection(self, mock_get):
         """Test successful API connection."""
         # Mock successful API response
@@ -38,13 +126,14 @@ class TestCoinMarketCapHandler(unittest.TestCase):
             'data': {}
         }
         mock_response.raise_for_status.return_value = None
+        mock_response.content = b'{}'
         mock_get.return_value = mock_response
         
         result = self.handler.connect()
         self.assertTrue(result.success)
         self.assertTrue(self.handler.is_connected)
     
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_failed_connection(self, mock_get):
         """Test failed API connection."""
         # Mock failed API response
@@ -56,6 +145,7 @@ class TestCoinMarketCapHandler(unittest.TestCase):
             }
         }
         mock_response.raise_for_status.return_value = None
+        mock_response.content = b'{}'
         mock_get.return_value = mock_response
         
         result = self.handler.connect()
@@ -63,12 +153,30 @@ class TestCoinMarketCapHandler(unittest.TestCase):
         self.assertFalse(self.handler.is_connected)
         self.assertIn('API key invalid', result.error_message)
     
-    @patch('requests.get')
-    def test_quotes_table_select(self, mock_get):
+    def test_health_check_is_cached(self):
+        """Test repeated health checks make one unbilled key/info call per interval."""
+        with StandInServer() as server:
+            self.handler.base_url = server.url
+            for _ in range(5):
+                self.assertTrue(self.handler.check_connection().success)
+            self.handler.health_check_interval = 0
+            self.handler.check_connection()
+        
+        self.assertEqual([path for path, _ in server.requests], ['/v1/key/info'] * 2)
+    
+    def test_recent_data_request_proves_health(self):
+        """Test a successful data request answers the health check without another call."""
+        with StandInServer() as server:
+            self.handler.base_url = server.url
+            self.handler.call_coinmarketcap_api('/v1/global-metrics/quotes/latest')
+            self.assertTrue(self.handler.check_connection().success)
+        
+        self.assertEqual(len(server.requests), 1)
+    
+    def test_quotes_table_select(self):
         """Test quotes table select operation."""
-        # Mock API response for quotes
-        mock_response = Mock()
-        mock_response.json.return_value = {
+        # API response for quotes
+        body = {
             'data': {
                 'BTC': {
                     'id': 1,
@@ -87,16 +195,14 @@ class TestCoinMarketCapHandler(unittest.TestCase):
                 }
             }
         }
-        mock_response.raise_for_status.return_value = None
-        mock_get.return_value = mock_response
         
         quotes_table = CryptocurrencyQuotesTable(self.handler)
         
-        # Mock query object
-        mock_query = Mock()
-        mock_query.where = None
+        query = parse_sql("SELECT * FROM quotes WHERE symbol = 'BTC'")
         
-        result = quotes_table.select(mock_query)
+        with StandInServer(body=body) as server:
+            self.handler.base_url = server.url
+            result = quotes_table.select(query)
         
         self.assertIsInstance(result, pd.DataFrame)
         self.assertEqual(len(result), 1)
@@ -117,5 +223,1858 @@ class TestCoinMarketCapHandler(unittest.TestCase):
             self.assertIn(col, columns)
 
 
+class TestHTTPTransport(HandlerTestCase):
+    """Test cases for the pooled HTTP transport."""
+    
+    def make_handler(self, **connection_data):
+        connection_data.setdefault('api_key', 'test_api_key')
+        connection_data.setdefault('cache_ttl', {'/v1/global-metrics/quotes/latest': 0})
+        return CoinMarketCapHandler('test_coinmarketcap', connection_data=connection_data)
+    
+    def test_transport_configuration(self):
+        """Test pool size and timeouts come from connection args."""
+        handler = self.make_handler(pool_size=4, connect_timeout=2, read_timeout=7)
+        adapter = handler.session.get_adapter('https://pro-api.coinmarketcap.com')
+        
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertEqual(handler.timeout, (2.0, 7.0))
+    
+    def test_connections_are_reused(self):
+        """Test sequential calls share one keep-alive connection."""
+        handler = self.make_handler()
+        with StandInServer() as server:
+            handler.base_url = server.url
+            for _ in range(10):
+                handler.call_coinmarketcap_api('/v1/global-metrics/quotes/latest')
+        
+        self.assertEqual(len(server.requests), 10)
+        self.assertEqual(len(server.client_ports), 1)
+    
+    def test_keep_alive_disabled(self):
+        """Test each call opens a new connection when keep-alive is off."""
+        handler = self.make_handler(keep_alive=False)
+        with StandInServer() as server:
+            handler.base_url = server.url
+            for _ in range(3):
+                handler.call_coinmarketcap_api('/v1/global-metrics/quotes/latest')
+        
+        self.assertEqual(len(server.client_ports), 3)
+    
+    def test_concurrent_calls_are_bounded_by_pool(self):
+        """Test concurrent calls never open more connections than the pool size."""
+        handler = self.make_handler(pool_size=3)
+        with StandInServer(delay=0.02) as server:
+            handler.base_url = server.url
+            threads = [
+                threading.Thread(
+                    target=handler.call_coinmarketcap_api,
+                    args=('/v1/global-metrics/quotes/latest', {'convert': f'C{i}'})
+                )
+                for i in range(12)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        self.assertEqual(len(server.requests), 12)
+        self.assertLessEqual(len(server.client_ports), 3)
+
+
+class TestResponseCache(HandlerTestCase):
+    """Test cases for the response cache."""
+    
+    def test_key_normalization(self):
+        """Test equivalent params map to the same key."""
+        self.assertEqual(
+            ResponseCache.make_key('/x', {'limit': 10, 'convert': 'USD'}),
+            ResponseCache.make_key('/x', {'convert': 'USD', 'limit': '10', 'aux': None})
+        )
+        self.assertEqual(
+            ResponseCache.make_key('/x', {'symbol': ['BTC', 'ETH']}),
+            ResponseCache.make_key('/x', {'symbol': 'BTC,ETH'})
+        )
+    
+    def test_ttl_expiry(self):
+        """Test entries expire after their endpoint TTL."""
+        cache = ResponseCache(ttls={'/x': 0.05})
+        cache.put('/x', {}, {'data': 1}, 10)
+        self.assertEqual(cache.get('/x', {}), {'data': 1})
+        time.sleep(0.06)
+        self.assertIsNone(cache.get('/x', {}))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+    
+    def test_uncached_endpoint(self):
+        """Test endpoints with a zero TTL are never stored."""
+        cache = ResponseCache(ttls={'/x': 0})
+        cache.put('/x', {}, {'data': 1}, 10)
+        self.assertIsNone(cache.get('/x', {}))
+    
+    def test_lru_eviction_by_entries(self):
+        """Test the least recently used entry is evicted first."""
+        cache = ResponseCache(ttls={'/x': 60}, max_entries=2)
+        cache.put('/x', {'id': 1}, {'data': 1}, 10)
+        cache.put('/x', {'id': 2}, {'data': 2}, 10)
+        cache.get('/x', {'id': 1})
+        cache.put('/x', {'id': 3}, {'data': 3}, 10)
+        
+        self.assertIsNotNone(cache.get('/x', {'id': 1}))
+        self.assertIsNone(cache.get('/x', {'id': 2}))
+        self.assertEqual(cache.stats()['evictions'], 1)
+    
+    def test_lru_eviction_by_bytes(self):
+        """Test the cache stays within its byte budget."""
+        cache = ResponseCache(ttls={'/x': 60}, max_bytes=100)
+        for i in range(5):
+            cache.put('/x', {'id': i}, {'data': i}, 40)
+        
+        self.assertEqual(cache.stats()['entries'], 2)
+        self.assertLessEqual(cache.stats()['bytes'], 100)
+    
+    def test_handler_serves_repeated_calls_from_cache(self):
+        """Test repeated identical calls reach the API once."""
+        handler = CoinMarketCapHandler(
+            'test_coinmarketcap',
+            connection_data={'api_key': 'test_api_key', 'cache_ttl': {'/v1/global-metrics/quotes/latest': 60}}
+        )
+        with StandInServer() as server:
+            handler.base_url = server.url
+            for _ in range(5):
+                handler.call_coinmarketcap_api('/v1/global-metrics/quotes/latest')
+            handler.call_coinmarketcap_api('/v1/cryptocurrency/listings/latest', {'limit': 10})
+        
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(handler.cache.stats()['hits'], 4)
+    
+    def test_handlers_of_a_key_share_the_cache(self):
+        """Test a response cached by one handler is served to a later handler of the key."""
+        first, second = (
+            CoinMarketCapHandler(name, connection_data={'api_key': 'test_api_key'})
+            for name in ('first', 'second')
+        )
+        with StandInServer() as server:
+            first.base_url = second.base_url = server.url
+            first.call_coinmarketcap_api('/v1/global-metrics/quotes/latest')
+            second.call_coinmarketcap_api('/v1/global-metrics/quotes/latest')
+        
+        self.assertEqual(len(server.requests), 1)
+        self.assertIs(first.cache, second.cache)
+
+
+class TestRateLimiter(HandlerTestCase):
+    """Test cases for the credit-aware rate limiter."""
+    
+    def test_burst_within_minute_cap(self):
+        """Test calls up to the per-minute cap are not delayed."""
+        limiter = RateLimiter(requests_per_minute=5)
+        waits = [limiter.reserve() for _ in range(5)]
+        self.assertEqual(waits, [0.0] * 5)
+    
+    def test_calls_beyond_cap_are_queued(self):
+        """Test calls beyond the cap wait one refill interval each."""
+        limiter = RateLimiter(requests_per_minute=60)
+        for _ in range(60):
+            limiter.reserve()
+        
+        first, second = limiter.reserve(), limiter.reserve()
+        self.assertAlmostEqual(first, 1.0, delta=0.05)
+        self.assertAlmostEqual(second, 2.0, delta=0.05)
+        self.assertEqual(limiter.stats()['throttled'], 2)
+    
+    def test_daily_budget_fails_fast(self):
+        """Test calls are refused once the daily budget is spent."""
+        limiter = RateLimiter(daily_credit_limit=3)
+        limiter.record_credits(2)
+        limiter.reserve()
+        limiter.record_credits(1)
+        
+        with self.assertRaises(CreditBudgetExceededError):
+            limiter.reserve()
+        self.assertEqual(limiter.stats()['daily_credits_left'], 0)
+    
+    def test_handler_records_credit_count(self):
+        """Test the handler charges status.credit_count against the budget."""
+        handler = CoinMarketCapHandler(
+            'test_coinmarketcap',
+            connection_data={'api_key': 'test_api_key', 'daily_credit_limit': 5}
+        )
+        body = {'status': {'error_code': 0, 'credit_count': 2}, 'data': []}
+        with StandInServer(body=body) as server:
+            handler.base_url = server.url
+            for limit in (1, 2, 3):
+                handler.call_coinmarketcap_api('/v1/cryptocurrency/listings/latest', {'limit': limit})
+            with self.assertRaises(CreditBudgetExceededError):
+                handler.call_coinmarketcap_api('/v1/cryptocurrency/listings/latest', {'limit': 4})
+            # Cached responses cost nothing and stay available
+            handler.call_coinmarketcap_api('/v1/cryptocurrency/listings/latest', {'limit': 1})
+        
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(handler.rate_limiter.stats()['credits_today'], 6)
+    
+    def test_handlers_of_a_key_share_the_budget(self):
+        """Test credits spent through one handler count against every handler of the key."""
+        first, second = (
+            CoinMarketCapHandler(name, connection_data={'api_key': 'test_api_key', 'daily_credit_limit': 2})
+            for name in ('first', 'second')
+        )
+        body = {'status': {'error_code': 0, 'credit_count': 2}, 'data': []}
+        with StandInServer(body=body) as server:
+            first.base_url = second.base_url = server.url
+            first.call_coinmarketcap_api('/v1/cryptocurrency/listings/latest', {'limit': 1})
+            with self.assertRaises(CreditBudgetExceededError):
+                second.call_coinmarketcap_api('/v1/cryptocurrency/listings/latest', {'limit': 2})
+        
+        self.assertEqual(len(server.requests), 1)
+    
+    def test_health_check_seeds_credits_used(self):
+        """Test credits key/info reports as used count against the budget."""
+        handler = CoinMarketCapHandler(
+            'test_coinmarketcap',
+            connection_data={'api_key': 'test_api_key', 'daily_credit_limit': 100, 'monthly_credit_limit': 1000}
+        )
+        key_info = {
+            'status': {'error_code': 0, 'credit_count': 0},
+            'data': {'usage': {'current_day': {'credits_used': 100}, 'current_month': {'credits_used': 400}}}
+        }
+        with StandInServer(body=key_info) as server:
+            handler.base_url = server.url
+            self.assertTrue(handler.connect().success)
+            with self.assertRaises(CreditBudgetExceededError):
+                handler.call_coinmarketcap_api('/v1/cryptocurrency/listings/latest', {'limit': 1})
+        
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(handler.rate_limiter.stats()['monthly_credits_left'], 600)
+
+
+class TestResilience(HandlerTestCase):
+    """Test cases for retries and the circuit breaker against a fault-injecting server."""
+    
+    def make_handler(self, **connection_data):
+        connection_data.setdefault('api_key', 'test_api_key')
+        connection_data.setdefault('retry_backoff_base', 0.01)
+        return CoinMarketCapHandler('test_coinmarketcap', connection_data=connection_data)
+    
+    def test_parse_retry_after(self):
+        """Test both Retry-After formats are understood."""
+        self.assertEqual(RetryPolicy.parse_retry_after('3'), 3.0)
+        self.assertEqual(RetryPolicy.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+        self.assertIsNone(RetryPolicy.parse_retry_after('soon'))
+        self.assertIsNone(RetryPolicy.parse_retry_after(None))
+    
+    def test_backoff_is_bounded(self):
+        """Test backoff stays within its ceiling and gives up after max retries."""
+        policy = RetryPolicy(max_retries=10, backoff_base=1, backoff_max=4)
+        for attempt in range(10):
+            self.assertLessEqual(policy.delay(attempt), 4)
+        self.assertIsNone(policy.delay(10))
+        self.assertIsNone(policy.delay(0, retry_after=60))
+    
+    def test_retries_transient_errors(self):
+        """Test 502 and 429 responses are retried until the call succeeds."""
+        handler = self.make_handler()
+        with StandInServer() as server:
+            server.faults = [(502, {}, {}), (429, {}, {'Retry-After': '0'})]
+            handler.base_url = server.url
+            result = handler.call_coinmarketcap_api('/v1/global-metrics/quotes/latest')
+        
+        self.assertEqual(result['status']['error_code'], 0)
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(handler.retry_policy.retries, 2)
+        self.assertEqual(handler.circuit_breaker.stats()['state'], CircuitBreaker.CLOSED)
+    
+    def test_client_errors_are_not_retried(self):
+        """Test a 401 fails immediately without tripping the breaker."""
+        handler = self.make_handler()
+        with StandInServer() as server:
+            server.faults = [(401, {'status': {'error_code': 1001}}, {})]
+            handler.base_url = server.url
+            with self.assertRaises(Exception):
+                handler.call_coinmarketcap_api('/v1/global-metrics/quotes/latest')
+        
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(handler.circuit_breaker.stats()['consecutive_failures'], 0)
+    
+    def test_circuit_opens_and_serves_cached_data(self):
+        """Test the breaker opens after repeated failures and falls back to cached data."""
+        handler = self.make_handler(
+            max_retries=0,
+            circuit_failure_threshold=2,
+            cache_ttl={'/v1/global-metrics/quotes/latest': 0.01}
+        )
+        with StandInServer() as server:
+            handler.base_url = server.url
+            handler.call_coinmarketcap_api('/v1/global-metrics/quotes/latest')
+            time.sleep(0.02)
+            server.faults = [(503, {}, {})] * 2
+            for _ in range(2):
+                with self.assertRaises(Exception):
+                    handler.call_coinmarketcap_api('/v1/global-metrics/quotes/latest')
+            
+            # Open: served from the expired cache entry, or fail fast without touching the API
+            cached = handler.call_coinmarketcap_api('/v1/global-metrics/quotes/latest')
+            with self.assertRaises(CircuitOpenError):
+                handler.call_coinmarketcap_api('/v1/cryptocurrency/listings/latest')
+        
+        self.assertEqual(cached['status']['error_code'], 0)
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(handler.circuit_breaker.stats()['state'], CircuitBreaker.OPEN)
+    
+    def test_circuit_closes_after_successful_probe(self):
+        """Test the breaker lets a probe through after the cooldown."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.02)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertTrue(breaker.allow())
+    
+    def test_unanswered_probe_reopens_the_circuit(self):
+        """Test a probe failing with a non-connection error reopens the breaker, so a later probe is sent."""
+        handler = self.make_handler(max_retries=0, circuit_failure_threshold=1, circuit_reset_timeout=0.05)
+        with StandInServer() as server:
+            handler.base_url = server.url
+            server.faults = [(503, {}, {})]
+            with self.assertRaises(requests.exceptions.HTTPError):
+                handler.call_coinmarketcap_api('/v1/global-metrics/quotes/latest')
+            
+            time.sleep(0.06)
+            with patch.object(handler.session, 'get', side_effect=requests.exceptions.ChunkedEncodingError('truncated')):
+                with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+                    handler.call_coinmarketcap_api('/v1/global-metrics/quotes/latest')
+            self.assertEqual(handler.circuit_breaker.stats()['state'], CircuitBreaker.OPEN)
+            
+            time.sleep(0.06)
+            with patch.object(handler.rate_limiter, 'reserve', side_effect=CreditBudgetExceededError('out of credits')):
+                with self.assertRaises(CreditBudgetExceededError):
+                    handler.fetch_all([('/v1/global-metrics/quotes/latest', None)])
+            self.assertEqual(handler.circuit_breaker.stats()['state'], CircuitBreaker.OPEN)
+            
+            time.sleep(0.06)
+            result = handler.call_coinmarketcap_api('/v1/global-metrics/quotes/latest')
+        
+        self.assertEqual(result['status']['error_code'], 0)
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(handler.circuit_breaker.stats()['state'], CircuitBreaker.CLOSED)
+
+
+class TestAsyncEngine(HandlerTestCase):
+    """Test cases for the async engine and the sync facade."""
+    
+    def make_handler(self, **connection_data):
+        connection_data.setdefault('api_key', 'test_api_key')
+        connection_data.setdefault('retry_backoff_base', 0.01)
+        return CoinMarketCapHandler('test_coinmarketcap', connection_data=connection_data)
+    
+    def test_fetch_all_runs_concurrently(self):
+        """Test a 20-request plan takes about as long as its slowest request."""
+        handler = self.make_handler(max_concurrency=20, pool_size=20)
+        calls = [('/v1/cryptocurrency/listings/latest', {'start': i * 100 + 1}) for i in range(20)]
+        with StandInServer(delay=0.2) as server:
+            handler.base_url = server.url
+            started = time.perf_counter()
+            results = handler.fetch_all(calls)
+            elapsed = time.perf_counter() - started
+        
+        self.assertEqual(len(results), 20)
+        self.assertEqual(len(server.requests), 20)
+        self.assertLess(elapsed, 0.2 * 4)
+    
+    def test_concurrency_cap(self):
+        """Test no more than max_concurrency requests are in flight."""
+        handler = self.make_handler(max_concurrency=2)
+        calls = [('/v1/cryptocurrency/listings/latest', {'start': i}) for i in range(6)]
+        with StandInServer(delay=0.1) as server:
+            handler.base_url = server.url
+            started = time.perf_counter()
+            handler.fetch_all(calls)
+            elapsed = time.perf_counter() - started
+        
+        self.assertGreaterEqual(elapsed, 0.3)
+    
+    def test_async_call_retries_and_caches(self):
+        """Test the async path shares retries and the response cache with the sync path."""
+        handler = self.make_handler()
+        with StandInServer() as server:
+            server.faults = [(503, {}, {})]
+            handler.base_url = server.url
+            handler.fetch_all([('/v1/global-metrics/quotes/latest', None)])
+            handler.call_coinmarketcap_api('/v1/global-metrics/quotes/latest')
+        
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(handler.retry_policy.retries, 1)
+        self.assertEqual(handler.cache.stats()['hits'], 1)
+    
+    def test_select_facade_inside_running_loop(self):
+        """Test select() works when the caller already runs an event loop."""
+        handler = self.make_handler()
+        body = {'status': {'error_code': 0}, 'data': {'active_cryptocurrencies': 10, 'quote': {'USD': {}}}}
+        
+        async def caller():
+            return handler._tables['global_metrics'].select(Mock(where=None))
+        
+        with StandInServer(body=body) as server:
+            handler.base_url = server.url
+            result = asyncio.run(caller())
+        
+        self.assertEqual(result.iloc[0]['active_cryptocurrencies'], 10)
+
+
+class TestRequestCoalescing(HandlerTestCase):
+    """Test cases for collapsing identical in-flight calls."""
+    
+    ENDPOINT = '/v1/global-metrics/quotes/latest'
+    
+    def make_handler(self):
+        return CoinMarketCapHandler('test', connection_data={
+            'api_key': 'test', 'requests_per_minute': 0, 'cache_ttl': {self.ENDPOINT: 0}
+        })
+    
+    def run_threads(self, handler, count):
+        results, errors = [], []
+        
+        def call():
+            try:
+                results.append(handler.call_coinmarketcap_api(self.ENDPOINT, {'convert': 'USD'}))
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+    
+    def test_identical_sync_calls_share_one_request(self):
+        """Test identical concurrent calls make one request and get the same parsed response."""
+        handler = self.make_handler()
+        with StandInServer(delay=0.2) as server:
+            handler.base_url = server.url
+            results, errors = self.run_threads(handler, 8)
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(len(server.requests), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(handler.single_flight.stats(), {'calls': 1, 'coalesced': 7, 'in_flight': 0})
+    
+    def test_identical_async_calls_share_one_request(self):
+        """Test identical calls of one plan, and a blocking call made meanwhile, share one request."""
+        handler = self.make_handler()
+        with StandInServer(delay=0.2) as server:
+            handler.base_url = server.url
+            thread = threading.Thread(target=handler.fetch_all, args=([(self.ENDPOINT, {'convert': 'USD'})] * 5,))
+            thread.start()
+            time.sleep(0.05)
+            handler.call_coinmarketcap_api(self.ENDPOINT, {'convert': 'USD'})
+            thread.join()
+            handler.fetch_all([(self.ENDPOINT, {'convert': 'EUR'})] * 2)
+        
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(handler.single_flight.stats()['coalesced'], 6)
+    
+    def test_calls_of_separate_handlers_share_one_request(self):
+        """Test identical calls from the handler instances MindsDB creates for concurrent queries share one request."""
+        handlers = [self.make_handler() for _ in range(2)]
+        with StandInServer(delay=0.2) as server:
+            threads = []
+            for handler in handlers:
+                handler.base_url = server.url
+                threads.append(threading.Thread(
+                    target=handler.call_coinmarketcap_api, args=(self.ENDPOINT, {'convert': 'USD'})
+                ))
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        self.assertEqual(len(server.requests), 1)
+        self.assertIs(handlers[0].single_flight, handlers[1].single_flight)
+    
+    def test_error_reaches_every_waiter(self):
+        """Test a failed call raises in every waiter, and the next call is sent again."""
+        handler = self.make_handler()
+        with StandInServer(delay=0.2) as server:
+            server.faults = [(400, {'status': {'error_code': 400}}, {})]
+            handler.base_url = server.url
+            results, errors = self.run_threads(handler, 4)
+            handler.call_coinmarketcap_api(self.ENDPOINT, {'convert': 'USD'})
+        
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 4)
+        self.assertTrue(all(isinstance(error, requests.exceptions.HTTPError) for error in errors))
+        self.assertEqual(len(server.requests), 2)
+
+
+def quotes_body(path, query):
+    """Stand-in quotes/latest payload for the requested symbols."""
+    symbols = query['symbol'][0].split(',')
+    return {
+        'status': {'error_code': 0, 'credit_count': 1},
+        'data': {
+            symbol: {'id': i, 'symbol': symbol, 'quote': {'USD': {'price': float(i)}}}
+            for i, symbol in enumerate(symbols)
+            if symbol != 'UNKNOWN'
+        }
+    }
+
+
+class TestSymbolBatching(HandlerTestCase):
+    """Test cases for chunked symbol batching in the quotes table."""
+    
+    def setUp(self):
+        self.handler = CoinMarketCapHandler(
+            'test_coinmarketcap',
+            connection_data={'api_key': 'test_api_key', 'symbol_batch_size': 100, 'symbol_index': False}
+        )
+        self.table = CryptocurrencyQuotesTable(self.handler)
+    
+    def select(self, symbols):
+        in_list = ', '.join(f"'{symbol}'" for symbol in symbols)
+        return self.table.select(parse_sql(f'SELECT * FROM quotes WHERE symbol IN ({in_list})'))
+    
+    def test_large_in_list_is_chunked(self):
+        """Test a long IN list is split into even chunks and merged in requested order."""
+        symbols = [f'C{i}' for i in range(250)]
+        with StandInServer(body=quotes_body) as server:
+            self.handler.base_url = server.url
+            result = self.select(symbols)
+        
+        chunk_sizes = sorted(len(query['symbol'][0].split(',')) for _, query in server.requests)
+        self.assertEqual(chunk_sizes, [83, 83, 84])
+        self.assertEqual(list(result['symbol']), symbols)
+    
+    def test_cached_symbols_are_reused(self):
+        """Test only symbols without a fresh cached quote are fetched."""
+        with StandInServer(body=quotes_body) as server:
+            self.handler.base_url = server.url
+            self.select(['BTC', 'ETH'])
+            result = self.select(['sol', 'BTC', 'ETH', 'UNKNOWN'])
+        
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(server.requests[1][1]['symbol'], ['SOL,UNKNOWN'])
+        self.assertEqual(list(result['symbol']), ['SOL', 'BTC', 'ETH'])
+    
+    def test_batch_is_cached_as_one_entry(self):
+        """Test a batch response takes one cache entry, and its coins are found in it again."""
+        symbols = [f'C{i}' for i in range(250)]
+        with StandInServer(body=quotes_body) as server:
+            self.handler.base_url = server.url
+            self.select(symbols)
+            result = self.select(['C7', 'C200'])
+        
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(self.handler.cache.stats()['entries'], 3)
+        self.assertEqual(list(result['symbol']), ['C7', 'C200'])
+
+
+class TestQuoteMicroBatching(HandlerTestCase):
+    """Test cases for merging concurrent small quote lookups."""
+    
+    def select_concurrently(self, symbols, faults=(), instances=1, **connection_data):
+        handlers = [
+            CoinMarketCapHandler('test', connection_data={
+                'api_key': 'test', 'symbol_index': False, 'requests_per_minute': 0, **connection_data
+            })
+            for _ in range(instances)
+        ]
+        handler = handlers[0]
+        results, errors = {}, []
+        
+        def select(symbol):
+            # Like MindsDB with concurrent queries, spread the lookups over the handler instances
+            table = handlers[symbols.index(symbol) % instances]._tables['quotes']
+            try:
+                results[symbol] = table.select(parse_sql(f"SELECT symbol, price FROM quotes WHERE symbol = '{symbol}'"))
+            except Exception as e:
+                errors.append(e)
+        
+        with StandInServer(body=quotes_body) as server:
+            for instance in handlers:
+                instance.base_url = server.url
+            server.faults = list(faults)
+            threads = [threading.Thread(target=select, args=(symbol,)) for symbol in symbols]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return handler, server.requests, results, errors
+    
+    def test_concurrent_lookups_share_one_request(self):
+        """Test point lookups arriving within the window are sent as one request and split back per caller."""
+        symbols = [f'C{i}' for i in range(20)]
+        handler, requests_made, results, errors = self.select_concurrently(symbols, quote_batch_window_ms=200)
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(len(requests_made), 1)
+        self.assertEqual(sorted(requests_made[0][1]['symbol'][0].split(',')), sorted(symbols))
+        for symbol in symbols:
+            self.assertEqual(list(results[symbol]['symbol']), [symbol])
+        self.assertEqual(handler._tables['quotes'].batcher.stats(), {'lookups': 20, 'batches': 1})
+    
+    def test_lookups_of_separate_handlers_share_one_request(self):
+        """Test point lookups made through different handler instances are merged too."""
+        symbols = [f'C{i}' for i in range(8)]
+        _, requests_made, results, errors = self.select_concurrently(symbols, instances=4, quote_batch_window_ms=200)
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(len(requests_made), 1)
+        self.assertEqual(sorted(results), sorted(symbols))
+    
+    def test_batching_can_be_disabled(self):
+        """Test every lookup sends its own request with a zero window."""
+        _, requests_made, results, _ = self.select_concurrently(['BTC', 'ETH', 'SOL'], quote_batch_window_ms=0)
+        
+        self.assertEqual(len(requests_made), 3)
+        self.assertEqual(len(results), 3)
+    
+    def test_error_reaches_every_lookup(self):
+        """Test a failed batch request raises in every lookup that shared it."""
+        _, requests_made, results, errors = self.select_concurrently(
+            ['BTC', 'ETH', 'SOL'], quote_batch_window_ms=200, faults=[(400, {}, {})]
+        )
+        
+        self.assertEqual(len(requests_made), 1)
+        self.assertEqual(results, {})
+        self.assertEqual(len(errors), 3)
+
+
+def listings_body(total):
+    """Stand-in listings/latest payload over a universe of `total` coins."""
+    def body(path, query):
+        start, limit = int(query['start'][0]), int(query['limit'][0])
+        ranks = range(start, min(start + limit, total + 1))
+        return {
+            'status': {'error_code': 0, 'credit_count': 1, 'total_count': total},
+            'data': [{'id': rank, 'symbol': f'C{rank}', 'cmc_rank': rank, 'quote': {'USD': {}}} for rank in ranks]
+        }
+    return body
+
+
+class TestListingsPagination(HandlerTestCase):
+    """Test cases for paginated listings fetches."""
+    
+    def setUp(self):
+        self.handler = CoinMarketCapHandler(
+            'test_coinmarketcap',
+            connection_data={'api_key': 'test_api_key', 'listings_page_size': 1000}
+        )
+        self.table = CryptocurrencyListingsTable(self.handler)
+    
+    def test_large_limit_is_paginated(self):
+        """Test a LIMIT beyond one page is fetched as pages and merged in rank order."""
+        with StandInServer(body=listings_body(10000)) as server:
+            self.handler.base_url = server.url
+            result = self.table.select(parse_sql('SELECT * FROM listings LIMIT 2500'))
+        
+        starts = sorted(int(query['start'][0]) for _, query in server.requests)
+        self.assertEqual(starts[:2], [1, 1001])
+        self.assertEqual(sum(int(query['limit'][0]) for _, query in server.requests), 2500)
+        self.assertEqual(list(result['cmc_rank']), list(range(1, 2501)))
+    
+    def test_pagination_stops_at_universe_size(self):
+        """Test no pages are requested beyond the reported total count."""
+        with StandInServer(body=listings_body(1500)) as server:
+            self.handler.base_url = server.url
+            result = self.table.select(parse_sql('SELECT * FROM listings LIMIT 10000'))
+        
+        self.assertEqual(len(result), 1500)
+        self.assertEqual(max(int(query['start'][0]) for _, query in server.requests), 1001)
+    
+    def test_small_limit_is_single_request(self):
+        """Test a LIMIT within one page sends one request."""
+        with StandInServer(body=listings_body(10000)) as server:
+            self.handler.base_url = server.url
+            result = self.table.select(parse_sql('SELECT * FROM listings LIMIT 50'))
+        
+        self.assertEqual(len(result), 50)
+        self.assertEqual(len(server.requests), 1)
+    
+    def test_page_size_adapts_to_latency(self):
+        """Test slow pages shrink the page size and fast pages grow it."""
+        page_size = AdaptivePageSize(initial=1000, target_seconds=1.0)
+        page_size.observe(1000, 4.0)
+        self.assertLess(page_size.current, 1000)
+        
+        page_size = AdaptivePageSize(initial=1000, target_seconds=1.0)
+        page_size.observe(1000, 0.1)
+        self.assertGreater(page_size.current, 1000)
+        self.assertLessEqual(page_size.current, 5000)
+        
+        page_size.observe(1000, 0.0)
+        self.assertGreater(page_size.current, 1000)
+    
+    def test_page_latency_excludes_waits(self):
+        """Test only the HTTP round trip of a page tunes the page size, not the wait for the rate limiter."""
+        with StandInServer(body=listings_body(10000)) as server, \
+                patch.object(self.handler.rate_limiter, 'reserve', return_value=0.5), \
+                patch.object(self.handler.listings_page_size, 'observe') as observe:
+            self.handler.base_url = server.url
+            self.table.select(parse_sql('SELECT * FROM listings LIMIT 50'))
+            self.table.select(parse_sql('SELECT * FROM listings LIMIT 50'))
+        
+        # The second select is served from the cache and measures nothing
+        observe.assert_called_once()
+        rows, seconds = observe.call_args[0]
+        self.assertEqual(rows, 50)
+        self.assertLess(seconds, 0.5)
+
+
+def filtered_listings_body(path, query):
+    """Stand-in listings/latest payload that honors price filters over 20000 coins priced by rank."""
+    low = float(query.get('price_min', [0])[0])
+    high = float(query.get('price_max', [float('inf')])[0])
+    matching = [rank for rank in range(1, 20001) if low <= rank <= high]
+    start, limit = int(query['start'][0]), int(query['limit'][0])
+    return {
+        'status': {'error_code': 0, 'credit_count': 1, 'total_count': len(matching)},
+        'data': [
+            {'id': rank, 'symbol': f'C{rank}', 'cmc_rank': rank, 'quote': {'USD': {'price': float(rank)}}}
+            for rank in matching[start - 1:start - 1 + limit]
+        ]
+    }
+
+
+class TestListingsFilterPushdown(HandlerTestCase):
+    """Test cases for pushing listings WHERE predicates down to the API."""
+    
+    def setUp(self):
+        self.handler = CoinMarketCapHandler('test_coinmarketcap', connection_data={'api_key': 'test_api_key'})
+        self.table = CryptocurrencyListingsTable(self.handler)
+    
+    def test_translate_conditions(self):
+        """Test range, type and tag predicates become API params."""
+        params, residual = self.table._push_down_filters([
+            ['>', 'market_cap', 1000000000],
+            ['<', 'price', 10],
+            ['<=', 'price', 5],
+            ['between', 'volume_24h', (1, 2)],
+            ['=', 'cryptocurrency_type', 'tokens'],
+            ['=', 'tag', 'defi'],
+            ['<>', 'symbol', 'USDT']
+        ])
+        
+        self.assertEqual(params, {
+            'market_cap_min': 1000000000,
+            'price_max': 5,
+            'volume_24h_min': 1,
+            'volume_24h_max': 2,
+            'cryptocurrency_type': 'tokens',
+            'tag': 'defi'
+        })
+        self.assertEqual([condition[1] for condition in residual], ['market_cap', 'price', 'price', 'volume_24h', 'symbol'])
+    
+    def test_single_value_in_is_pushed_down(self):
+        """Test a type or tag IN list with one value is sent like an equality."""
+        params, residual = self.table._push_down_filters([['in', 'tag', ('defi',)]])
+        
+        self.assertEqual(params, {'tag': 'defi'})
+        self.assertEqual(residual, [])
+    
+    def test_unsupported_conditions_are_refused(self):
+        """Test conditions that can be neither sent to the API nor applied locally fail instead of being ignored."""
+        for sql in (
+            "SELECT * FROM listings WHERE cryptocurrency_type IN ('coins', 'tokens')",
+            "SELECT * FROM listings WHERE tag != 'defi'",
+            "SELECT * FROM listings WHERE no_such_column = 1"
+        ):
+            with self.subTest(sql=sql), StandInServer(body=filtered_listings_body) as server:
+                self.handler.base_url = server.url
+                with self.assertRaises(NotImplementedError):
+                    self.table.select(parse_sql(sql))
+    
+    def test_matching_coins_beyond_top_100(self):
+        """Test filtered queries return every match across the universe, with strict bounds applied locally."""
+        with StandInServer(body=filtered_listings_body) as server:
+            self.handler.base_url = server.url
+            result = self.table.select(parse_sql(
+                "SELECT * FROM listings WHERE price > 15000 AND price <= 16500 AND symbol <> 'C16000'"
+            ))
+        
+        self.assertEqual(server.requests[0][1]['price_min'], ['15000'])
+        self.assertEqual(server.requests[0][1]['price_max'], ['16500'])
+        self.assertEqual(len(result), 1499)
+        self.assertEqual(result['cmc_rank'].min(), 15001)
+        self.assertNotIn('C16000', list(result['symbol']))
+    
+    def test_limit_applies_with_filters(self):
+        """Test an explicit LIMIT still bounds a filtered query."""
+        with StandInServer(body=filtered_listings_body) as server:
+            self.handler.base_url = server.url
+            result = self.table.select(parse_sql('SELECT * FROM listings WHERE price >= 100 LIMIT 20'))
+        
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(list(result['cmc_rank']), list(range(100, 120)))
+    
+    def test_local_filters_see_every_coin(self):
+        """Test conditions the API cannot evaluate are applied beyond the default top 100 and before LIMIT."""
+        with StandInServer(body=listings_body(1000)) as server:
+            self.handler.base_url = server.url
+            everywhere = self.table.select(parse_sql("SELECT * FROM listings WHERE symbol = 'C250'"))
+            limited = self.table.select(parse_sql("SELECT * FROM listings WHERE symbol = 'C50' LIMIT 5"))
+        
+        self.assertEqual(list(everywhere['id']), [250])
+        self.assertEqual(list(limited['id']), [50])
+    
+    def test_strict_bounds_fill_the_limit(self):
+        """Test pages are fetched until LIMIT rows pass a strict bound the API applies inclusively."""
+        quotes = CryptocurrencyQuotesTable(self.handler)
+        with StandInServer(body=filtered_listings_body) as server:
+            self.handler.base_url = server.url
+            listings = self.table.select(parse_sql('SELECT * FROM listings WHERE price > 5 LIMIT 5'))
+            result = quotes.select(parse_sql('SELECT * FROM quotes WHERE price > 5 AND price < 100 LIMIT 5'))
+        
+        self.assertEqual(list(listings['cmc_rank']), [6, 7, 8, 9, 10])
+        self.assertEqual(list(result['cmc_rank']), [6, 7, 8, 9, 10])
+        self.assertEqual(server.requests[0][1]['limit'], ['5'])
+        self.assertLessEqual(len(server.requests), 4)
+    
+    def test_unsupported_operator_is_an_error(self):
+        """Test a condition that cannot be applied fails instead of returning unfiltered rows."""
+        with StandInServer(body=listings_body(100)) as server:
+            self.handler.base_url = server.url
+            with self.assertRaises(NotImplementedError):
+                self.table.select(parse_sql("SELECT * FROM listings WHERE symbol LIKE 'C1%'"))
+
+
+class TestOrderByPushdown(HandlerTestCase):
+    """Test cases for pushing ORDER BY and LIMIT down to the listings sort params."""
+    
+    def setUp(self):
+        self.handler = CoinMarketCapHandler('test_coinmarketcap', connection_data={'api_key': 'test_api_key'})
+        self.listings = CryptocurrencyListingsTable(self.handler)
+        self.quotes = CryptocurrencyQuotesTable(self.handler)
+    
+    def test_translate_order_by(self):
+        """Test supported sort keys map to sort/sort_dir and others stay local."""
+        push = CryptocurrencyListingsTable._push_down_order
+        
+        self.assertEqual(
+            push(parse_sql('SELECT * FROM listings ORDER BY volume_24h DESC')),
+            ({'sort': 'volume_24h', 'sort_dir': 'desc'}, [])
+        )
+        self.assertEqual(
+            push(parse_sql('SELECT * FROM listings ORDER BY cmc_rank')),
+            ({'sort': 'market_cap', 'sort_dir': 'desc'}, [])
+        )
+        self.assertEqual(
+            push(parse_sql('SELECT * FROM listings ORDER BY last_updated')),
+            ({}, [('last_updated', True)])
+        )
+        self.assertEqual(
+            push(parse_sql('SELECT * FROM listings ORDER BY price DESC, name')),
+            ({'sort': 'price', 'sort_dir': 'desc'}, [('price', False), ('name', True)])
+        )
+    
+    def test_listings_top_n_by_volume(self):
+        """Test a top-N query transfers only N rows in the requested order."""
+        with StandInServer(body=listings_body(10000)) as server:
+            self.handler.base_url = server.url
+            result = self.listings.select(parse_sql('SELECT * FROM listings ORDER BY volume_24h DESC LIMIT 20'))
+        
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(server.requests[0][1]['sort'], ['volume_24h'])
+        self.assertEqual(server.requests[0][1]['sort_dir'], ['desc'])
+        self.assertEqual(server.requests[0][1]['limit'], ['20'])
+        self.assertEqual(len(result), 20)
+    
+    def test_quotes_without_symbol_use_listings(self):
+        """Test quotes without a symbol filter are served by the sorted listings endpoint."""
+        with StandInServer(body=listings_body(10000)) as server:
+            self.handler.base_url = server.url
+            result = self.quotes.select(parse_sql('SELECT * FROM quotes ORDER BY cmc_rank LIMIT 50'))
+        
+        path, query = server.requests[0]
+        self.assertEqual(path, '/v1/cryptocurrency/listings/latest')
+        self.assertEqual(query['sort'], ['market_cap'])
+        self.assertEqual(query['limit'], ['50'])
+        self.assertEqual(list(result['cmc_rank']), list(range(1, 51)))
+    
+    def test_unsupported_order_is_applied_locally(self):
+        """Test ORDER BY on a column the API cannot sort by is applied to every row before LIMIT."""
+        with StandInServer(body=listings_body(10000)) as server:
+            self.handler.base_url = server.url
+            result = self.listings.select(parse_sql('SELECT * FROM listings ORDER BY id DESC LIMIT 5'))
+            quotes = self.quotes.select(parse_sql('SELECT * FROM quotes ORDER BY id DESC LIMIT 3'))
+        
+        self.assertNotIn('sort', server.requests[0][1])
+        self.assertEqual(list(result['id']), [10000, 9999, 9998, 9997, 9996])
+        self.assertEqual(list(quotes['id']), [10000, 9999, 9998])
+
+
+class TestSchema(HandlerTestCase):
+    """Test cases for the declarative table schema."""
+    
+    def test_decode_nested_paths(self):
+        """Test nested paths are extracted with their dtypes and missing objects become nulls."""
+        schema = Schema([
+            ('id', 'id', INT),
+            ('platform', 'platform.name', STR),
+            ('price', 'quote.USD.price', FLOAT),
+            ('volume_24h', 'quote.USD.volume_24h', FLOAT)
+        ])
+        df = schema.decode([
+            {'id': 1, 'platform': None, 'quote': {'USD': {'price': 2.5, 'volume_24h': 10}}},
+            {'id': 2, 'platform': {'name': 'Ethereum'}, 'quote': {}}
+        ])
+        
+        self.assertEqual(list(df.columns), schema.columns)
+        self.assertEqual(str(df['id'].dtype), INT)
+        self.assertTrue(pd.isna(df['platform'].iloc[0]))
+        self.assertEqual(df['platform'].iloc[1], 'Ethereum')
+        self.assertEqual(df['price'].iloc[0], 2.5)
+        self.assertTrue(pd.isna(df['price'].iloc[1]))
+        self.assertEqual(str(df['volume_24h'].dtype), FLOAT)
+    
+    def test_decode_missing_keys(self):
+        """Test absent keys, absent or null objects on a path and null records all decode to nulls."""
+        schema = Schema([
+            ('id', 'id', INT),
+            ('contract_address', 'platform.token_address', STR),
+            ('price', 'quote.USD.price', FLOAT),
+            ('last_updated', 'quote.USD.last_updated', DATETIME)
+        ])
+        df = schema.decode([
+            {'id': 1, 'quote': {'USD': {'price': 1, 'last_updated': '2024-01-01T00:00:00.000Z'}}},
+            {'platform': None, 'quote': {'USD': None}},
+            {'id': None, 'platform': {}, 'quote': None},
+            None
+        ])
+        
+        self.assertEqual(len(df), 4)
+        self.assertEqual(df['id'].iloc[0], 1)
+        self.assertTrue(df['id'].iloc[1:].isna().all())
+        self.assertTrue(df['contract_address'].isna().all())
+        self.assertEqual(list(df['price'].isna()), [False, True, True, True])
+        self.assertEqual(df['last_updated'].iloc[0], pd.Timestamp('2024-01-01', tz='UTC'))
+        self.assertTrue(df['last_updated'].iloc[1:].isna().all())
+    
+    def test_decode_coerces_values(self):
+        """Test values of the wrong type become nulls instead of failing the whole column."""
+        schema = Schema([('price', 'price', FLOAT), ('date_added', 'date_added', DATETIME)])
+        df = schema.decode([
+            {'price': '1.5', 'date_added': 'not a date'},
+            {'price': 'n/a', 'date_added': '2013-04-28T00:00:00.000Z'}
+        ])
+        
+        self.assertEqual(df['price'].iloc[0], 1.5)
+        self.assertTrue(pd.isna(df['price'].iloc[1]))
+        self.assertTrue(pd.isna(df['date_added'].iloc[0]))
+        self.assertIsInstance(df['date_added'].dtype, pd.DatetimeTZDtype)
+    
+    def test_decode_coerces_integers_and_booleans(self):
+        """Test fractional numbers and strings in integer and boolean columns become nulls."""
+        schema = Schema([('rank', 'rank', INT), ('active', 'active', BOOL)])
+        df = schema.decode([
+            {'rank': 1.5, 'active': 'yes'},
+            {'rank': 'n/a', 'active': 1},
+            {'rank': '3', 'active': False},
+            {'rank': 4.0, 'active': None}
+        ])
+        
+        self.assertEqual(str(df['rank'].dtype), INT)
+        self.assertEqual(df['rank'].tolist(), [pd.NA, pd.NA, 3, 4])
+        self.assertEqual(str(df['active'].dtype), BOOL)
+        self.assertEqual(df['active'].tolist(), [pd.NA, True, False, pd.NA])
+    
+    def test_decode_matches_row_by_row(self):
+        """Test the columnar decoder gives the same frame as looking every path up record by record."""
+        schema = CryptocurrencyQuotesTable.SCHEMA
+        records = [
+            {
+                'id': i, 'name': f'Coin {i}', 'symbol': f'C{i}', 'cmc_rank': i if i % 4 else None,
+                'max_supply': None if i % 3 else i * 3e6,
+                'platform': None if i % 2 else {'name': 'Ethereum', 'token_address': '0x0'},
+                'quote': {'USD': {'price': i * 1.5, 'market_cap': i * 1e9}} if i % 5 else {}
+            }
+            for i in range(1, 41)
+        ]
+        
+        def lookup(record, path):
+            for key in path.split('.'):
+                record = (record or {}).get(key)
+            return record
+        
+        decoded = schema.decode(records)
+        expected = pd.DataFrame(
+            [[lookup(record, path) for _, path, _ in schema.fields] for record in records], columns=schema.columns
+        ).astype(decoded.dtypes.to_dict())
+        pd.testing.assert_frame_equal(decoded, expected)
+    
+    def test_empty_decode_keeps_columns(self):
+        """Test decoding no records yields an empty frame with the schema's columns."""
+        df = CryptocurrencyQuotesTable.SCHEMA.decode([])
+        
+        self.assertTrue(df.empty)
+        self.assertEqual(list(df.columns), CryptocurrencyQuotesTable.SCHEMA.columns)
+    
+    def test_quotes_and_listings_share_columns(self):
+        """Test the quotes and listings tables expose the same coin columns."""
+        handler = Mock()
+        
+        self.assertEqual(
+            CryptocurrencyQuotesTable(handler).get_columns(),
+            CryptocurrencyListingsTable(handler).get_columns()
+        )
+
+
+class TestProjectionPushdown(HandlerTestCase):
+    """Test cases for trimming `aux` fields and columns to the SELECT list."""
+    
+    def setUp(self):
+        self.handler = CoinMarketCapHandler('test', connection_data={'api_key': 'test', 'symbol_index': False})
+        self.info = CryptocurrencyInfoTable(self.handler)
+        self.listings = CryptocurrencyListingsTable(self.handler)
+    
+    def test_info_skips_description_and_urls(self):
+        """Test selecting a few info columns requests only the aux fields they need."""
+        body = {'status': {'error_code': 0}, 'data': {'BTC': [{
+            'id': 1, 'symbol': 'BTC', 'logo': 'https://example.com/1.png'
+        }]}}
+        with StandInServer(body=body) as server:
+            self.handler.base_url = server.url
+            result = self.info.select(parse_sql("SELECT symbol, logo FROM info WHERE symbol = 'BTC'"))
+        
+        self.assertEqual(server.requests[0][1]['aux'], ['logo'])
+        self.assertEqual(list(result.columns), ['symbol', 'logo'])
+        self.assertEqual(result.iloc[0]['logo'], 'https://example.com/1.png')
+    
+    def test_star_requests_every_column(self):
+        """Test SELECT * requests every aux field that carries a column, but not tags or urls."""
+        with StandInServer() as server:
+            self.handler.base_url = server.url
+            result = self.info.select(parse_sql("SELECT * FROM info WHERE symbol = 'BTC'"))
+        
+        self.assertEqual(server.requests[0][1]['aux'], ['logo,description,platform,date_added,notice'])
+        self.assertEqual(list(result.columns), self.info.get_columns())
+    
+    def test_filter_and_order_columns_are_kept(self):
+        """Test columns used by WHERE and ORDER BY are fetched even when not selected."""
+        with StandInServer(body=listings_body(100)) as server:
+            self.handler.base_url = server.url
+            result = self.listings.select(parse_sql(
+                'SELECT symbol FROM listings WHERE cmc_rank > 0 ORDER BY id DESC LIMIT 5'
+            ))
+        
+        self.assertEqual(server.requests[0][1]['aux'], ['cmc_rank'])
+        self.assertEqual(list(result.columns), ['id', 'symbol', 'cmc_rank'])
+        self.assertEqual(list(result['id']), [100, 99, 98, 97, 96])
+
+
+MAP_RECORDS = [
+    {'id': 1, 'symbol': 'BTC', 'slug': 'bitcoin', 'rank': 1, 'is_active': 1, 'platform': None},
+    {'id': 1027, 'symbol': 'ETH', 'slug': 'ethereum', 'rank': 2, 'is_active': 1, 'platform': None},
+    {'id': 900, 'symbol': 'ABC', 'slug': 'abc-old', 'rank': 3, 'is_active': 0, 'platform': None},
+    {'id': 901, 'symbol': 'ABC', 'slug': 'abc-token', 'rank': 800, 'is_active': 1,
+     'platform': {'token_address': '0xabc'}},
+    {'id': 902, 'symbol': 'ABC', 'slug': 'abc-chain', 'rank': 40, 'is_active': 1, 'platform': None}
+]
+
+
+def map_and_quotes_body(path, query):
+    """Stand-in for the map endpoint plus quotes/info keyed by the requested ids."""
+    if path == '/v1/cryptocurrency/map':
+        return {'status': {'error_code': 0, 'credit_count': 1}, 'data': MAP_RECORDS}
+    ids = query['id'][0].split(',')
+    records = {str(record['id']): record for record in MAP_RECORDS}
+    return {
+        'status': {'error_code': 0, 'credit_count': 1},
+        'data': {i: {**records[i], 'quote': {'USD': {'price': 1.0}}} for i in ids if i in records}
+    }
+
+
+class TestSymbolIndex(HandlerTestCase):
+    """Test cases for the local symbol/slug/id index."""
+    
+    def setUp(self):
+        self.storage = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.storage.name, 'map.npy')
+    
+    def tearDown(self):
+        self.storage.cleanup()
+    
+    def make_handler(self):
+        return CoinMarketCapHandler('test', connection_data={'api_key': 'test', 'storage_dir': self.storage.name})
+    
+    def test_symbol_collision_picks_best_ranked_active(self):
+        """Test a shared symbol resolves to the active coin with the best rank."""
+        index = SymbolIndex(self.path)
+        index.save(SymbolIndex.build(MAP_RECORDS))
+        index.load()
+        
+        self.assertEqual(index.resolve_symbols(['abc', 'BTC', 'NOPE']), ([902, 1], ['NOPE']))
+        self.assertEqual(index.resolve_slugs(['abc-token', 'ethereum']), [901, 1027])
+    
+    def test_index_is_persisted_and_memory_mapped(self):
+        """Test the downloaded map is reused by a new handler without another request."""
+        with StandInServer(body=map_and_quotes_body) as server:
+            handler = self.make_handler()
+            handler.base_url = server.url
+            handler._tables['quotes'].select(parse_sql("SELECT * FROM quotes WHERE symbol = 'BTC'"))
+            
+            handler = self.make_handler()
+            handler.base_url = server.url
+            handler._tables['quotes'].select(parse_sql("SELECT * FROM quotes WHERE symbol = 'ETH'"))
+        
+        paths = [path for path, _ in server.requests]
+        self.assertEqual(paths.count('/v1/cryptocurrency/map'), 1)
+        self.assertIsInstance(np.load(self.path, mmap_mode='r'), np.memmap)
+    
+    def test_quotes_and_info_request_ids(self):
+        """Test symbol and slug predicates are sent as one id-based request."""
+        with StandInServer(body=map_and_quotes_body) as server:
+            handler = self.make_handler()
+            handler.base_url = server.url
+            quotes = handler._tables['quotes'].select(
+                parse_sql("SELECT * FROM quotes WHERE symbol IN ('ABC', 'BTC', 'ETH')")
+            )
+            info = handler._tables['info'].select(parse_sql("SELECT * FROM info WHERE slug = 'abc-token'"))
+        
+        _, quotes_query = server.requests[1]
+        self.assertEqual(quotes_query['id'], ['902,1,1027'])
+        self.assertNotIn('symbol', quotes_query)
+        self.assertEqual(list(quotes['id']), [902, 1, 1027])
+        self.assertEqual(server.requests[2][1]['id'], ['901'])
+        self.assertEqual(info.iloc[0]['contract_address'], '0xabc')
+    
+    def test_unknown_symbols_are_requested_by_symbol(self):
+        """Test symbols listed since the index was downloaded are sent as they are, next to the resolved ids."""
+        def body(path, query):
+            if 'symbol' not in query:
+                return map_and_quotes_body(path, query)
+            return {
+                'status': {'error_code': 0, 'credit_count': 1},
+                'data': {'NEW': {'id': 5000, 'symbol': 'NEW', 'slug': 'new-coin', 'quote': {'USD': {'price': 2.0}}}}
+            }
+        
+        with StandInServer(body=body) as server:
+            handler = self.make_handler()
+            handler.base_url = server.url
+            result = handler._tables['quotes'].select(parse_sql("SELECT * FROM quotes WHERE symbol IN ('BTC', 'new')"))
+        
+        queries = [query for path, query in server.requests if path == '/v1/cryptocurrency/quotes/latest']
+        self.assertEqual(sorted(query.get('id', query.get('symbol'))[0] for query in queries), ['1', 'NEW'])
+        self.assertEqual(sorted(result['id']), [1, 5000])
+    
+    def test_failed_download_is_not_retried_on_every_query(self):
+        """Test a failed map download falls back to symbol requests without downloading again on the next query."""
+        def body(path, query):
+            if path == '/v1/cryptocurrency/map':
+                return {'status': {'error_code': 0, 'credit_count': 1}, 'data': []}
+            return {
+                'status': {'error_code': 0, 'credit_count': 1},
+                'data': {'BTC': {'id': 1, 'symbol': 'BTC', 'quote': {'USD': {'price': 1.0}}}}
+            }
+        
+        with StandInServer(body=body) as server:
+            handler = self.make_handler()
+            handler.base_url = server.url
+            for _ in range(2):
+                result = handler._tables['quotes'].select(parse_sql("SELECT * FROM quotes WHERE symbol = 'BTC'"))
+                self.assertEqual(list(result['id']), [1])
+        
+        paths = [path for path, _ in server.requests]
+        self.assertEqual(paths.count('/v1/cryptocurrency/map'), 1)
+        self.assertEqual(server.requests[-1][1]['symbol'], ['BTC'])
+
+
+class TestCoinLookups(HandlerTestCase):
+    """Test cases for id and slug predicates sent to the API without a symbol index."""
+    
+    def setUp(self):
+        self.handler = CoinMarketCapHandler(
+            'test',
+            connection_data={'api_key': 'test', 'symbol_index': False, 'id_batch_size': 2}
+        )
+    
+    def select(self, table, sql):
+        with StandInServer(body=map_and_quotes_body) as server:
+            self.handler.base_url = server.url
+            result = self.handler._tables[table].select(parse_sql(sql))
+        return server.requests, result
+    
+    def test_id_in_list_is_chunked(self):
+        """Test `id IN (...)` is sent as id batches and other predicates are applied locally."""
+        requests, result = self.select('quotes', "SELECT * FROM quotes WHERE id IN (1, 1027, 901) AND symbol <> 'ABC'")
+        
+        self.assertEqual(sorted(query['id'][0] for _, query in requests), ['1,1027', '901'])
+        self.assertEqual(list(result['id']), [1, 1027])
+    
+    def test_slug_is_pushed_down(self):
+        """Test a slug predicate is sent as the slug param and matched to id-keyed responses."""
+        def body(path, query):
+            slugs = query['slug'][0].split(',')
+            return {'status': {'error_code': 0}, 'data': {
+                str(record['id']): record for record in MAP_RECORDS if record['slug'] in slugs
+            }}
+        
+        with StandInServer(body=body) as server:
+            self.handler.base_url = server.url
+            result = self.handler._tables['quotes'].select(parse_sql("SELECT * FROM quotes WHERE slug = 'Bitcoin'"))
+        
+        self.assertEqual(server.requests[0][1]['slug'], ['bitcoin'])
+        self.assertEqual(list(result['symbol']), ['BTC'])
+    
+    def test_info_by_id(self):
+        """Test info honours an id predicate instead of defaulting to Bitcoin."""
+        requests, result = self.select('info', 'SELECT * FROM info WHERE id = 1027')
+        
+        self.assertEqual(requests[0][1]['id'], ['1027'])
+        self.assertEqual(list(result['symbol']), ['ETH'])
+
+
+def converted_quotes_body(path, query):
+    """Stand-in quotes/latest payload with a quote per requested currency; 1 USD = 0.5 EUR = 0.01 BTC."""
+    rates = {'USD': 1.0, 'EUR': 0.5, 'BTC': 0.01}
+    ids = query['id'][0].split(',')
+    return {'status': {'error_code': 0}, 'data': {
+        i: {'id': int(i), 'symbol': f'C{i}', 'quote': {
+            currency: {'price': 100.0 * int(i) * rates[currency]} for currency in query['convert'][0].split(',')
+        }}
+        for i in ids
+    }}
+
+
+def converted_listings_body(path, query):
+    """Stand-in listings payload of 50 coins priced like converted_quotes_body, which answers quotes requests."""
+    if path == '/v1/cryptocurrency/quotes/latest':
+        return converted_quotes_body(path, query)
+    start, limit = int(query['start'][0]), int(query['limit'][0])
+    ids = ','.join(str(i) for i in range(start, min(start + limit, 51)))
+    data = converted_quotes_body(path, {'id': [ids], 'convert': query['convert']})['data'] if ids else {}
+    return {'status': {'error_code': 0, 'total_count': 50}, 'data': list(data.values())}
+
+
+class TestConvert(HandlerTestCase):
+    """Test cases for quotes in several currencies."""
+    
+    def select(self, sql, **connection_data):
+        handler = CoinMarketCapHandler(
+            'test',
+            connection_data={'api_key': 'test', 'symbol_index': False, **connection_data}
+        )
+        with StandInServer(body=converted_quotes_body) as server:
+            handler.base_url = server.url
+            result = handler._tables['quotes'].select(parse_sql(sql))
+        return [query['convert'][0] for _, query in server.requests], result
+    
+    def test_wide_columns_in_one_request(self):
+        """Test currencies within the plan limit are fetched together and returned as suffixed columns."""
+        converts, result = self.select(
+            "SELECT id, price, price_eur, price_btc FROM quotes WHERE id IN (1, 2) AND `convert` IN ('USD', 'EUR', 'BTC')",
+            max_convert=3
+        )
+        
+        self.assertEqual(converts, ['USD,EUR,BTC'])
+        self.assertEqual(list(result.columns), ['id', 'price', 'price_eur', 'price_btc'])
+        self.assertEqual(list(result['price_eur']), [50.0, 100.0])
+        self.assertEqual(list(result['price_btc']), [1.0, 2.0])
+    
+    def test_comma_separated_convert_value(self):
+        """Test a `convert` value listing several currencies is split like the convert param."""
+        converts, result = self.select(
+            "SELECT id, price, price_eur FROM quotes WHERE id = 1 AND `convert` = 'usd, EUR,USD'",
+            max_convert=3
+        )
+        
+        self.assertEqual(converts, ['USD,EUR'])
+        self.assertEqual(result.iloc[0]['price'], 100.0)
+        self.assertEqual(result.iloc[0]['price_eur'], 50.0)
+    
+    def test_currencies_beyond_plan_limit_are_merged(self):
+        """Test currencies beyond max_convert are fetched in further requests and merged per coin."""
+        converts, result = self.select("SELECT * FROM quotes WHERE id = 2", convert='EUR,BTC')
+        
+        self.assertEqual(sorted(converts), ['BTC', 'EUR'])
+        self.assertEqual(result.iloc[0]['price'], 100.0)
+        self.assertEqual(result.iloc[0]['price_btc'], 2.0)
+    
+    def test_listings_add_currencies_for_kept_coins(self):
+        """Test currencies beyond max_convert are requested by id for the coins left after filtering and LIMIT."""
+        handler = CoinMarketCapHandler('test', connection_data={'api_key': 'test', 'symbol_index': False})
+        with StandInServer(body=converted_listings_body) as server:
+            handler.base_url = server.url
+            result = handler._tables['listings'].select(parse_sql(
+                "SELECT id, price, price_eur, price_btc FROM listings "
+                "WHERE price > 150 AND `convert` IN ('USD', 'EUR', 'BTC') LIMIT 2"
+            ))
+        
+        listings = [query for path, query in server.requests if path == '/v1/cryptocurrency/listings/latest']
+        quotes = [query for path, query in server.requests if path == '/v1/cryptocurrency/quotes/latest']
+        self.assertEqual({query['convert'][0] for query in listings}, {'USD'})
+        self.assertEqual(sorted((query['convert'][0], query['id'][0]) for query in quotes), [('BTC', '2,3'), ('EUR', '2,3')])
+        self.assertEqual(list(result['id']), [2, 3])
+        self.assertEqual(list(result['price_btc']), [2.0, 3.0])
+    
+    def test_listings_filter_on_added_currency(self):
+        """Test conditions on a currency beyond max_convert are applied once its quotes are added."""
+        handler = CoinMarketCapHandler('test', connection_data={'api_key': 'test', 'symbol_index': False})
+        with StandInServer(body=converted_listings_body) as server:
+            handler.base_url = server.url
+            result = handler._tables['listings'].select(parse_sql(
+                "SELECT id, price_eur FROM listings WHERE price_eur > 100 AND `convert` IN ('USD', 'EUR') LIMIT 2"
+            ))
+        
+        self.assertEqual(list(result['id']), [3, 4])
+        self.assertEqual(list(result['price_eur']), [150.0, 200.0])
+    
+    def test_long_format(self):
+        """Test the long format returns a row per coin and currency."""
+        _, result = self.select(
+            "SELECT * FROM quotes WHERE id IN (1, 2) AND `convert` IN ('usd', 'eur') AND quote_format = 'long'",
+            max_convert=2
+        )
+        
+        self.assertEqual(list(result['id']), [1, 1, 2, 2])
+        self.assertEqual(list(result['convert']), ['USD', 'EUR', 'USD', 'EUR'])
+        self.assertEqual(list(result['price']), [100.0, 50.0, 200.0, 100.0])
+
+
+def historical_body(path, query):
+    """Stand-in quotes/historical payload with an hourly point per coin over the requested window."""
+    start = pd.Timestamp(query['time_start'][0]).ceil('h')
+    end = pd.Timestamp(query['time_end'][0])
+    times = pd.date_range(start, end, freq='h')
+    return {'status': {'error_code': 0, 'credit_count': 1}, 'data': {
+        i: {'id': int(i), 'name': f'Coin {i}', 'symbol': f'C{i}', 'quotes': [
+            {'timestamp': t.strftime('%Y-%m-%dT%H:%M:%S.000Z'), 'quote': {'USD': {'price': float(t.hour)}}}
+            for t in times
+        ]}
+        for i in query['id'][0].split(',')
+    }}
+
+
+class TestQuotesHistorical(HandlerTestCase):
+    """Test cases for the quotes_historical table."""
+    
+    def setUp(self):
+        self.storage = tempfile.TemporaryDirectory()
+        self.addCleanup(self.storage.cleanup)
+    
+    def select(self, sql, **connection_data):
+        handler = CoinMarketCapHandler('test', connection_data={
+            'api_key': 'test', 'symbol_index': False, 'requests_per_minute': 0, 'storage_dir': self.storage.name,
+            **connection_data
+        })
+        with StandInServer(body=historical_body) as server:
+            handler.base_url = server.url
+            result = handler._tables['quotes_historical'].select(parse_sql(sql))
+        handler.disconnect()
+        return [query for _, query in server.requests], result
+    
+    def test_short_range_batches_coins(self):
+        """Test a short range is fetched for several coins in one call and sorted by time."""
+        calls, result = self.select(
+            "SELECT * FROM quotes_historical WHERE id IN (1, 2, 3) "
+            "AND timestamp BETWEEN '2024-01-01 00:00:00' AND '2024-01-02 00:00:00' AND interval = '1h'"
+        )
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0]['id'], ['1,2,3'])
+        self.assertEqual(calls[0]['interval'], ['1h'])
+        self.assertEqual(len(result), 25 * 3)
+        self.assertTrue(str(result['timestamp'].dtype).startswith('datetime64'))
+        self.assertTrue(result['timestamp'].is_monotonic_increasing)
+        self.assertEqual(list(result['id'][:3]), [1, 2, 3])
+    
+    def test_long_range_is_split_into_windows(self):
+        """Test a long range is split into concurrent windows per coin and merged without duplicates."""
+        calls, result = self.select(
+            "SELECT id, timestamp, price FROM quotes_historical WHERE id IN (1, 2) "
+            "AND timestamp >= '2024-01-01' AND timestamp < '2024-01-11' AND interval = '1h'",
+            historical_window_points=100
+        )
+        
+        self.assertEqual(len(calls), 2 * 3)
+        self.assertTrue(all(',' not in query['id'][0] for query in calls))
+        self.assertEqual(len(result), 240 * 2)
+        self.assertEqual(result['timestamp'].max(), pd.Timestamp('2024-01-10 23:00', tz='UTC'))
+        self.assertFalse(result.duplicated(['id', 'timestamp']).any())
+    
+    def test_requires_coin_condition(self):
+        """Test a query without a coin condition is rejected instead of fetching every coin."""
+        with self.assertRaises(ValueError):
+            self.select("SELECT * FROM quotes_historical WHERE interval = '1h'")
+    
+    def test_repeated_range_is_read_from_store(self):
+        """Test a new handler serves a range it already fetched from the history store."""
+        sql = (
+            "SELECT * FROM quotes_historical WHERE id IN (1, 2) "
+            "AND timestamp BETWEEN '2024-01-01' AND '2024-01-03' AND interval = '1h'"
+        )
+        _, first = self.select(sql)
+        calls, second = self.select(sql)
+        
+        self.assertEqual(calls, [])
+        self.assertEqual(len(second), 49 * 2)
+        pd.testing.assert_frame_equal(first, second)
+    
+    def test_projection_is_pushed_down_without_store(self):
+        """Test only the aux fields of the selected columns are requested when the store is disabled."""
+        calls, result = self.select(
+            "SELECT id, timestamp, price FROM quotes_historical WHERE id = 1 "
+            "AND timestamp BETWEEN '2024-01-01' AND '2024-01-02' AND interval = '1h'",
+            history_store=False
+        )
+        
+        self.assertEqual(calls[0]['aux'], ['price'])
+        self.assertEqual(len(result), 25)
+        self.assertEqual(os.listdir(self.storage.name), [])
+
+
+def ohlcv_body(path, query):
+    """Stand-in ohlcv/historical payload with a daily bar per coin opening within the requested window."""
+    times = pd.date_range(pd.Timestamp(query['time_start'][0]).ceil('D'), pd.Timestamp(query['time_end'][0]), freq='D')
+    return {'status': {'error_code': 0, 'credit_count': 1}, 'data': {
+        i: {'id': int(i), 'name': f'Coin {i}', 'symbol': f'C{i}', 'quotes': [
+            {
+                'time_open': t.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                'time_close': (t + pd.Timedelta(days=1, seconds=-1)).strftime('%Y-%m-%dT%H:%M:%S.999Z'),
+                'quote': {'USD': {'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': float(t.day), 'volume': 10.0}}
+            }
+            for t in times
+        ]}
+        for i in query['id'][0].split(',')
+    }}
+
+
+class TestOHLCV(HandlerTestCase):
+    """Test cases for the ohlcv table and its local store."""
+    
+    def setUp(self):
+        self.storage = tempfile.TemporaryDirectory()
+        self.handler = CoinMarketCapHandler('test', connection_data={
+            'api_key': 'test', 'symbol_index': False, 'requests_per_minute': 0, 'storage_dir': self.storage.name
+        })
+    
+    def tearDown(self):
+        self.handler.disconnect()
+        self.storage.cleanup()
+    
+    def select(self, sql):
+        with StandInServer(body=ohlcv_body) as server:
+            self.handler.base_url = server.url
+            result = self.handler._tables['ohlcv'].select(parse_sql(sql))
+        return [query for _, query in server.requests], result
+    
+    def test_only_missing_spans_are_fetched(self):
+        """Test a repeated query is served from the store and a wider one only fetches the new span."""
+        sql = (
+            "SELECT * FROM ohlcv WHERE id IN (1, 2) "
+            "AND time_open BETWEEN '2024-01-01' AND '2024-01-31' AND interval = 'daily'"
+        )
+        calls, first = self.select(sql)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0]['id'], ['1,2'])
+        self.assertEqual(calls[0]['time_period'], ['daily'])
+        self.assertEqual(len(first), 31 * 2)
+        
+        calls, second = self.select(sql)
+        self.assertEqual(calls, [])
+        pd.testing.assert_frame_equal(first, second)
+        
+        calls, wider = self.select(sql.replace("'2024-01-31'", "'2024-02-10'"))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0]['time_start'], ['2024-01-31T00:00:00+00:00'])
+        self.assertEqual(len(wider), 41 * 2)
+        self.assertTrue(wider['time_open'].is_monotonic_increasing)
+        self.assertEqual(wider.iloc[-1]['close'], 10.0)
+    
+    def test_open_bar_is_fetched_again(self):
+        """Test spans stop at the last closed bar, so the current bar is refreshed on the next query."""
+        sql = "SELECT * FROM ohlcv WHERE id = 1 AND time_open >= '{}' AND interval = 'daily'".format(
+            (pd.Timestamp.now(tz='UTC') - pd.Timedelta(days=5)).strftime('%Y-%m-%d')
+        )
+        self.select(sql)
+        calls, _ = self.select(sql)
+        
+        self.assertEqual(len(calls), 1)
+    
+    def test_store_can_be_disabled(self):
+        """Test every query goes to the API when the store is disabled."""
+        self.handler.history_store_path = None
+        sql = "SELECT * FROM ohlcv WHERE id = 1 AND time_open BETWEEN '2024-01-01' AND '2024-01-05'"
+        self.select(sql)
+        calls, result = self.select(sql)
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(result), 5)
+        self.assertFalse(os.path.exists(os.path.join(self.storage.name, 'history')))
+
+
+class TestSnapshotRefresher(HandlerTestCase):
+    """Test cases for the background snapshot refresher."""
+    
+    ENDPOINT = '/v1/global-metrics/quotes/latest'
+    
+    def refresher(self, fetch, ttl=60.0, max_staleness=600):
+        refresher = SnapshotRefresher(fetch, lambda endpoint: ttl, [self.ENDPOINT], max_staleness=max_staleness)
+        refresher.start()
+        self.addCleanup(refresher.stop)
+        return refresher
+    
+    def test_hot_request_is_refreshed_in_background(self):
+        """Test a read registers its request, which the thread then refetches once past its TTL."""
+        refreshed = threading.Event()
+        
+        def fetch(endpoint, params):
+            refreshed.set()
+            return {'status': {'error_code': 0}, 'data': {'n': 2}}
+        
+        refresher = self.refresher(fetch, ttl=0.05)
+        self.assertIsNone(refresher.get(self.ENDPOINT, {'convert': 'USD'}))
+        refresher.put(self.ENDPOINT, {'convert': 'USD'}, {'status': {'error_code': 0}, 'data': {'n': 1}})
+        
+        self.assertTrue(refreshed.wait(2))
+        deadline = time.monotonic() + 2
+        while refresher.stats()['refreshes'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(refresher.get(self.ENDPOINT, {'convert': 'USD'})['data'], {'n': 2})
+    
+    def test_stale_snapshot_is_served_until_max_staleness(self):
+        """Test a snapshot past its TTL is still served while refreshes fail, but not past max staleness."""
+        def fetch(endpoint, params):
+            raise ConnectionError('down')
+        
+        refresher = self.refresher(fetch, ttl=0.05, max_staleness=0.3)
+        refresher.get(self.ENDPOINT)
+        refresher.put(self.ENDPOINT, None, {'status': {'error_code': 0}, 'data': {}})
+        self.assertIsNotNone(refresher.get(self.ENDPOINT))
+        
+        time.sleep(0.1)
+        self.assertIsNotNone(refresher.get(self.ENDPOINT))
+        self.assertEqual(refresher.stats()['stale_hits'], 1)
+        
+        time.sleep(0.3)
+        self.assertIsNone(refresher.get(self.ENDPOINT))
+        self.assertGreaterEqual(refresher.stats()['failures'], 1)
+    
+    def test_other_endpoints_are_not_registered(self):
+        """Test only the configured endpoints are kept fresh."""
+        refresher = self.refresher(lambda endpoint, params: {})
+        refresher.get('/v2/cryptocurrency/info', {'id': '1'})
+        
+        self.assertEqual(refresher.stats()['snapshots'], 0)
+    
+    def test_handler_reads_snapshot_after_connect(self):
+        """Test connect() starts the refresher and repeated selects are served without calling the API."""
+        handler = CoinMarketCapHandler('test', connection_data={
+            'api_key': 'test', 'symbol_index': False, 'requests_per_minute': 0,
+            'background_refresh': True, 'cache_ttl': {self.ENDPOINT: 0.2}
+        })
+        with StandInServer(body={'status': {'error_code': 0, 'credit_count': 1}, 'data': {'quote': {}}}) as server:
+            handler.base_url = server.url
+            self.assertTrue(handler.connect().success)
+            query = parse_sql('SELECT * FROM global_metrics')
+            handler._tables['global_metrics'].select(query)
+            calls = len(server.requests)
+            for _ in range(5):
+                handler._tables['global_metrics'].select(query)
+            self.assertEqual(len(server.requests), calls)
+            
+            time.sleep(0.5)
+            self.assertGreater(len(server.requests), calls)
+            handler.disconnect()
+        self.assertFalse(handler.refresher.running)
+
+
+KEY_INFO_BODY = {'status': {'error_code': 0, 'credit_count': 0}, 'data': {
+    'plan': {'credit_limit_daily': 333, 'credit_limit_monthly': 10000, 'rate_limit_minute': 30,
+             'credit_limit_monthly_reset_timestamp': '2024-02-01T00:00:00.000Z'},
+    'usage': {'current_day': {'credits_used': 12, 'credits_left': 321}, 'current_month': {'credits_used': 40, 'credits_left': 9960}}
+}}
+
+
+class TestQueryCosts(HandlerTestCase):
+    """Test cases for the usage and query_costs tables."""
+    
+    def make_handler(self, **connection_data):
+        return CoinMarketCapHandler('test', connection_data={
+            'api_key': 'test', 'symbol_index': False, 'requests_per_minute': 0, 'quote_batch_window_ms': 0,
+            **connection_data
+        })
+    
+    def test_each_query_is_charged_its_calls(self):
+        """Test a query records its calls, credits and bytes, and a repeat only cache hits."""
+        handler = self.make_handler()
+        sql = "SELECT * FROM quotes WHERE symbol IN ('BTC', 'ETH')"
+        with StandInServer(body=quotes_body) as server:
+            handler.base_url = server.url
+            handler.native_query(sql)
+            handler.native_query(sql)
+            response = handler.native_query('SELECT * FROM query_costs WHERE credits > 0')
+        
+        costs = handler.query_costs.records()
+        self.assertEqual([cost['query'] for cost in costs], [sql, sql, 'SELECT * FROM query_costs WHERE credits > 0'])
+        self.assertEqual((costs[0]['calls'], costs[0]['credits'], costs[0]['cache_hits']), (1, 1, 0))
+        self.assertGreater(costs[0]['bytes'], 0)
+        self.assertEqual(costs[0]['endpoints'], '/v1/cryptocurrency/quotes/latest:1')
+        self.assertEqual((costs[1]['calls'], costs[1]['cache_hits']), (0, 2))
+        self.assertEqual(list(response.data_frame['query']), [sql])
+    
+    def test_history_is_bounded(self):
+        """Test only the latest `query_cost_history` queries are kept, failed ones included."""
+        handler = self.make_handler(query_cost_history=2)
+        with StandInServer() as server:
+            handler.base_url = server.url
+            for _ in range(2):
+                handler.native_query('SELECT * FROM global_metrics')
+            with self.assertRaises(ValueError):
+                handler.native_query('SELECT * FROM ohlcv')
+        
+        costs = handler.query_costs.records()
+        self.assertEqual(len(costs), 2)
+        self.assertIn('requires', costs[-1]['error'])
+    
+    def test_queries_of_every_handler_of_the_key_are_listed(self):
+        """Test query_costs read through one handler lists queries run by another handler of the key."""
+        first, second = self.make_handler(), self.make_handler()
+        with StandInServer() as server:
+            first.base_url = second.base_url = server.url
+            first.native_query('SELECT * FROM global_metrics')
+            response = second.native_query('SELECT * FROM query_costs')
+        
+        self.assertEqual(list(response.data_frame['query']), ['SELECT * FROM global_metrics'])
+    
+    def test_usage_table(self):
+        """Test the usage table reads plan limits and usage from key/info."""
+        handler = self.make_handler()
+        with StandInServer(body=KEY_INFO_BODY) as server:
+            handler.base_url = server.url
+            result = handler._tables['usage'].select(parse_sql('SELECT * FROM usage'))
+        
+        self.assertEqual(server.requests[0][0], '/v1/key/info')
+        self.assertEqual(result.iloc[0]['credits_left_day'], 321)
+        self.assertEqual(result.iloc[0]['credit_limit_monthly'], 10000)
+        self.assertEqual(result.iloc[0]['credit_limit_monthly_reset_timestamp'], pd.Timestamp('2024-02-01', tz='UTC'))
+
+
+class TestLatencyMetrics(HandlerTestCase):
+    """Test cases for latency instrumentation and the handler_stats table."""
+    
+    def make_handler(self, **connection_data):
+        return CoinMarketCapHandler('test', connection_data={
+            'api_key': 'test', 'symbol_index': False, 'requests_per_minute': 0, 'quote_batch_window_ms': 0,
+            **connection_data
+        })
+    
+    def test_call_and_select_stages_are_recorded(self):
+        """Test every stage of a call and of a select lands in its histogram."""
+        handler = self.make_handler(latency_metrics=True)
+        with StandInServer(body=quotes_body, delay=0.02) as server:
+            handler.base_url = server.url
+            handler.native_query("SELECT * FROM quotes WHERE symbol = 'BTC'")
+        
+        stats = handler.native_query('SELECT * FROM handler_stats').data_frame
+        stages = {(row.scope, row.stage): row for row in stats.itertuples()}
+        endpoint = '/v1/cryptocurrency/quotes/latest'
+        for stage in ('connect', 'ttfb', 'download', 'decode'):
+            self.assertEqual(stages[(endpoint, stage)].count, 1)
+        for stage in ('extract', 'build', 'select'):
+            self.assertEqual(stages[('quotes', stage)].count, 1)
+        self.assertGreaterEqual(stages[(endpoint, 'ttfb')].max_ms, 20)
+        self.assertGreaterEqual(stages[('quotes', 'select')].max_ms, stages[(endpoint, 'ttfb')].max_ms)
+        
+        filtered = handler.native_query("SELECT * FROM handler_stats WHERE scope = 'quotes'").data_frame
+        self.assertEqual(set(filtered['stage']), {'extract', 'build', 'select'})
+    
+    def test_disabled_by_default(self):
+        """Test nothing is recorded unless latency metrics are enabled."""
+        handler = self.make_handler()
+        with StandInServer(body=quotes_body) as server:
+            handler.base_url = server.url
+            handler.native_query("SELECT * FROM quotes WHERE symbol = 'BTC'")
+        
+        self.assertEqual(handler.metrics.records(), [])
+        self.assertTrue(handler.native_query('SELECT * FROM handler_stats').data_frame.empty)
+    
+    def test_prometheus_dump(self):
+        """Test the histograms are dumped with cumulative buckets, sum and count."""
+        handler = self.make_handler(latency_metrics=True)
+        with StandInServer() as server:
+            handler.base_url = server.url
+            handler.call_coinmarketcap_api('/v1/key/info')
+        
+        text = handler.prometheus_metrics()
+        self.assertIn('# TYPE coinmarketcap_call_seconds histogram', text)
+        labels = 'endpoint="/v1/key/info",stage="decode"'
+        self.assertIn(f'coinmarketcap_call_seconds_bucket{{{labels},le="+Inf"}} 1', text)
+        self.assertIn(f'coinmarketcap_call_seconds_count{{{labels}}} 1', text)
+        buckets = [
+            int(line.rsplit(' ', 1)[1]) for line in text.splitlines()
+            if line.startswith(f'coinmarketcap_call_seconds_bucket{{{labels}')
+        ]
+        self.assertEqual(buckets, sorted(buckets))
+
+
+class TestTracing(HandlerTestCase):
+    """Test cases for query tracing."""
+    
+    def setUp(self):
+        self.trace_file = os.path.join(tempfile.mkdtemp(), 'traces.jsonl')
+    
+    def make_handler(self, **connection_data):
+        return CoinMarketCapHandler('test', connection_data={
+            'api_key': 'test', 'symbol_index': False, 'requests_per_minute': 0, 'quote_batch_window_ms': 0,
+            'trace': True, 'trace_file': self.trace_file, **connection_data
+        })
+    
+    def read_traces(self):
+        with open(self.trace_file) as f:
+            return [
+                scope['spans']
+                for line in f
+                for resource in json.loads(line)['resourceSpans']
+                for scope in resource['scopeSpans']
+            ]
+    
+    def test_query_spans_form_one_trace(self):
+        """Test a query is written as one trace whose spans link up to the root."""
+        handler = self.make_handler()
+        with StandInServer(body=quotes_body) as server:
+            handler.base_url = server.url
+            handler.native_query("SELECT * FROM quotes WHERE symbol IN ('BTC', 'ETH')")
+        handler.disconnect()
+        
+        traces = self.read_traces()
+        self.assertEqual(len(traces), 1)
+        spans = {span['name']: span for span in traces[0]}
+        self.assertEqual(
+            set(spans),
+            {'native_query', 'parse', 'query', 'select', 'cache_lookup', 'GET /v1/cryptocurrency/quotes/latest', 'decode', 'build_dataframe'}
+        )
+        self.assertEqual(len({span['traceId'] for span in traces[0]}), 1)
+        
+        parents = {span['spanId']: span.get('parentSpanId') for span in traces[0]}
+        names = {span['spanId']: span['name'] for span in traces[0]}
+        
+        def ancestry(name):
+            span_id, chain = spans[name]['spanId'], []
+            while span_id is not None:
+                chain.append(names[span_id])
+                span_id = parents[span_id]
+            return chain
+        
+        self.assertEqual(ancestry('GET /v1/cryptocurrency/quotes/latest'), ['GET /v1/cryptocurrency/quotes/latest', 'select', 'query', 'native_query'])
+        self.assertEqual(ancestry('parse'), ['parse', 'native_query'])
+        
+        attributes = {
+            name: {item['key']: next(iter(item['value'].values())) for item in span['attributes']}
+            for name, span in spans.items()
+        }
+        http = attributes['GET /v1/cryptocurrency/quotes/latest']
+        self.assertEqual(spans['GET /v1/cryptocurrency/quotes/latest']['kind'], 3)
+        self.assertEqual(http['http.response.status_code'], '200')
+        self.assertGreater(int(http['http.response.body.size']), 0)
+        self.assertEqual(http['params_hash'], attributes['cache_lookup']['params_hash'])
+        self.assertEqual(attributes['cache_lookup']['cache.result'], 'miss')
+        self.assertEqual(attributes['select'], {'table': 'quotes', 'rows': '2'})
+        self.assertLessEqual(int(spans['native_query']['startTimeUnixNano']), int(spans['parse']['startTimeUnixNano']))
+    
+    def test_failed_query_marks_the_span(self):
+        """Test a query that raises is traced with an error status."""
+        handler = self.make_handler()
+        with self.assertRaises(ValueError):
+            handler.native_query('SELECT * FROM ohlcv')
+        handler.disconnect()
+        
+        root = next(span for span in self.read_traces()[0] if span['name'] == 'native_query')
+        self.assertEqual(root['status']['code'], 2)
+        self.assertIn('ValueError', root['status']['message'])
+    
+    def test_disabled_by_default(self):
+        """Test no trace file is written unless tracing is enabled."""
+        handler = self.make_handler(trace=False)
+        with StandInServer() as server:
+            handler.base_url = server.url
+            handler.native_query('SELECT * FROM global_metrics')
+        
+        self.assertFalse(os.path.exists(self.trace_file))
+
+
+class TestTimeSeriesStore(HandlerTestCase):
+    """Test cases for the columnar time-series store."""
+    
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        self.store = TimeSeriesStore(self.root.name, compact_after=3)
+    
+    @staticmethod
+    def frame(coin_id, start, periods, price):
+        return pd.DataFrame({
+            'id': pd.array([coin_id] * periods, dtype='Int64'),
+            'symbol': [f'C{coin_id}'] * periods,
+            'timestamp': pd.date_range(start, periods=periods, freq='h', tz='UTC'),
+            'price': [float(price)] * periods
+        })
+    
+    def segments(self, coin_id):
+        return sorted(
+            name for _, _, files in os.walk(os.path.join(self.root.name, 'series', str(coin_id)))
+            for name in files if name.endswith('.parquet')
+        )
+    
+    def test_segments_are_partitioned_by_coin_and_day(self):
+        """Test appends write a segment per coin and day, encoded as requested."""
+        frame = pd.concat([self.frame(1, '2024-01-01 12:00', 24, 1), self.frame(2, '2024-01-01', 2, 1)])
+        self.store.append('series', frame, 'timestamp')
+        
+        self.assertEqual(sorted(os.listdir(os.path.join(self.root.name, 'series', '1'))), ['2024-01-01', '2024-01-02'])
+        self.assertEqual(len(self.segments(2)), 1)
+        
+        partition = os.path.join(self.root.name, 'series', '1', '2024-01-01')
+        metadata = pq.ParquetFile(os.path.join(partition, os.listdir(partition)[0])).metadata.row_group(0)
+        encodings = {metadata.column(i).path_in_schema: metadata.column(i) for i in range(metadata.num_columns)}
+        self.assertIn('DELTA_BINARY_PACKED', encodings['timestamp'].encodings)
+        self.assertTrue(encodings['symbol'].has_dictionary_page)
+        self.assertEqual(encodings['price'].compression, 'ZSTD')
+    
+    def test_scan_reads_range_with_latest_values(self):
+        """Test a scan returns the rows in range, newer segments overriding the rows they repeat."""
+        self.store.append('series', self.frame(1, '2024-01-01', 48, 1), 'timestamp')
+        self.store.append('series', self.frame(1, '2024-01-01 23:00', 2, 2), 'timestamp')
+        
+        rows = self.store.scan(
+            'series', [1, 3], 'timestamp',
+            pd.Timestamp('2024-01-01 20:00', tz='UTC'), pd.Timestamp('2024-01-02 01:00', tz='UTC')
+        )
+        
+        self.assertEqual(len(rows), 6)
+        self.assertTrue(rows['timestamp'].is_monotonic_increasing)
+        self.assertEqual(list(rows['price']), [1.0, 1.0, 1.0, 2.0, 2.0, 1.0])
+    
+    def test_partition_is_compacted(self):
+        """Test a partition reaching `compact_after` segments is merged into one without duplicate rows."""
+        for price in range(3):
+            self.store.append('series', self.frame(1, '2024-01-01', 4, price), 'timestamp')
+        
+        self.assertEqual(len(self.segments(1)), 1)
+        rows = self.store.scan(
+            'series', [1], 'timestamp', pd.Timestamp('2024-01-01', tz='UTC'), pd.Timestamp('2024-01-02', tz='UTC')
+        )
+        self.assertEqual(list(rows['price']), [2.0] * 4)
+    
+    def test_concurrent_compaction_of_shared_root(self):
+        """Test a store compacting segments another store on the same root already merged leaves them alone."""
+        partition = os.path.join(self.root.name, 'series', '1', '2024-01-01')
+        for price in range(2):
+            self.store.append('series', self.frame(1, '2024-01-01', 4, price), 'timestamp')
+        listed = TimeSeriesStore._segments(partition)
+        self.store.append('series', self.frame(1, '2024-01-01', 4, 2), 'timestamp')
+        
+        other = TimeSeriesStore(self.root.name, compact_after=3)
+        with patch.object(other, '_segments', return_value=listed):
+            other._compact(partition, 'timestamp')
+        
+        self.assertEqual(len(self.segments(1)), 1)
+        rows = self.store.scan(
+            'series', [1], 'timestamp', pd.Timestamp('2024-01-01', tz='UTC'), pd.Timestamp('2024-01-02', tz='UTC')
+        )
+        self.assertEqual(list(rows['price']), [2.0] * 4)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file